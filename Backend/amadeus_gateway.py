@@ -0,0 +1,268 @@
+import http.client
+import logging
+import os
+import queue
+import threading
+import time
+from urllib.error import URLError
+
+from amadeus import Client, ResponseError
+from amadeus.client.access_token import AccessToken
+from dotenv import load_dotenv
+
+from resilience import RETRYABLE_STATUSES, CircuitBreaker, CircuitOpenError, RateLimiter, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# Idle keep-alive connections kept per host (AMADEUS_MAX_CONCURRENCY)
+DEFAULT_MAX_CONCURRENCY = 8
+HTTP_TIMEOUT_SECONDS = 30
+# Requests per second; the Amadeus self-service test environment allows 10 TPS
+DEFAULT_RATE_LIMIT = 10
+DEFAULT_MAX_RETRIES = 3
+
+__all__ = [
+    "MissingCredentialsError",
+    "ResponseError",
+    "get_client",
+]
+
+
+class MissingCredentialsError(ValueError):
+    """Raised by get_client() when no Amadeus credentials are configured."""
+
+
+class _BufferedResponse:
+    """Fully-read HTTP response in the shape the Amadeus SDK parser expects."""
+
+    def __init__(self, status, message, body):
+        self.status = status
+        self.code = status
+        self._message = message
+        self._body = body
+
+    def getheaders(self):
+        return list(self._message.items())
+
+    def info(self):
+        # HTTPMessage lookups are case-insensitive, unlike a plain dict
+        return self._message
+
+    def read(self):
+        return self._body
+
+
+class KeepAliveHTTP:
+    """
+    urlopen-compatible transport that reuses persistent HTTPS connections.
+
+    The stock SDK transport opens a new TLS connection for every call. This
+    keeps up to pool_size idle connections per host and hands them out to
+    whichever thread needs one next.
+    """
+
+    def __init__(self, pool_size=DEFAULT_MAX_CONCURRENCY, timeout=HTTP_TIMEOUT_SECONDS):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        key = (request.type, request.host)
+        pool = self._pool(key)
+        try:
+            conn = pool.get_nowait()
+            reused = True
+        except queue.Empty:
+            conn = self._connect(*key)
+            reused = False
+
+        try:
+            response = self._send(conn, request)
+        except (http.client.HTTPException, OSError) as e:
+            conn.close()
+            if not reused:
+                raise URLError(e)
+            # The server may have dropped an idle connection; retry once on a fresh one
+            conn = self._connect(*key)
+            try:
+                response = self._send(conn, request)
+            except (http.client.HTTPException, OSError) as retry_error:
+                conn.close()
+                raise URLError(retry_error)
+
+        if response.will_close:
+            conn.close()
+        else:
+            try:
+                pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+        return _BufferedResponse(response.status, response.msg, response.body)
+
+    def close(self):
+        """Close every idle pooled connection."""
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break
+
+    def _pool(self, key):
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = queue.LifoQueue(maxsize=self.pool_size)
+            return self._pools[key]
+
+    def _connect(self, scheme, host):
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, timeout=self.timeout)
+        return http.client.HTTPConnection(host, timeout=self.timeout)
+
+    @staticmethod
+    def _send(conn, request):
+        conn.request(request.get_method(), request.selector, body=request.data,
+                     headers=dict(request.header_items()))
+        response = conn.getresponse()
+        # Read the whole body now so the connection can go straight back to the pool
+        response.body = response.read()
+        return response
+
+
+class ResilientHTTP:
+    """
+    Transport wrapper adding rate limiting, retries and per-endpoint circuit breakers.
+
+    Every outbound request first takes a token from the shared rate limiter.
+    429/5xx responses and network errors are retried with jittered exponential
+    backoff (honouring Retry-After). Repeated 5xx/network failures open the
+    circuit for that endpoint, so further calls fail fast as a NetworkError
+    instead of waiting on a provider that is down.
+    """
+
+    def __init__(self, transport, rate_limiter, max_retries=3, backoff_base=0.5, backoff_max=8.0,
+                 failure_threshold=5, reset_timeout=30.0, sleep=time.sleep, clock=time.monotonic):
+        self.transport = transport
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._sleep = sleep
+        self._clock = clock
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, endpoint):
+        """The circuit breaker for an endpoint path such as /v2/shopping/flight-offers."""
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.reset_timeout, clock=self._clock)
+            return self._breakers[endpoint]
+
+    def __call__(self, request):
+        endpoint = request.selector.split("?", 1)[0]
+        breaker = self.breaker(endpoint)
+
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow():
+                raise URLError(CircuitOpenError(endpoint, breaker.retry_in()))
+            self.rate_limiter.acquire()
+
+            try:
+                response = self.transport(request)
+            except URLError as e:
+                breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                logger.warning(f"Network error calling {endpoint} ({e.reason}); retry {attempt + 1} in {delay:.2f}s")
+                self._sleep(delay)
+                continue
+
+            if response.status not in RETRYABLE_STATUSES:
+                breaker.record_success()
+                return response
+
+            # Throttling means we're sending too fast, not that the provider is down
+            if response.status >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_throttled()
+            if attempt == self.max_retries:
+                return response
+            delay = self._retry_after(response) or backoff_delay(attempt, self.backoff_base, self.backoff_max)
+            logger.warning(f"{endpoint} returned {response.status}; retry {attempt + 1} in {delay:.2f}s")
+            self._sleep(delay)
+
+        return response
+
+    def _retry_after(self, response):
+        value = response.info().get("Retry-After")
+        try:
+            return min(float(value), self.backoff_max) if value else None
+        except ValueError:
+            return None
+
+
+class _SharedAccessToken(AccessToken):
+    """AccessToken that refreshes at most once when many threads ask at the same time."""
+
+    def __init__(self, client):
+        super().__init__(client)
+        self._lock = threading.Lock()
+
+    def _bearer_token(self):
+        with self._lock:
+            return super()._bearer_token()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> Client:
+    """
+    Return the process-wide Amadeus client, creating it on first use.
+
+    Every module shares this client, so there is one access token, one
+    keep-alive connection pool and one rate limiter per process. Credentials
+    come from AMADEUS_CLIENT_ID / AMADEUS_CLIENT_SECRET in the environment or
+    .env. The SDK also reads AMADEUS_HOST, AMADEUS_PORT and AMADEUS_SSL, which
+    is how to point the gateway at a local fake server.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                load_dotenv()
+                client_id = os.getenv('AMADEUS_CLIENT_ID')
+                client_secret = os.getenv('AMADEUS_CLIENT_SECRET')
+                if not client_id or not client_secret:
+                    logger.error("Amadeus API credentials not found in .env file")
+                    raise MissingCredentialsError("Missing Amadeus API credentials")
+
+                pool_size = int(os.getenv('AMADEUS_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY))
+                rate = float(os.getenv('AMADEUS_RATE_LIMIT', DEFAULT_RATE_LIMIT))
+                transport = ResilientHTTP(
+                    KeepAliveHTTP(pool_size=pool_size),
+                    RateLimiter(rate, burst=float(os.getenv('AMADEUS_RATE_BURST', rate))),
+                    max_retries=int(os.getenv('AMADEUS_MAX_RETRIES', DEFAULT_MAX_RETRIES)),
+                    backoff_base=float(os.getenv('AMADEUS_BACKOFF_BASE', 0.5)),
+                    backoff_max=float(os.getenv('AMADEUS_BACKOFF_MAX', 8.0)),
+                    failure_threshold=int(os.getenv('AMADEUS_BREAKER_THRESHOLD', 5)),
+                    reset_timeout=float(os.getenv('AMADEUS_BREAKER_RESET', 30.0))
+                )
+                client = Client(
+                    client_id=client_id,
+                    client_secret=client_secret,
+                    http=transport
+                )
+                client.access_token = _SharedAccessToken(client)
+                _client = client
+    return _client
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+# Cold-import benchmark: each module is imported in a fresh interpreter with no
+# Amadeus/OpenAI credentials set, so this also checks that importing never needs them.
+#
+#   python bench_import.py [module ...]
+
+MODULES = ["flight_stuff.run_flight_agent", "hotel.hotels", "travel_agents"]
+RUNS = 5
+
+SNIPPET = (
+    "import time; start = time.perf_counter(); import {module}; "
+    "print((time.perf_counter() - start) * 1000)"
+)
+
+
+def cold_import_ms(module, runs=RUNS):
+    """Best-of-N wall time in milliseconds to import module in a new process, or None if it fails."""
+    env = {k: v for k, v in os.environ.items()
+           if not k.startswith("AMADEUS_") and k != "OPENAI_API_KEY"}
+    times = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(module=module)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()
+            print(f"{module}: import failed ({error[-1] if error else 'unknown error'})")
+            return None
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return min(times)
+
+
+if __name__ == "__main__":
+    for module in sys.argv[1:] or MODULES:
+        elapsed = cold_import_ms(module)
+        if elapsed is not None:
+            print(f"{module}: {elapsed:.1f} ms")
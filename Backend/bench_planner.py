@@ -0,0 +1,42 @@
+import sys
+import time
+
+# Wall-clock comparison of the two trip planner modes on the same request:
+# the agent handoff loop (one LLM round trip per hop, searches in sequence)
+# and the fast path (one LLM call, searches run concurrently in code).
+# Needs real OpenAI, Amadeus and Google Calendar credentials.
+#
+#   python bench_planner.py ["request text"] [runs]
+
+REQUEST = ("Plan a weekend trip from Indianapolis (IND Airport) to New York City (JFK Airport), "
+           "make sure it doesn't conflict with my calendar.")
+MODES = ["agents", "fast"]
+
+
+def time_mode(request, mode, runs=1):
+    """Wall-clock seconds of each run of plan_trip in the given mode, plus the last plan."""
+    import travel_agents
+    times, plan = [], None
+    for _ in range(runs):
+        start = time.perf_counter()
+        plan = travel_agents.plan_trip(request, mode=mode)
+        times.append(time.perf_counter() - start)
+    return times, plan
+
+
+if __name__ == "__main__":
+    request = sys.argv[1] if len(sys.argv) > 1 else REQUEST
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    results = {}
+    for mode in MODES:
+        try:
+            times, plan = time_mode(request, mode, runs)
+        except Exception as e:
+            # e.g. missing credentials; still time the other mode
+            print(f"{mode:>6}: failed: {e}")
+            continue
+        results[mode] = min(times)
+        print(f"{mode:>6}: best {min(times):6.1f} s of {runs} run(s), status {plan['status']}, "
+              f"total ${plan['travel_plan']['total_cost']:.2f}")
+    if len(results) == len(MODES):
+        print(f"fast path is {results['agents'] / results['fast']:.1f}x faster")
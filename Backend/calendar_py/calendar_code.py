@@ -2,23 +2,52 @@ from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
-from datetime import datetime, timedelta, date
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, date, timezone
 import os.path
 import json
+import threading
 from dotenv import load_dotenv
 
+if __package__:
+    from calendar_py import intervals
+    from calendar_py.event_store import get_event_store
+    from calendar_py.service_pool import get_service_pool
+else:
+    # Imported by the scripts inside calendar_py
+    import intervals
+    from event_store import get_event_store
+    from service_pool import get_service_pool
+
 # If modifying these scopes, delete the file token.json
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
 
+# Only the event fields we keep, so Google sends (and we parse) less
+EVENT_FIELDS = 'id,summary,description,location,start,end,status,created,updated,creator,organizer,attendees'
+EVENTS_PAGE_SIZE = 250
+
+# freebusy().query accepts at most this many calendars per request
+FREEBUSY_MAX_CALENDARS = 50
+
+# Maximum number of calendars fetched at the same time
+CALENDAR_FETCH_WORKERS = 8
+
 # Global service variable to reuse the authenticated service
 _service = None
+# Credentials behind _service, used to build one service per worker thread
+_credentials = None
+# httplib2 (used by the service objects) is not thread-safe, so each thread gets its own
+_thread_local = threading.local()
+# Worker threads are kept between calls so their service objects are reused
+_fetch_pool = None
+_fetch_pool_lock = threading.Lock()
 
 def get_calendar_service():
     """
     Set up and return an authenticated Google Calendar service
     using credentials from a config file
     """
-    global _service
+    global _service, _credentials
     if _service is not None:
         return _service
 
@@ -90,11 +119,54 @@ def get_calendar_service():
 
     try:
         _service = build('calendar', 'v3', credentials=creds)
+        _credentials = creds
         return _service
     except Exception as e:
         print(f"Error building calendar service: {e}")
         return None
 
+def get_thread_calendar_service():
+    """
+    Return a Google Calendar service for the calling thread, sharing the
+    credentials of get_calendar_service() but not its HTTP connection
+    """
+    if get_calendar_service() is None:
+        return None
+    
+    service = getattr(_thread_local, 'service', None)
+    if service is None:
+        try:
+            service = build('calendar', 'v3', credentials=_credentials)
+        except Exception as e:
+            print(f"Error building calendar service: {e}")
+            return None
+        _thread_local.service = service
+    return service
+
+def get_user_calendar_service(user_id):
+    """
+    Return a Google Calendar service for user_id to use on the calling thread,
+    from the multi-user service pool (tokens stored per user)
+    """
+    try:
+        return get_service_pool().get(user_id)
+    except Exception as e:
+        print(f"Error getting calendar service for user {user_id}: {e}")
+        return None
+
+def _service_for(user_id=None):
+    # The single token.json user, or a pooled per-user service
+    if user_id is None:
+        return get_thread_calendar_service()
+    return get_user_calendar_service(user_id)
+
+def _get_fetch_pool():
+    global _fetch_pool
+    with _fetch_pool_lock:
+        if _fetch_pool is None:
+            _fetch_pool = ThreadPoolExecutor(max_workers=CALENDAR_FETCH_WORKERS, thread_name_prefix="calendar")
+        return _fetch_pool
+
 def list_all_calendars(service):
     """
     List all calendars the user has access to
@@ -127,7 +199,66 @@ def list_all_calendars(service):
         print(f'An error occurred while listing calendars: {error}')
         return []
 
-def get_calendar_events_single(start_date, end_date, calendar_id='primary', calendar_name=None):
+def iter_calendar_events(service, calendar_id, time_min, time_max, page_size=EVENTS_PAGE_SIZE, fields=EVENT_FIELDS):
+    """
+    Lazily yield events from one calendar, following nextPageToken
+    
+    Pages are only requested as the caller iterates, so breaking out of the
+    loop early skips the remaining pages.
+    
+    Args:
+        service: Authenticated Calendar service
+        calendar_id (str): Calendar ID to read
+        time_min (str): RFC3339 lower bound on event end time
+        time_max (str): RFC3339 upper bound on event start time
+        page_size (int, optional): Events per page (the API allows up to 2500)
+        fields (str, optional): Event fields to request, or None for full resources
+        
+    Yields:
+        dict: Event resources in start time order
+    """
+    params = {
+        'calendarId': calendar_id,
+        'timeMin': time_min,
+        'timeMax': time_max,
+        'singleEvents': True,
+        'orderBy': 'startTime',
+        'maxResults': page_size
+    }
+    if fields:
+        params['fields'] = f'nextPageToken,items({fields})'
+    
+    page_token = None
+    while True:
+        if page_token:
+            params['pageToken'] = page_token
+        page = service.events().list(**params).execute()
+        yield from page.get('items', [])
+        
+        page_token = page.get('nextPageToken')
+        if not page_token:
+            return
+
+def format_event(event, calendar_id, calendar_name=None):
+    """Transform a Calendar API event into the format returned by get_calendar_events"""
+    return {
+        'id': event.get('id'),
+        'summary': event.get('summary'),
+        'description': event.get('description'),
+        'location': event.get('location'),
+        'start': event.get('start'),
+        'end': event.get('end'),
+        'status': event.get('status'),
+        'created': event.get('created'),
+        'updated': event.get('updated'),
+        'creator': event.get('creator'),
+        'organizer': event.get('organizer'),
+        'attendees': event.get('attendees'),
+        'calendar_id': calendar_id,
+        'calendar_name': calendar_name or calendar_id
+    }
+
+def get_calendar_events_single(start_date, end_date, calendar_id='primary', calendar_name=None, service=None, user_id=None):
     """
     Fetch events from a single Google Calendar for a specified date range
     
@@ -136,11 +267,13 @@ def get_calendar_events_single(start_date, end_date, calendar_id='primary', cale
         end_date (str, optional): End date in 'YYYY-MM-DD' format. Defaults to 7 days from start date.
         calendar_id (str, optional): Calendar ID to fetch events from. Defaults to 'primary'.
         calendar_name (str, optional): Name of the calendar for display purposes.
+        service (optional): Calendar service to use. Defaults to the calling thread's service for user_id.
+        user_id (str, optional): User whose calendar to read. Defaults to the token.json user.
         
     Returns:
         dict: JSON-serializable dictionary containing calendar events
     """
-    service = get_calendar_service()
+    service = service or _service_for(user_id)
     
     if not service:
         return {"error": "Not authenticated"}
@@ -163,37 +296,23 @@ def get_calendar_events_single(start_date, end_date, calendar_id='primary', cale
     time_max = end_datetime.isoformat() + 'Z'
     
     try:
-        # Call the Calendar API
-        events_result = service.events().list(
-            calendarId=calendar_id,
-            timeMin=time_min,
-            timeMax=time_max,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        
-        events = events_result.get('items', [])
+        # Bring the local copy up to date (only changes since the last sync are downloaded),
+        # then answer the range from it
+        store = get_event_store()
+        store_key = f"{user_id}/{calendar_id}" if user_id else calendar_id
+        try:
+            store.sync(service, calendar_id, store_key, time_min, time_max)
+            events = store.events(store_key, time_min, time_max)
+        except Exception as error:
+            if store.has_synced(store_key):
+                print(f"Could not sync '{calendar_name or calendar_id}', using stored events: {error}")
+                events = store.events(store_key, time_min, time_max)
+            else:
+                # Nothing stored yet; read the range straight from the API
+                print(f"Could not sync '{calendar_name or calendar_id}': {error}")
+                events = iter_calendar_events(service, calendar_id, time_min, time_max)
         
-        # Transform the response into a cleaner format
-        formatted_events = []
-        for event in events:
-            formatted_event = {
-                'id': event.get('id'),
-                'summary': event.get('summary'),
-                'description': event.get('description'),
-                'location': event.get('location'),
-                'start': event.get('start'),
-                'end': event.get('end'),
-                'status': event.get('status'),
-                'created': event.get('created'),
-                'updated': event.get('updated'),
-                'creator': event.get('creator'),
-                'organizer': event.get('organizer'),
-                'attendees': event.get('attendees'),
-                'calendar_id': calendar_id,
-                'calendar_name': calendar_name or calendar_id
-            }
-            formatted_events.append(formatted_event)
+        formatted_events = [format_event(event, calendar_id, calendar_name) for event in events]
         
         result = {
             'totalEvents': len(formatted_events),
@@ -210,39 +329,43 @@ def get_calendar_events_single(start_date, end_date, calendar_id='primary', cale
         print(f'An error occurred: {error}')
         return {"error": str(error)}
 
-def get_calendar_events(start_date, end_date, calendar_id=None):
+def get_calendar_events(start_date, end_date, calendar_id=None, user_id=None):
     """
     Fetch events from Google Calendar for a specified date range.
     If calendar_id is None, gets events from all calendars.
+    Events are read from the local event store after an incremental sync.
     
     Args:
         start_date (str, optional): Start date in 'YYYY-MM-DD' format. Defaults to today.
         end_date (str, optional): End date in 'YYYY-MM-DD' format. Defaults to 7 days from start date.
         calendar_id (str, optional): Calendar ID to fetch events from. If None, fetches from all calendars.
+        user_id (str, optional): User whose calendars to read. Defaults to the token.json user.
         
     Returns:
         dict: JSON-serializable dictionary containing calendar events
     """
     # If a specific calendar ID is provided, get events only from that calendar
     if calendar_id:
-        return get_calendar_events_single(start_date, end_date, calendar_id)
+        return get_calendar_events_single(start_date, end_date, calendar_id, user_id=user_id)
     
     # Otherwise, get events from all calendars
-    return get_all_calendars_events(start_date, end_date)
+    return get_all_calendars_events(start_date, end_date, user_id)
 
-def get_all_calendars_events(start_date=None, end_date=None):
+def get_all_calendars_events(start_date=None, end_date=None, user_id=None):
     """
     Fetch events from all available calendars for a specified date range
     
     Args:
         start_date (str, optional): Start date in 'YYYY-MM-DD' format. Defaults to today.
         end_date (str, optional): End date in 'YYYY-MM-DD' format. Defaults to 7 days from start date.
+        user_id (str, optional): User whose calendars to read. Defaults to the token.json user.
         
     Returns:
         dict: JSON-serializable dictionary containing calendar events from all calendars
     """
     # Get all available calendars
-    calendars = list_all_calendars()
+    service = _service_for(user_id)
+    calendars = list_all_calendars(service) if service else []
     
     if not calendars:
         return {"error": "No calendars found or not authenticated"}
@@ -254,18 +377,22 @@ def get_all_calendars_events(start_date=None, end_date=None):
         primary_text = " (Primary)" if calendar.get('primary') else ""
         print(f"{i}. {calendar['summary']}{primary_text}")
     
-    # Collect events from all calendars
+    def fetch(calendar):
+        return get_calendar_events_single(start_date, end_date, calendar['id'], calendar['summary'],
+                                          service=_service_for(user_id), user_id=user_id)
+    
+    # Fetch every calendar concurrently; each worker thread uses its own service object
+    print(f"\nFetching events from {len(calendars)} calendars...")
+    calendar_data_list = list(_get_fetch_pool().map(fetch, calendars))
+    
+    # Merge the results in calendar order
     all_events = []
     total_events = 0
     calendar_results = {}
     
-    for calendar in calendars:
-        calendar_id = calendar['id']
+    for calendar, calendar_data in zip(calendars, calendar_data_list):
         calendar_name = calendar['summary']
         
-        print(f"\nFetching events from '{calendar_name}'...")
-        calendar_data = get_calendar_events_single(start_date, end_date, calendar_id, calendar_name)
-        
         if 'error' not in calendar_data:
             events_count = calendar_data['totalEvents']
             total_events += events_count
@@ -273,11 +400,13 @@ def get_all_calendars_events(start_date=None, end_date=None):
             
             # Store individual calendar results
             calendar_results[calendar_name] = {
-                'id': calendar_id,
+                'id': calendar['id'],
                 'events_count': events_count
             }
             
             print(f"Found {events_count} events in '{calendar_name}'")
+        else:
+            print(f"Could not fetch '{calendar_name}': {calendar_data['error']}")
     
     # Create consolidated result
     date_range = None
@@ -301,4 +430,78 @@ def get_all_calendars_events(start_date=None, end_date=None):
         'events': all_events
     }
     
-    return result
\ No newline at end of file
+    return result
+
+def _format_rfc3339(moment):
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def get_free_busy(start_date=None, end_date=None, calendar_ids=None, min_minutes=0, user_id=None):
+    """
+    Find when the user is free using the FreeBusy API instead of downloading events
+    
+    Busy intervals for every calendar come back from a single freebusy().query
+    (one per 50 calendars), then are merged into free windows.
+    
+    Args:
+        start_date (str, optional): Start date in 'YYYY-MM-DD' format. Defaults to today.
+        end_date (str, optional): End date in 'YYYY-MM-DD' format. Defaults to 7 days from start date.
+        calendar_ids (list, optional): Calendars to check. Defaults to all calendars.
+        min_minutes (int, optional): Leave out free windows shorter than this.
+        user_id (str, optional): User whose calendars to check. Defaults to the token.json user.
+        
+    Returns:
+        dict: Date range, merged busy intervals and free windows (UTC RFC3339)
+    """
+    service = _service_for(user_id)
+    
+    if not service:
+        return {"error": "Not authenticated"}
+    
+    start_datetime = datetime.strptime(start_date or date.today().strftime('%Y-%m-%d'), '%Y-%m-%d')
+    if not end_date:
+        end_datetime = start_datetime + timedelta(days=7)
+    else:
+        end_datetime = datetime.strptime(end_date, '%Y-%m-%d')
+    time_min = start_datetime.isoformat() + 'Z'
+    time_max = end_datetime.isoformat() + 'Z'
+    
+    if calendar_ids is None:
+        calendar_ids = [calendar['id'] for calendar in list_all_calendars(service)]
+    if not calendar_ids:
+        return {"error": "No calendars found"}
+    
+    busy = []
+    try:
+        for i in range(0, len(calendar_ids), FREEBUSY_MAX_CALENDARS):
+            chunk = calendar_ids[i:i + FREEBUSY_MAX_CALENDARS]
+            response = service.freebusy().query(body={
+                'timeMin': time_min,
+                'timeMax': time_max,
+                'items': [{'id': calendar_id} for calendar_id in chunk]
+            }).execute()
+            
+            for calendar_id, calendar in response.get('calendars', {}).items():
+                if calendar.get('errors'):
+                    print(f"Could not read free/busy for '{calendar_id}': {calendar['errors']}")
+                for interval in calendar.get('busy', []):
+                    busy.append((intervals.to_utc(interval['start']), intervals.to_utc(interval['end'])))
+    except Exception as error:
+        print(f'An error occurred: {error}')
+        return {"error": str(error)}
+    
+    # Merge overlapping busy intervals, then the gaps between them are free
+    merged = intervals.merge_intervals(busy)
+    free = [
+        {'start': _format_rfc3339(start), 'end': _format_rfc3339(end), 'minutes': int((end - start).total_seconds() // 60)}
+        for start, end in intervals.free_slots(merged, intervals.to_utc(time_min), intervals.to_utc(time_max), min_minutes)
+    ]
+    
+    return {
+        'dateRange': {
+            'start': time_min,
+            'end': time_max
+        },
+        'calendarsChecked': len(calendar_ids),
+        'busy': [{'start': _format_rfc3339(start), 'end': _format_rfc3339(end)} for start, end in merged],
+        'free': free
+    }
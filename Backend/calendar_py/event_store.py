@@ -0,0 +1,257 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from googleapiclient.errors import HttpError
+
+if __package__:
+    from calendar_py import intervals
+else:
+    import intervals
+
+# Full event fields stored locally; status tells us which synced events were deleted
+SYNC_FIELDS = 'id,summary,description,location,start,end,status,created,updated,creator,organizer,attendees'
+SYNC_PAGE_SIZE = 2500
+
+# A full sync covers this window around now; with singleEvents=True an unbounded
+# sync would expand recurring events without an end date forever
+SYNC_PAST_DAYS = 90
+SYNC_FUTURE_DAYS = 365
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'events.db')
+
+
+def event_timestamp(when, time_zone=intervals.DEFAULT_TIMEZONE):
+    """
+    Convert an event start/end ({'dateTime': ...} or {'date': ...}) to a UTC epoch timestamp.
+    All-day dates start at midnight in the calendar's time zone, as in intervals.to_utc.
+    """
+    if not when:
+        return None
+    try:
+        return intervals.to_utc(when, time_zone).timestamp()
+    except ValueError:
+        return None
+
+
+def _format_rfc3339(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class EventStore:
+    """
+    Local SQLite copy of Google Calendar events, kept current with syncToken.
+
+    The first sync of a calendar downloads every event; later syncs send the
+    stored syncToken so Google returns only events changed or deleted since.
+    When Google invalidates the token (HTTP 410) the calendar is dropped and
+    fully resynced. Range queries are answered from the start/end index.
+
+    A full sync downloads the window from past_days ago to future_days ahead.
+    Asking to sync a range outside the stored window runs a new full sync
+    with the window widened to cover it.
+
+    Syncs of one calendar run one at a time, so a full sync's clear and
+    re-download never interleave with another sync of the same calendar.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, past_days=SYNC_PAST_DAYS, future_days=SYNC_FUTURE_DAYS):
+        self.db_path = db_path
+        self.past_days = past_days
+        self.future_days = future_days
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._sync_locks = {}
+        with self._lock:
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS events ("
+                "calendar_id TEXT NOT NULL, event_id TEXT NOT NULL, start_ts REAL, end_ts REAL, "
+                "payload TEXT NOT NULL, PRIMARY KEY (calendar_id, event_id));"
+                "CREATE INDEX IF NOT EXISTS events_by_time ON events (calendar_id, start_ts, end_ts);"
+                "CREATE TABLE IF NOT EXISTS sync_state ("
+                "calendar_id TEXT PRIMARY KEY, sync_token TEXT, synced_at REAL NOT NULL);"
+            )
+            # Stores from before the sync window and time zone were kept get the columns added;
+            # their calendars have no window yet, so they are fully resynced once
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(sync_state)")}
+            for column, kind in (('window_start', 'REAL'), ('window_end', 'REAL'), ('time_zone', 'TEXT')):
+                if column not in columns:
+                    self._db.execute(f"ALTER TABLE sync_state ADD COLUMN {column} {kind}")
+            self._db.commit()
+
+    def sync(self, service, calendar_id, key=None, time_min=None, time_max=None):
+        """
+        Bring a calendar up to date with Google.
+
+        Args:
+            service: Authenticated Calendar service
+            calendar_id (str): Calendar ID to sync
+            key (str, optional): Name to store the calendar under, e.g. to keep
+                different users' 'primary' calendars apart. Defaults to calendar_id.
+            time_min (str, optional): RFC3339 start of the range about to be queried
+            time_max (str, optional): RFC3339 end of the range about to be queried
+
+        Returns:
+            int: Number of events added, changed or deleted
+        """
+        key = key or calendar_id
+        with self._sync_lock(key):
+            return self._sync_calendar(service, calendar_id, key, time_min, time_max)
+
+    def _sync_lock(self, key):
+        with self._lock:
+            return self._sync_locks.setdefault(key, threading.Lock())
+
+    def _sync_calendar(self, service, calendar_id, key, time_min, time_max):
+        start = event_timestamp({'dateTime': time_min}) if time_min else None
+        end = event_timestamp({'dateTime': time_max}) if time_max else None
+        # Read under the sync lock, so a sync that waited for another one continues from its token
+        state = self._sync_state(key)
+        if state and state['sync_token'] and self._covers(state, start, end):
+            try:
+                return self._sync(service, calendar_id, key, state, state['sync_token'])
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                print(f"Sync token for '{calendar_id}' expired, running a full sync")
+
+        now = time.time()
+        window_start = now - self.past_days * 86400
+        window_end = now + self.future_days * 86400
+        if start is not None:
+            window_start = min(window_start, start)
+        if end is not None:
+            window_end = max(window_end, end)
+        self.clear(key)
+        return self._sync(service, calendar_id, key, {'window_start': window_start, 'window_end': window_end,
+                                                      'time_zone': None}, None)
+
+    @staticmethod
+    def _covers(state, start, end):
+        if state['window_start'] is None or state['window_end'] is None or not state['time_zone']:
+            return False
+        return (start is None or start >= state['window_start']) and (end is None or end <= state['window_end'])
+
+    def _sync(self, service, calendar_id, key, state, sync_token):
+        params = {
+            'calendarId': calendar_id,
+            'singleEvents': True,
+            'maxResults': SYNC_PAGE_SIZE,
+            'fields': f'nextPageToken,nextSyncToken,timeZone,items({SYNC_FIELDS})'
+        }
+        if sync_token:
+            # Google rejects timeMin/timeMax on incremental syncs; the token remembers the window
+            params['syncToken'] = sync_token
+        else:
+            params['timeMin'] = _format_rfc3339(state['window_start'])
+            params['timeMax'] = _format_rfc3339(state['window_end'])
+
+        time_zone = state['time_zone']
+        changes = 0
+        while True:
+            page = service.events().list(**params).execute()
+            time_zone = page.get('timeZone') or time_zone or intervals.DEFAULT_TIMEZONE
+            items = page.get('items', [])
+            self._apply(key, items, time_zone)
+            changes += len(items)
+
+            if page.get('nextPageToken'):
+                params['pageToken'] = page['nextPageToken']
+                continue
+
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sync_state "
+                    "(calendar_id, sync_token, synced_at, window_start, window_end, time_zone) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, page.get('nextSyncToken'), time.time(), state['window_start'], state['window_end'],
+                     time_zone)
+                )
+                self._db.commit()
+            return changes
+
+    def _apply(self, calendar_id, items, time_zone):
+        deleted = [(calendar_id, e['id']) for e in items if e.get('status') == 'cancelled']
+        upserts = [
+            (calendar_id, e['id'], event_timestamp(e.get('start'), time_zone),
+             event_timestamp(e.get('end'), time_zone), json.dumps(e))
+            for e in items if e.get('status') != 'cancelled'
+        ]
+        with self._lock:
+            self._db.executemany("DELETE FROM events WHERE calendar_id = ? AND event_id = ?", deleted)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO events (calendar_id, event_id, start_ts, end_ts, payload) "
+                "VALUES (?, ?, ?, ?, ?)",
+                upserts
+            )
+            self._db.commit()
+
+    def events(self, calendar_id, time_min, time_max):
+        """
+        Stored events overlapping [time_min, time_max), ordered by start time.
+
+        Args:
+            calendar_id (str): Calendar ID
+            time_min (str): RFC3339 range start
+            time_max (str): RFC3339 range end
+
+        Returns:
+            list: Event resources as returned by the Calendar API
+        """
+        start = event_timestamp({'dateTime': time_min})
+        end = event_timestamp({'dateTime': time_max})
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT payload FROM events WHERE calendar_id = ? AND start_ts < ? AND end_ts > ? "
+                "ORDER BY start_ts",
+                (calendar_id, end, start)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def sync_token(self, calendar_id):
+        state = self._sync_state(calendar_id)
+        return state['sync_token'] if state else None
+
+    def _sync_state(self, calendar_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT sync_token, window_start, window_end, time_zone FROM sync_state WHERE calendar_id = ?",
+                (calendar_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return dict(zip(('sync_token', 'window_start', 'window_end', 'time_zone'), row))
+
+    def has_synced(self, calendar_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM sync_state WHERE calendar_id = ?", (calendar_id,)
+            ).fetchone()
+        return row is not None
+
+    def clear(self, calendar_id):
+        """Forget every stored event and the sync token of a calendar."""
+        with self._lock:
+            self._db.execute("DELETE FROM events WHERE calendar_id = ?", (calendar_id,))
+            self._db.execute("DELETE FROM sync_state WHERE calendar_id = ?", (calendar_id,))
+            self._db.commit()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_event_store():
+    """
+    Return the process-wide event store, creating it on first use.
+    Its location comes from CALENDAR_EVENT_DB (default: events.db next to this file).
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = EventStore(os.getenv('CALENDAR_EVENT_DB') or DEFAULT_DB_PATH)
+    return _store
@@ -0,0 +1,182 @@
+"""
+Interval algebra for calendar events.
+
+Events are normalized to aware UTC datetimes (timed events keep their offset,
+all-day events start at local midnight in the calendar's timezone), then
+merged and searched for gaps with a single sorted sweep. Everything here is
+deterministic and runs in O(n log n).
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+DEFAULT_TIMEZONE = 'America/New_York'
+
+
+def to_utc(when, default_tz=DEFAULT_TIMEZONE):
+    """
+    Convert a Calendar API start/end value to an aware UTC datetime
+
+    Args:
+        when (dict | str | datetime): {'dateTime': ..., 'timeZone': ...}, {'date': 'YYYY-MM-DD'},
+            an ISO string or a datetime
+        default_tz (str, optional): Timezone for all-day dates and naive times
+            when the value carries none
+
+    Returns:
+        datetime: Aware datetime in UTC
+    """
+    tz_name = default_tz
+    if isinstance(when, dict):
+        tz_name = when.get('timeZone') or default_tz
+        when = when.get('dateTime') or when.get('date')
+    if isinstance(when, str):
+        if len(when) == 10:
+            when = date.fromisoformat(when)
+        else:
+            when = datetime.fromisoformat(when.replace('Z', '+00:00'))
+    if isinstance(when, date) and not isinstance(when, datetime):
+        when = datetime.combine(when, time.min)
+    if when is None:
+        raise ValueError('Event time has neither dateTime nor date')
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=ZoneInfo(tz_name))
+    return when.astimezone(timezone.utc)
+
+
+def event_interval(event, default_tz=DEFAULT_TIMEZONE):
+    """(start, end) in UTC for an event with Calendar API 'start' and 'end' fields."""
+    start = to_utc(event['start'], default_tz)
+    end = to_utc(event['end'], default_tz)
+    return start, max(start, end)
+
+
+def events_to_intervals(events, default_tz=DEFAULT_TIMEZONE, skip_cancelled=True):
+    """Busy intervals for a list of events; cancelled events and events without times are skipped."""
+    intervals = []
+    for event in events:
+        if skip_cancelled and event.get('status') == 'cancelled':
+            continue
+        if not event.get('start') or not event.get('end'):
+            continue
+        intervals.append(event_interval(event, default_tz))
+    return intervals
+
+
+def merge_intervals(intervals):
+    """
+    Merge overlapping or touching intervals
+
+    Args:
+        intervals (iterable): (start, end) pairs in any order
+
+    Returns:
+        list: Disjoint (start, end) tuples sorted by start
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_slots(busy, window_start, window_end, min_minutes=60, buffer_minutes=0):
+    """
+    Gaps between busy intervals inside a window
+
+    Args:
+        busy (iterable): (start, end) busy intervals, overlapping or not
+        window_start (datetime): Start of the window to search
+        window_end (datetime): End of the window to search
+        min_minutes (int, optional): Shortest gap to return
+        buffer_minutes (int, optional): Time kept clear before and after each busy interval
+
+    Returns:
+        list: (start, end) free slots sorted by start, each at least min_minutes long
+    """
+    buffer = timedelta(minutes=buffer_minutes)
+    minimum = timedelta(minutes=min_minutes)
+    padded = merge_intervals((start - buffer, end + buffer) for start, end in busy)
+
+    slots = []
+    cursor = window_start
+    for start, end in padded:
+        # Zero-length intervals (e.g. reminders) don't block any time
+        if end <= cursor or end <= start:
+            continue
+        if start >= window_end:
+            break
+        if start - cursor >= minimum and start > cursor:
+            slots.append((cursor, start))
+        cursor = max(cursor, end)
+    if window_end - cursor >= minimum and window_end > cursor:
+        slots.append((cursor, window_end))
+    return slots
+
+
+def daily_windows(start_day, end_day, day_start=time(8), day_end=time(22), tz=DEFAULT_TIMEZONE):
+    """
+    The [day_start, day_end) local window of each day from start_day to end_day inclusive, in UTC
+
+    Args:
+        start_day (date): First day
+        end_day (date): Last day
+        day_start (time, optional): Local time the day's activities may begin
+        day_end (time, optional): Local time they must end
+        tz (str, optional): Timezone the times are local to
+
+    Returns:
+        list: (start, end) UTC tuples, one per day
+    """
+    zone = ZoneInfo(tz)
+    windows = []
+    day = start_day
+    while day <= end_day:
+        windows.append((
+            datetime.combine(day, day_start, zone).astimezone(timezone.utc),
+            datetime.combine(day, day_end, zone).astimezone(timezone.utc)
+        ))
+        day += timedelta(days=1)
+    return windows
+
+
+def find_free_slots(events, start_day, end_day, min_minutes=60, buffer_minutes=15,
+                    day_start=time(8), day_end=time(22), tz=DEFAULT_TIMEZONE):
+    """
+    Free slots of at least min_minutes during each day's waking hours, around the given events
+
+    Returns:
+        list: (start, end) UTC tuples sorted by start
+    """
+    busy = merge_intervals(events_to_intervals(events, tz))
+    slots = []
+    for window_start, window_end in daily_windows(start_day, end_day, day_start, day_end, tz):
+        slots.extend(free_slots(busy, window_start, window_end, min_minutes, buffer_minutes))
+    return slots
+
+
+def find_conflicts(candidates, busy):
+    """
+    Which candidate intervals overlap a busy interval
+
+    Args:
+        candidates (list): (start, end) intervals to check
+        busy (iterable): (start, end) busy intervals
+
+    Returns:
+        list: Indices into candidates of the intervals that overlap something busy
+    """
+    merged = merge_intervals(busy)
+    order = sorted(range(len(candidates)), key=lambda i: candidates[i][0])
+    conflicts = []
+    j = 0
+    for i in order:
+        start, end = candidates[i]
+        # Busy intervals ending before this candidate starts can't overlap later candidates either
+        while j < len(merged) and merged[j][1] <= start:
+            j += 1
+        if j < len(merged) and merged[j][0] < end:
+            conflicts.append(i)
+    return sorted(conflicts)
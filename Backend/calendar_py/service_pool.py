@@ -0,0 +1,199 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import google_auth_httplib2
+import httplib2
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import DISCOVERY_URI, V2_DISCOVERY_URI, build_from_document
+from googleapiclient.errors import HttpError
+
+SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+
+DEFAULT_TOKEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tokens')
+DEFAULT_MAX_USERS = 64
+# Refresh access tokens this long before they expire instead of on the first 401
+DEFAULT_REFRESH_MARGIN = timedelta(minutes=5)
+HTTP_TIMEOUT_SECONDS = 30
+
+
+def _static_discovery():
+    """The Calendar discovery document bundled with googleapiclient, or None on versions without it"""
+    try:
+        from googleapiclient.discovery_cache import get_static_doc
+    except ImportError:
+        return None
+    return get_static_doc('calendar', 'v3')
+
+
+def _fetch_discovery(http):
+    """Download the Calendar discovery document from the same URLs build() tries"""
+    for uri in (DISCOVERY_URI, V2_DISCOVERY_URI):
+        uri = uri.format(api='calendar', apiVersion='v3')
+        response, content = http.request(uri)
+        if response.status < 400:
+            return content
+    raise HttpError(response, content, uri=uri)
+
+
+class CredentialStore:
+    """
+    OAuth credentials per user, one authorized-user JSON file each
+    (the same format as token.json)
+    """
+
+    def __init__(self, directory=DEFAULT_TOKEN_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, user_id):
+        return os.path.join(self.directory, re.sub(r'[^A-Za-z0-9_.@-]', '_', user_id) + '.json')
+
+    def load(self, user_id):
+        """Stored credentials for user_id, or None if the user never authorized"""
+        path = self._path(user_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as token_file:
+            return Credentials.from_authorized_user_info(json.load(token_file), SCOPES)
+
+    def save(self, user_id, creds):
+        """Store credentials, replacing the file atomically so readers never see half a token"""
+        path = self._path(user_id)
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w') as token_file:
+            token_file.write(creds.to_json())
+        os.replace(temp_path, path)
+
+
+class _UserServices:
+    """One user's credentials plus a Calendar service per thread"""
+
+    def __init__(self, creds):
+        self.creds = creds
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+
+class CalendarServicePool:
+    """
+    Thread-safe pool of Google Calendar services for many users
+
+    Services are kept for the max_users most recently used users (LRU). Each
+    thread gets its own service and httplib2 transport per user, because
+    httplib2 connections must not be shared between threads; the user's
+    credentials are shared and refreshed ahead of expiry under a per-user lock.
+    The Calendar discovery document is loaded (or, without a bundled copy,
+    downloaded) and parsed once, then reused for every build.
+    """
+
+    def __init__(self, store=None, max_users=DEFAULT_MAX_USERS, refresh_margin=DEFAULT_REFRESH_MARGIN):
+        self.store = store or CredentialStore()
+        self.max_users = max_users
+        self.refresh_margin = refresh_margin
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        self._discovery = None
+        self._discovery_lock = threading.Lock()
+
+    def get(self, user_id):
+        """
+        Calendar service for user_id to use on the calling thread
+
+        Raises:
+            LookupError: If the user has no stored credentials
+        """
+        entry = self._entry(user_id)
+        self._refresh_if_expiring(user_id, entry)
+
+        service = getattr(entry.local, 'service', None)
+        if service is None:
+            http = google_auth_httplib2.AuthorizedHttp(entry.creds, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS))
+            service = self._build(http)
+            entry.local.service = service
+        return service
+
+    def add_user(self, user_id, creds):
+        """Store newly authorized credentials for a user and drop any services built with the old ones"""
+        self.store.save(user_id, creds)
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def evict(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def _entry(self, user_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                self._users.move_to_end(user_id)
+                return entry
+
+        creds = self.store.load(user_id)
+        if creds is None:
+            raise LookupError(f'No stored calendar credentials for user {user_id}')
+
+        with self._lock:
+            # Another thread may have loaded the same user meanwhile
+            entry = self._users.get(user_id)
+            if entry is None:
+                entry = _UserServices(creds)
+                self._users[user_id] = entry
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            self._users.move_to_end(user_id)
+            return entry
+
+    def _refresh_if_expiring(self, user_id, entry):
+        if not self._expiring(entry.creds):
+            return
+        with entry.lock:
+            # Only the first thread to get here refreshes
+            if not self._expiring(entry.creds):
+                return
+            if not entry.creds.refresh_token:
+                raise LookupError(f'Calendar credentials for user {user_id} expired and cannot be refreshed')
+            entry.creds.refresh(Request())
+            self.store.save(user_id, entry.creds)
+
+    def _expiring(self, creds):
+        if not creds.token:
+            return True
+        if creds.expiry is None:
+            return False
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return creds.expiry - now <= self.refresh_margin
+
+    def _build(self, http):
+        return build_from_document(self._discovery_document(http), http=http)
+
+    def _discovery_document(self, http):
+        if self._discovery is None:
+            with self._discovery_lock:
+                # Only the first thread to get here loads or downloads the document
+                if self._discovery is None:
+                    self._discovery = json.loads(_static_discovery() or _fetch_discovery(http))
+        return self._discovery
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_service_pool():
+    """
+    Return the process-wide service pool, creating it on first use.
+    Per-user tokens are read from CALENDAR_TOKEN_DIR (default: tokens/ next to this file).
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = CalendarServicePool(CredentialStore(os.getenv('CALENDAR_TOKEN_DIR') or DEFAULT_TOKEN_DIR))
+    return _pool
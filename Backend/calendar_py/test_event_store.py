@@ -0,0 +1,175 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from event_store import EventStore
+
+
+def event(event_id, start, end, **fields):
+    return dict({'id': event_id, 'summary': event_id, 'start': start, 'end': end}, **fields)
+
+
+def timed(event_id, day, start_hour, end_hour):
+    return event(event_id, {'dateTime': f'{day}T{start_hour:02d}:00:00Z'}, {'dateTime': f'{day}T{end_hour:02d}:00:00Z'})
+
+
+class FakeService:
+    """Answers events().list(...).execute() from a queue of pages (or exceptions) and records the params."""
+
+    def __init__(self, *pages, delay=0.0):
+        self.pages = list(pages)
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        self.calls.append(params)
+        return self
+
+    def execute(self):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            page = self.pages.pop(0)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        if isinstance(page, Exception):
+            raise page
+        return page
+
+
+def gone():
+    return HttpError(httplib2.Response({'status': 410}), b'Sync token is no longer valid')
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EventStore(str(tmp_path / 'events.db'))
+
+
+def ids(events):
+    return [e['id'] for e in events]
+
+
+def test_incremental_sync_applies_only_the_changes(store):
+    service = FakeService(
+        {'items': [timed('a', '2026-11-02', 9, 10), timed('b', '2026-11-02', 11, 12)],
+         'nextSyncToken': 't1', 'timeZone': 'UTC'},
+        {'items': [{'id': 'a', 'status': 'cancelled'}, timed('c', '2026-11-02', 13, 14)],
+         'nextSyncToken': 't2'},
+    )
+
+    assert store.sync(service, 'primary') == 2
+    assert store.sync(service, 'primary') == 2
+
+    first, second = service.calls
+    assert 'timeMin' in first and 'syncToken' not in first
+    assert second['syncToken'] == 't1' and 'timeMin' not in second
+    assert ids(store.events('primary', '2026-11-02T00:00:00Z', '2026-11-03T00:00:00Z')) == ['b', 'c']
+    assert store.sync_token('primary') == 't2'
+
+
+def test_full_sync_follows_every_page(store):
+    service = FakeService(
+        {'items': [timed('a', '2026-11-02', 9, 10)], 'nextPageToken': 'p2', 'timeZone': 'UTC'},
+        {'items': [timed('b', '2026-11-03', 9, 10)], 'nextSyncToken': 't1'},
+    )
+
+    store.sync(service, 'primary')
+
+    assert service.calls[1]['pageToken'] == 'p2'
+    assert ids(store.events('primary', '2026-11-01T00:00:00Z', '2026-11-04T00:00:00Z')) == ['a', 'b']
+
+
+def test_expired_token_runs_a_fresh_full_sync(store):
+    service = FakeService(
+        {'items': [timed('old', '2026-11-02', 9, 10)], 'nextSyncToken': 't1', 'timeZone': 'UTC'},
+        gone(),
+        {'items': [timed('new', '2026-11-02', 11, 12)], 'nextSyncToken': 't2', 'timeZone': 'UTC'},
+    )
+    store.sync(service, 'primary')
+
+    store.sync(service, 'primary')
+
+    assert service.calls[1]['syncToken'] == 't1'
+    assert 'syncToken' not in service.calls[2] and 'timeMin' in service.calls[2]
+    assert ids(store.events('primary', '2026-11-02T00:00:00Z', '2026-11-03T00:00:00Z')) == ['new']
+    assert store.sync_token('primary') == 't2'
+
+
+def test_other_errors_are_raised(store):
+    service = FakeService({'items': [], 'nextSyncToken': 't1', 'timeZone': 'UTC'},
+                          HttpError(httplib2.Response({'status': 500}), b'backend error'))
+    store.sync(service, 'primary')
+
+    with pytest.raises(HttpError):
+        store.sync(service, 'primary')
+    assert store.sync_token('primary') == 't1'
+
+
+def test_all_day_events_start_at_midnight_in_the_calendar_time_zone(store):
+    service = FakeService({
+        'items': [event('holiday', {'date': '2026-11-03'}, {'date': '2026-11-04'})],
+        'nextSyncToken': 't1', 'timeZone': 'Asia/Tokyo'
+    })
+    store.sync(service, 'primary')
+
+    # Midnight in Tokyo is 15:00 UTC the day before
+    assert ids(store.events('primary', '2026-11-02T15:00:00Z', '2026-11-02T16:00:00Z')) == ['holiday']
+    assert store.events('primary', '2026-11-02T13:00:00Z', '2026-11-02T15:00:00Z') == []
+    assert ids(store.events('primary', '2026-11-03T14:00:00Z', '2026-11-03T15:00:00Z')) == ['holiday']
+    assert store.events('primary', '2026-11-03T15:00:00Z', '2026-11-03T16:00:00Z') == []
+
+
+def test_a_range_outside_the_window_widens_the_full_sync(store):
+    service = FakeService({'items': [], 'nextSyncToken': 't1', 'timeZone': 'UTC'},
+                          {'items': [], 'nextSyncToken': 't2', 'timeZone': 'UTC'})
+    store.sync(service, 'primary')
+
+    later = datetime.now(timezone.utc).replace(year=datetime.now(timezone.utc).year + 3)
+    store.sync(service, 'primary', time_min=later.strftime('%Y-%m-%dT%H:%M:%SZ'),
+               time_max=later.strftime('%Y-%m-%dT%H:%M:%SZ'))
+
+    assert 'syncToken' not in service.calls[1]
+    assert service.calls[1]['timeMax'] >= later.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def test_concurrent_syncs_of_one_calendar_run_one_at_a_time(store):
+    service = FakeService(
+        {'items': [timed('a', '2026-11-02', 9, 10), timed('b', '2026-11-02', 11, 12)],
+         'nextSyncToken': 't1', 'timeZone': 'UTC'},
+        {'items': [], 'nextSyncToken': 't2'},
+        delay=0.05,
+    )
+
+    threads = [threading.Thread(target=store.sync, args=(service, 'primary')) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert service.peak == 1
+    # The sync that waited continues incrementally instead of clearing the first one's events
+    assert service.calls[1]['syncToken'] == 't1'
+    assert ids(store.events('primary', '2026-11-02T00:00:00Z', '2026-11-03T00:00:00Z')) == ['a', 'b']
+
+
+def test_calendars_are_stored_apart(store):
+    service = FakeService({'items': [timed('mine', '2026-11-02', 9, 10)], 'nextSyncToken': 't1', 'timeZone': 'UTC'},
+                          {'items': [timed('theirs', '2026-11-02', 9, 10)], 'nextSyncToken': 't1', 'timeZone': 'UTC'})
+
+    store.sync(service, 'primary', key='alice:primary')
+    store.sync(service, 'primary', key='bob:primary')
+
+    assert ids(store.events('alice:primary', '2026-11-02T00:00:00Z', '2026-11-03T00:00:00Z')) == ['mine']
+    assert ids(store.events('bob:primary', '2026-11-02T00:00:00Z', '2026-11-03T00:00:00Z')) == ['theirs']
@@ -0,0 +1,133 @@
+import random
+import time as timer
+from datetime import date, datetime, time, timedelta, timezone
+
+from intervals import (
+    daily_windows,
+    event_interval,
+    find_conflicts,
+    find_free_slots,
+    free_slots,
+    merge_intervals,
+    to_utc,
+)
+
+BASE = datetime(2025, 4, 13, tzinfo=timezone.utc)
+DAY_MINUTES = 24 * 60
+TRIALS = 300
+
+
+def at(minute):
+    return BASE + timedelta(minutes=minute)
+
+
+def random_intervals(rng, count, horizon=DAY_MINUTES):
+    intervals = []
+    for _ in range(count):
+        start = rng.randrange(horizon)
+        intervals.append((at(start), at(start + rng.randrange(0, 180))))
+    return intervals
+
+
+def covered_minutes(intervals):
+    minutes = set()
+    for start, end in intervals:
+        first = int((start - BASE).total_seconds() // 60)
+        last = int((end - BASE).total_seconds() // 60)
+        minutes.update(range(first, last))
+    return minutes
+
+
+def test_merge_is_sorted_disjoint_and_covers_the_same_time():
+    rng = random.Random(1)
+    for _ in range(TRIALS):
+        intervals = random_intervals(rng, rng.randrange(0, 40))
+        merged = merge_intervals(intervals)
+
+        for (_, end), (next_start, _) in zip(merged, merged[1:]):
+            assert end < next_start
+        assert covered_minutes(merged) == covered_minutes(intervals)
+        assert merge_intervals(merged) == merged
+
+
+def test_free_slots_match_brute_force():
+    rng = random.Random(2)
+    for _ in range(TRIALS):
+        busy = random_intervals(rng, rng.randrange(0, 25))
+        min_minutes = rng.choice([0, 15, 30, 60, 90])
+        buffer_minutes = rng.choice([0, 10, 15])
+        window = (at(rng.randrange(0, 600)), at(rng.randrange(600, DAY_MINUTES)))
+
+        slots = free_slots(busy, window[0], window[1], min_minutes, buffer_minutes)
+
+        # Expected: runs of free window minutes, kept when long enough
+        padded = [(s - timedelta(minutes=buffer_minutes), e + timedelta(minutes=buffer_minutes)) for s, e in busy]
+        blocked = covered_minutes(padded)
+        first = int((window[0] - BASE).total_seconds() // 60)
+        last = int((window[1] - BASE).total_seconds() // 60)
+        expected, run_start = [], None
+        for minute in range(first, last + 1):
+            free = minute < last and minute not in blocked
+            if free and run_start is None:
+                run_start = minute
+            elif not free and run_start is not None:
+                if minute - run_start >= max(min_minutes, 1):
+                    expected.append((at(run_start), at(minute)))
+                run_start = None
+
+        assert slots == expected
+
+
+def test_find_conflicts_matches_pairwise_check():
+    rng = random.Random(3)
+    for _ in range(TRIALS):
+        busy = random_intervals(rng, rng.randrange(0, 20))
+        candidates = random_intervals(rng, rng.randrange(0, 20))
+
+        expected = [
+            i for i, (start, end) in enumerate(candidates)
+            if any(b_start < end and start < b_end for b_start, b_end in busy)
+        ]
+        assert find_conflicts(candidates, busy) == expected
+
+
+def test_slots_never_conflict_with_events():
+    rng = random.Random(4)
+    for _ in range(50):
+        events = []
+        for start, end in random_intervals(rng, rng.randrange(0, 30), horizon=3 * DAY_MINUTES):
+            events.append({'start': {'dateTime': start.isoformat()}, 'end': {'dateTime': end.isoformat()}})
+
+        slots = find_free_slots(events, date(2025, 4, 13), date(2025, 4, 15), min_minutes=60, buffer_minutes=15)
+
+        busy = [event_interval(event) for event in events]
+        assert find_conflicts(slots, busy) == []
+        assert all(end - start >= timedelta(minutes=60) for start, end in slots)
+
+
+def test_to_utc_handles_offsets_timezones_and_all_day_events():
+    assert to_utc({'dateTime': '2025-04-13T10:00:00-04:00'}) == datetime(2025, 4, 13, 14, tzinfo=timezone.utc)
+    assert to_utc('2025-04-13T14:00:00Z') == datetime(2025, 4, 13, 14, tzinfo=timezone.utc)
+    assert to_utc({'dateTime': '2025-04-13T10:00:00', 'timeZone': 'Europe/Paris'}) == \
+        datetime(2025, 4, 13, 8, tzinfo=timezone.utc)
+    # All-day events start at local midnight (EDT is UTC-4 in April)
+    assert to_utc({'date': '2025-04-13'}) == datetime(2025, 4, 13, 4, tzinfo=timezone.utc)
+    assert to_utc({'date': '2025-01-13'}) == datetime(2025, 1, 13, 5, tzinfo=timezone.utc)
+
+
+def test_daily_windows_follow_daylight_saving_time():
+    # US clocks moved forward on 2025-03-09
+    windows = daily_windows(date(2025, 3, 8), date(2025, 3, 9), time(8), time(22))
+    assert windows[0][0] == datetime(2025, 3, 8, 13, tzinfo=timezone.utc)
+    assert windows[1][0] == datetime(2025, 3, 9, 12, tzinfo=timezone.utc)
+
+
+def test_thousands_of_events_take_milliseconds():
+    rng = random.Random(5)
+    events = []
+    for start, end in random_intervals(rng, 5000, horizon=30 * DAY_MINUTES):
+        events.append({'start': {'dateTime': start.isoformat()}, 'end': {'dateTime': end.isoformat()}})
+
+    began = timer.perf_counter()
+    find_free_slots(events, date(2025, 4, 13), date(2025, 5, 12), min_minutes=30)
+    assert timer.perf_counter() - began < 1.0
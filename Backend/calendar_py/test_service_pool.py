@@ -0,0 +1,158 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from googleapiclient.errors import HttpError
+
+import service_pool
+from service_pool import CalendarServicePool
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class FakeCreds:
+    def __init__(self, expires_in=timedelta(hours=1), refresh_token="refresh", refresh_delay=0.0):
+        self.token = "token"
+        self.expiry = utcnow() + expires_in
+        self.refresh_token = refresh_token
+        self.refresh_delay = refresh_delay
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        time.sleep(self.refresh_delay)
+        self.expiry = utcnow() + timedelta(hours=1)
+
+
+class FakeStore:
+    def __init__(self, **creds):
+        self.creds = creds
+        self.loads = []
+        self.saves = []
+
+    def load(self, user_id):
+        self.loads.append(user_id)
+        return self.creds.get(user_id)
+
+    def save(self, user_id, creds):
+        self.saves.append(user_id)
+
+
+class FakeHttp:
+    """Answers discovery requests with the given status per URL fragment; 404 for anything else."""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.requests = []
+
+    def request(self, uri, *args, **kwargs):
+        self.requests.append(uri)
+        status = next((code for fragment, code in self.statuses.items() if fragment in uri), 404)
+        content = b'{"name": "calendar", "version": "v3"}' if status == 200 else b"{}"
+        return SimpleNamespace(status=status, reason="", get=lambda key, default=None: default), content
+
+
+def call_in_thread(fn):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_least_recently_used_users_are_evicted():
+    store = FakeStore(a=FakeCreds(), b=FakeCreds(), c=FakeCreds())
+    pool = CalendarServicePool(store, max_users=2)
+
+    for user in ("a", "b", "a", "c"):
+        pool.get(user)
+
+    assert list(pool._users) == ["a", "c"]
+    pool.get("b")
+    assert store.loads == ["a", "b", "c", "b"]
+    assert list(pool._users) == ["c", "b"]
+
+
+def test_an_expiring_token_is_refreshed_once_for_all_threads():
+    creds = FakeCreds(expires_in=timedelta(minutes=1), refresh_delay=0.05)
+    store = FakeStore(u=creds)
+    pool = CalendarServicePool(store)
+
+    threads = [threading.Thread(target=pool.get, args=("u",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert creds.refreshes == 1
+    assert store.saves == ["u"]
+
+
+def test_a_token_that_cannot_be_refreshed_is_an_error():
+    pool = CalendarServicePool(FakeStore(u=FakeCreds(expires_in=timedelta(0), refresh_token=None)))
+
+    with pytest.raises(LookupError):
+        pool.get("u")
+
+
+def test_an_unknown_user_is_an_error():
+    with pytest.raises(LookupError):
+        CalendarServicePool(FakeStore()).get("nobody")
+
+
+def test_each_thread_gets_its_own_service_per_user():
+    pool = CalendarServicePool(FakeStore(a=FakeCreds(), b=FakeCreds()))
+
+    mine = pool.get("a")
+    theirs = call_in_thread(lambda: pool.get("a"))
+
+    assert pool.get("a") is mine
+    assert theirs is not mine
+    assert pool.get("b") is not mine
+    assert mine._http is not theirs._http
+    assert mine._http.credentials is theirs._http.credentials
+
+
+def test_user_updates_drop_the_old_services():
+    store = FakeStore(a=FakeCreds())
+    pool = CalendarServicePool(store)
+    old = pool.get("a")
+
+    pool.add_user("a", FakeCreds())
+
+    assert pool.get("a") is not old
+    assert store.saves == ["a"]
+
+
+def test_discovery_is_downloaded_once_without_a_bundled_copy(monkeypatch):
+    monkeypatch.setattr(service_pool, "_static_discovery", lambda: None)
+    pool = CalendarServicePool(FakeStore())
+    http = FakeHttp({"discovery/v1/apis/calendar/v3": 200})
+
+    first = pool._discovery_document(http)
+    second = call_in_thread(lambda: pool._discovery_document(http))
+
+    assert first is second
+    assert first["name"] == "calendar"
+    assert len(http.requests) == 1
+
+
+def test_discovery_falls_back_to_the_v2_url(monkeypatch):
+    monkeypatch.setattr(service_pool, "_static_discovery", lambda: None)
+    http = FakeHttp({"calendar.googleapis.com/$discovery": 200})
+
+    assert CalendarServicePool(FakeStore())._discovery_document(http)["name"] == "calendar"
+    assert len(http.requests) == 2
+
+
+def test_a_failed_discovery_download_is_retried_on_the_next_build(monkeypatch):
+    monkeypatch.setattr(service_pool, "_static_discovery", lambda: None)
+    pool = CalendarServicePool(FakeStore())
+
+    with pytest.raises(HttpError):
+        pool._discovery_document(FakeHttp({}))
+    assert pool._discovery_document(FakeHttp({"discovery/v1": 200}))["name"] == "calendar"
@@ -0,0 +1,357 @@
+import bisect
+import logging
+import threading
+import unicodedata
+from typing import Dict, List, Optional
+
+from airportsdata import load
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_AIRPORTS = {
+    "chicago": "ORD",
+    "new york": "JFK",
+    "washington": "IAD",
+    "los angeles": "LAX",
+    "houston": "IAH",
+    "tokyo": "HND",
+    "london": "LHR",
+    "paris": "CDG",
+    "philadelphia": "PHL",
+    "san francisco": "SFO",
+    "dallas": "DFW",
+    "seattle": "SEA"
+    # Add more as needed
+}
+
+# Metro areas served by several commercial airports: city -> (IATA city code, airports)
+METRO_AREAS = {
+    "new york": ("NYC", ("JFK", "LGA", "EWR")),
+    "chicago": ("CHI", ("ORD", "MDW")),
+    "washington": ("WAS", ("IAD", "DCA", "BWI")),
+    "los angeles": ("LAX", ("LAX", "BUR", "LGB", "SNA")),
+    "houston": ("HOU", ("IAH", "HOU")),
+    "dallas": ("DFW", ("DFW", "DAL")),
+    "san francisco": ("SFO", ("SFO", "OAK", "SJC")),
+    "miami": ("MIA", ("MIA", "FLL")),
+    "tokyo": ("TYO", ("HND", "NRT")),
+    "london": ("LON", ("LHR", "LGW", "STN", "LTN", "LCY")),
+    "paris": ("PAR", ("CDG", "ORY")),
+    "rome": ("ROM", ("FCO", "CIA")),
+    "milan": ("MIL", ("MXP", "LIN")),
+}
+
+# Reverse lookups: metro city code or member airport -> metro city
+_METRO_BY_CODE = {}
+for _city, (_city_code, _codes) in METRO_AREAS.items():
+    _METRO_BY_CODE.setdefault(_city_code, _city)
+    for _code in _codes:
+        _METRO_BY_CODE.setdefault(_code, _city)
+
+# Common nicknames and spellings that don't appear as a city in the IATA table
+CITY_ALIASES = {
+    "nyc": "new york",
+    "new york city": "new york",
+    "manhattan": "new york",
+    "la": "los angeles",
+    "sf": "san francisco",
+    "dc": "washington",
+    "washington dc": "washington",
+    "washington d c": "washington",
+    "philly": "philadelphia",
+    "vegas": "las vegas",
+    "nola": "new orleans",
+    "indy": "indianapolis",
+    "saint louis": "st louis",
+}
+
+US_STATES = {
+    "al": "alabama", "ak": "alaska", "az": "arizona", "ar": "arkansas",
+    "ca": "california", "co": "colorado", "ct": "connecticut", "de": "delaware",
+    "dc": "district of columbia", "fl": "florida", "ga": "georgia", "hi": "hawaii",
+    "id": "idaho", "il": "illinois", "in": "indiana", "ia": "iowa",
+    "ks": "kansas", "ky": "kentucky", "la": "louisiana", "me": "maine",
+    "md": "maryland", "ma": "massachusetts", "mi": "michigan", "mn": "minnesota",
+    "ms": "mississippi", "mo": "missouri", "mt": "montana", "ne": "nebraska",
+    "nv": "nevada", "nh": "new hampshire", "nj": "new jersey", "nm": "new mexico",
+    "ny": "new york", "nc": "north carolina", "nd": "north dakota", "oh": "ohio",
+    "ok": "oklahoma", "or": "oregon", "pa": "pennsylvania", "ri": "rhode island",
+    "sc": "south carolina", "sd": "south dakota", "tn": "tennessee", "tx": "texas",
+    "ut": "utah", "vt": "vermont", "va": "virginia", "wa": "washington",
+    "wv": "west virginia", "wi": "wisconsin", "wy": "wyoming",
+}
+
+# Keys shorter than this are only matched exactly, never by prefix or typo
+MIN_FUZZY_LENGTH = 4
+
+
+def normalize_city(name: str) -> str:
+    """
+    Normalize a city name for index lookups.
+
+    Lowercases, strips accents and punctuation, and collapses whitespace,
+    so "São Paulo", "sao  paulo" and "Sao-Paulo" share one key.
+    """
+    if not name:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", name)
+    ascii_name = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    cleaned = "".join(ch if ch.isalnum() else " " for ch in ascii_name.lower())
+    return " ".join(cleaned.split())
+
+
+def _deletions(key: str) -> List[str]:
+    """All strings one character deletion away from key."""
+    return [key[:i] + key[i + 1:] for i in range(len(key))]
+
+
+def _airport_rank(code: str, data: Dict) -> tuple:
+    """Sort key that puts the airports a traveller most likely means first."""
+    city_key = normalize_city(data.get("city", ""))
+    name = data.get("name", "").lower()
+    is_primary = PRIMARY_AIRPORTS.get(city_key) == code
+    is_international = "international" in name or "intl" in name or "intcntl" in name
+    # Small airfields only carry a local FAA identifier (e.g. "07FA") instead of an ICAO code
+    has_icao = data.get("icao", "").isalpha()
+    return (not is_primary, not is_international, not has_icao, code)
+
+
+class AirportIndex:
+    """
+    Prebuilt lookup structures for resolving a city name to IATA airports.
+
+    Exact and alias lookups are dict hits, prefix lookups bisect a sorted key
+    list, and single-typo lookups go through a deletion-neighbourhood table,
+    so no query ever walks the full airport table.
+    """
+
+    def __init__(self, airports: Dict[str, Dict]):
+        by_city: Dict[str, List[tuple]] = {}
+        self._by_code: Dict[str, tuple] = {}
+
+        for code, data in airports.items():
+            entry = (
+                code,
+                data.get("name", ""),
+                data.get("city", ""),
+                data.get("subd", ""),
+                data.get("country", ""),
+            )
+            self._by_code[code] = entry
+            city_key = normalize_city(data.get("city", ""))
+            if city_key:
+                by_city.setdefault(city_key, []).append((_airport_rank(code, data), entry))
+
+        # Candidates per city are ranked once here rather than on every query
+        self._by_city: Dict[str, List[tuple]] = {
+            key: [entry for _, entry in sorted(entries)]
+            for key, entries in by_city.items()
+        }
+        self._sorted_keys = sorted(self._by_city)
+
+        self._typos: Dict[str, List[str]] = {}
+        for key in self._sorted_keys:
+            if len(key) < MIN_FUZZY_LENGTH:
+                continue
+            for variant in _deletions(key):
+                self._typos.setdefault(variant, []).append(key)
+
+    def resolve(
+        self,
+        query: str,
+        country: Optional[str] = None,
+        state: Optional[str] = None,
+        limit: int = 5
+    ) -> List[Dict]:
+        """
+        Resolve a free-form city name to ranked candidate airports.
+
+        Args:
+            query: City name, alias, or IATA code. A trailing ", <state or country>"
+                qualifier (e.g. "Portland, OR" or "Paris, FR") is used for disambiguation.
+            country: Optional ISO country code to restrict matches to
+            state: Optional state/subdivision name or US postal abbreviation
+            limit: Maximum number of candidates to return
+
+        Returns:
+            List of candidate airport dictionaries, best match first
+        """
+        if not query:
+            return []
+
+        city_part, _, qualifier = query.partition(",")
+        key = normalize_city(city_part)
+        key = CITY_ALIASES.get(key, key)
+        qualifier = normalize_city(qualifier)
+        if qualifier and not country and not state:
+            if len(qualifier) == 2 and qualifier not in US_STATES:
+                country = qualifier
+            else:
+                state = qualifier
+
+        results: List[Dict] = []
+        seen = set()
+
+        def add(city_keys: List[str], match: str) -> None:
+            for city_key in city_keys:
+                for entry in self._filter(self._by_city.get(city_key, []), country, state):
+                    if entry[0] not in seen and len(results) < limit:
+                        seen.add(entry[0])
+                        results.append(self._candidate(entry, match))
+
+        add([key], "exact")
+
+        # Travellers often type the airport code itself ("IND", "jfk")
+        code = key.upper()
+        if len(results) < limit and len(code) == 3 and code in self._by_code:
+            for entry in self._filter([self._by_code[code]], country, state):
+                if entry[0] not in seen:
+                    seen.add(entry[0])
+                    results.append(self._candidate(entry, "code"))
+
+        if len(results) < limit and len(key) >= MIN_FUZZY_LENGTH - 1:
+            add(self._prefix_keys(key, limit), "prefix")
+
+        # One typo away from a three-letter input is almost any short city name
+        if len(results) < limit and len(key) >= MIN_FUZZY_LENGTH:
+            add(self._typo_keys(key), "fuzzy")
+
+        return results
+
+    def _prefix_keys(self, key: str, limit: int) -> List[str]:
+        """City keys starting with key, found by bisecting the sorted key list."""
+        matches = []
+        i = bisect.bisect_left(self._sorted_keys, key)
+        while i < len(self._sorted_keys) and len(matches) < limit:
+            candidate = self._sorted_keys[i]
+            if not candidate.startswith(key):
+                break
+            if candidate != key:
+                matches.append(candidate)
+            i += 1
+        return matches
+
+    def _typo_keys(self, key: str) -> List[str]:
+        """City keys within one insertion, deletion, or substitution of key."""
+        matches = list(self._typos.get(key, []))
+        for variant in _deletions(key):
+            if variant in self._by_city and len(variant) >= MIN_FUZZY_LENGTH:
+                matches.append(variant)
+            matches.extend(self._typos.get(variant, []))
+        # Keep the first occurrence of each key
+        return list(dict.fromkeys(k for k in matches if k != key))
+
+    @staticmethod
+    def _filter(entries: List[tuple], country: Optional[str], state: Optional[str]) -> List[tuple]:
+        if country:
+            country = country.upper()
+            entries = [e for e in entries if e[4] == country]
+        if state:
+            state_key = normalize_city(state)
+            state_key = US_STATES.get(state_key, state_key)
+            entries = [e for e in entries if normalize_city(e[3]) == state_key]
+        return entries
+
+    @staticmethod
+    def _candidate(entry: tuple, match: str) -> Dict:
+        code, name, city, subd, country = entry
+        return {
+            "iata": code,
+            "name": name,
+            "city": city,
+            "state": subd,
+            "country": country,
+            "match": match
+        }
+
+
+def _metro_key(name: str) -> Optional[str]:
+    city_part, _, qualifier = name.partition(",")
+    if qualifier.strip():
+        # "Paris, TX" is not the Paris metro; leave qualified names to the index
+        return None
+    key = normalize_city(city_part)
+    key = CITY_ALIASES.get(key, key)
+    return key if key in METRO_AREAS else None
+
+
+def metro_airports(name: str) -> List[str]:
+    """
+    All commercial airports serving a city, e.g. "New York" -> ["JFK", "LGA", "EWR"].
+
+    A metro city code ("NYC") also expands to every airport, while a specific
+    airport code ("LGA") is kept as the only choice. Cities outside
+    METRO_AREAS resolve to their best single airport.
+    """
+    if not name:
+        return []
+    code = name.strip().upper()
+    if code in _METRO_BY_CODE and code not in METRO_AREAS[_METRO_BY_CODE[code]][1]:
+        return list(METRO_AREAS[_METRO_BY_CODE[code]][1])
+    metro = _metro_key(name)
+    if metro:
+        return list(METRO_AREAS[metro][1])
+    candidates = get_airport_index().resolve(name, limit=1)
+    return [candidates[0]["iata"]] if candidates else []
+
+
+def city_code(name: str) -> Optional[str]:
+    """
+    IATA city code used by city-level APIs such as the Amadeus hotel list.
+
+    Metro names, their airports and their city codes all map to the metro code
+    ("JFK" -> "NYC", "new york city" -> "NYC"); other cities fall back to their
+    best airport code, which for single-airport cities is also the city code.
+    """
+    if not name:
+        return None
+    code = name.strip().upper()
+    if code in _METRO_BY_CODE:
+        return METRO_AREAS[_METRO_BY_CODE[code]][0]
+    metro = _metro_key(name)
+    if metro:
+        return METRO_AREAS[metro][0]
+    candidates = get_airport_index().resolve(name, limit=1)
+    return candidates[0]["iata"] if candidates else None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_airport_index() -> AirportIndex:
+    """Return the shared airport index, building it on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = AirportIndex(load('IATA'))
+                logger.info(f"Built airport index with {len(_index._sorted_keys)} cities")
+    return _index
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: prebuilt index vs. the old linear scan over the IATA table
+    import timeit
+
+    airports = load('IATA')
+    index = get_airport_index()
+    queries = ["Indianapolis", "Fort Lauderdale", "Boston", "Denver", "Nowhereville"]
+
+    def linear_scan(city_name):
+        city_key = city_name.lower().strip()
+        for code, data in airports.items():
+            if data.get('city', '').lower() == city_key:
+                return code
+        return "unknown"
+
+    runs = 200
+    scan_time = timeit.timeit(lambda: [linear_scan(q) for q in queries], number=runs)
+    index_time = timeit.timeit(lambda: [index.resolve(q, limit=1) for q in queries], number=runs)
+    per_query = runs * len(queries)
+
+    print(f"linear scan:   {scan_time / per_query * 1e6:8.1f} us/query")
+    print(f"airport index: {index_time / per_query * 1e6:8.1f} us/query")
+    print(f"speedup:       {scan_time / index_time:8.1f}x")
+    for q in ["nyc", "Chicgo", "Portland, OR", "Portland, ME", "san fran", "IND"]:
+        print(q, "->", [c["iata"] for c in index.resolve(q, limit=3)])
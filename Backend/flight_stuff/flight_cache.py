@@ -0,0 +1,63 @@
+import os
+import threading
+from typing import Optional
+
+from ttl_cache import DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS, TTLCache
+
+
+def make_cache_key(origin: str, destination: str, date: str, adults: int = 1,
+                   currency: str = "USD", max_results: int = 5) -> str:
+    """
+    Build the normalized cache key for a flight offer search.
+
+    Args:
+        origin: Origin IATA code
+        destination: Destination IATA code
+        date: Departure date (YYYY-MM-DD)
+        adults: Number of adult passengers
+        currency: Currency code for prices
+        max_results: Maximum number of offers requested
+
+    Returns:
+        Key string such as "IND|JFK|2025-04-19|1|USD|5"
+    """
+    return "|".join([
+        origin.strip().upper(),
+        destination.strip().upper(),
+        date.strip(),
+        str(int(adults)),
+        currency.strip().upper(),
+        str(int(max_results))
+    ])
+
+
+class FlightSearchCache(TTLCache):
+    """TTLCache for Amadeus flight offer searches, persisted to the flight_offers table."""
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 db_path: Optional[str] = None):
+        super().__init__(ttl_seconds, max_entries, db_path, table="flight_offers")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_flight_cache() -> FlightSearchCache:
+    """
+    Return the process-wide flight search cache, creating it on first use.
+
+    Configured through FLIGHT_CACHE_TTL (seconds), FLIGHT_CACHE_SIZE (entries)
+    and FLIGHT_CACHE_DB (SQLite path; unset keeps the cache in memory only).
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FlightSearchCache(
+                    ttl_seconds=float(os.getenv("FLIGHT_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+                    max_entries=int(os.getenv("FLIGHT_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+                    db_path=os.getenv("FLIGHT_CACHE_DB") or None
+                )
+    return _cache
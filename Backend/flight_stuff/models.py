@@ -0,0 +1,336 @@
+import json
+import logging
+import re
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_intern = sys.intern
+
+_ISO_DURATION = re.compile(r"P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?")
+
+
+def parse_iso_duration(duration: Optional[str]) -> Optional[int]:
+    """Convert an ISO 8601 duration such as "PT5H30M" to minutes."""
+    if not duration:
+        return None
+    match = _ISO_DURATION.fullmatch(duration)
+    if not match:
+        return None
+    days, hours, minutes = (int(part or 0) for part in match.groups())
+    return days * 1440 + hours * 60 + minutes
+
+
+def _minutes_between(start: str, end: str) -> int:
+    return int((datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds() // 60)
+
+
+# A segment row is (carrier, number, origin, destination, departure, arrival);
+# an itinerary row is (ISO duration, segment rows)
+
+def _segment_row(segment: Dict) -> tuple:
+    departure = segment["departure"]
+    arrival = segment["arrival"]
+    # Carrier and airport codes repeat across every offer, so share one copy
+    return (_intern(segment["carrierCode"]), segment["number"], _intern(departure["iataCode"]),
+            _intern(arrival["iataCode"]), departure["at"], arrival["at"])
+
+
+def _duration_minutes(duration: Optional[str], segments: tuple) -> int:
+    minutes = parse_iso_duration(duration)
+    if minutes is None and segments:
+        minutes = _minutes_between(segments[0][4], segments[-1][5])
+    return minutes or 0
+
+
+def _layover_minutes(segments: tuple) -> int:
+    return sum(_minutes_between(previous[5], current[4]) for previous, current in zip(segments, segments[1:]))
+
+
+class Segment:
+    """One flight leg, e.g. IND -> ORD on AA 1234."""
+
+    __slots__ = ("carrier", "number", "origin", "destination", "departure", "arrival")
+
+    def __init__(self, carrier: str, number: str, origin: str, destination: str,
+                 departure: str, arrival: str):
+        self.carrier = _intern(carrier)
+        self.number = number
+        self.origin = _intern(origin)
+        self.destination = _intern(destination)
+        self.departure = departure
+        self.arrival = arrival
+
+    @classmethod
+    def from_amadeus(cls, segment: Dict) -> "Segment":
+        return cls(*_segment_row(segment))
+
+    def to_row(self) -> list:
+        return [self.carrier, self.number, self.origin, self.destination, self.departure, self.arrival]
+
+    def to_dict(self) -> Dict:
+        return {
+            "airline": self.carrier,
+            "flight_number": self.number,
+            "from": self.origin,
+            "to": self.destination,
+            "departure": self.departure,
+            "arrival": self.arrival
+        }
+
+
+class Itinerary:
+    """One direction of travel made of one or more connecting segments."""
+
+    __slots__ = ("duration", "segments")
+
+    def __init__(self, duration: Optional[str], segments: tuple):
+        # Kept as the raw ISO 8601 string and only converted when asked for
+        self.duration = duration
+        self.segments = segments
+
+    @classmethod
+    def from_amadeus(cls, itinerary: Dict) -> "Itinerary":
+        return cls(itinerary.get("duration"), tuple(map(Segment.from_amadeus, itinerary.get("segments", []))))
+
+    @property
+    def duration_minutes(self) -> int:
+        return _duration_minutes(self.duration, tuple(s.to_row() for s in self.segments))
+
+    @property
+    def stops(self) -> int:
+        return max(len(self.segments) - 1, 0)
+
+    @property
+    def layover_minutes(self) -> int:
+        return _layover_minutes(tuple(s.to_row() for s in self.segments))
+
+    def to_row(self) -> list:
+        return [self.duration, [s.to_row() for s in self.segments]]
+
+    def to_dict(self) -> Dict:
+        return {
+            "duration_minutes": self.duration_minutes,
+            "stops": self.stops,
+            "segments": [s.to_dict() for s in self.segments]
+        }
+
+
+class FlightOffer:
+    """
+    Compact, typed view of an Amadeus flight offer that keeps every itinerary and segment.
+
+    The offer holds its itineraries as rows of plain tuples; Itinerary and
+    Segment objects are only built when .itineraries is first read. The flat
+    keys and the cache rows are served straight from the tuples.
+
+    Supports read-only mapping access with the flat keys search_flights has always
+    returned ("airline", "departure", "price", ...), so callers that treat offers
+    as dictionaries keep working. Summary fields describe the first (outbound)
+    itinerary. Offers returned by ranking.rank_flights also have a "score".
+    """
+
+    __slots__ = ("offer_id", "price", "currency", "score", "_rows", "_itineraries")
+
+    KEYS = ("airline", "flight_number", "departure", "arrival", "from", "to", "price", "currency",
+            "stops", "duration_minutes", "layover_minutes", "itineraries")
+
+    def __init__(self, offer_id: Optional[str], price: str, currency: str, rows: tuple,
+                 score: Optional[float] = None):
+        self.offer_id = offer_id
+        self.price = price
+        self.currency = _intern(currency)
+        self.score = score
+        self._rows = rows
+        self._itineraries = None
+
+    @classmethod
+    def from_amadeus(cls, offer: Dict) -> "FlightOffer":
+        rows = tuple(
+            (itinerary.get("duration"), tuple(map(_segment_row, itinerary.get("segments", []))))
+            for itinerary in offer["itineraries"]
+        )
+        if not rows or not rows[0][1]:
+            raise KeyError("segments")
+        price = offer["price"]
+        return cls(offer.get("id"), price["total"], price["currency"], rows)
+
+    @classmethod
+    def from_row(cls, row: list) -> "FlightOffer":
+        offer_id, price, currency, itineraries = row
+        # Rows read back from the SQLite tier are lists; tuples keep segment_rows hashable
+        return cls(offer_id, price, currency, tuple(
+            (duration, tuple(map(tuple, segments))) for duration, segments in itineraries
+        ))
+
+    @property
+    def itineraries(self) -> tuple:
+        """Itinerary objects, built from the rows on first access."""
+        if self._itineraries is None:
+            self._itineraries = tuple(
+                Itinerary(duration, tuple(Segment(*segment) for segment in segments))
+                for duration, segments in self._rows
+            )
+        return self._itineraries
+
+    @property
+    def segment_rows(self) -> tuple:
+        """Every segment of every itinerary as (carrier, number, origin, destination, departure, arrival)."""
+        return tuple(segment for _, segments in self._rows for segment in segments)
+
+    def with_score(self, score: float) -> "FlightOffer":
+        """A copy of this offer carrying a ranking score; the itinerary data is shared."""
+        offer = FlightOffer(self.offer_id, self.price, self.currency, self._rows, score)
+        offer._itineraries = self._itineraries
+        return offer
+
+    def to_row(self) -> list:
+        """JSON-serializable nested sequences, used by the flight search cache."""
+        return [self.offer_id, self.price, self.currency, self._rows]
+
+    def to_dict(self) -> Dict:
+        return {key: self[key] for key in self.keys()}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    # Mapping access with the legacy flat flight keys
+
+    def keys(self) -> tuple:
+        return self.KEYS if self.score is None else self.KEYS + ("score",)
+
+    def __getitem__(self, key: str):
+        duration, segments = self._rows[0]
+        if key == "airline":
+            return segments[0][0]
+        if key == "flight_number":
+            return segments[0][1]
+        if key == "departure":
+            return segments[0][4]
+        if key == "arrival":
+            return segments[-1][5]
+        if key == "from":
+            return segments[0][2]
+        if key == "to":
+            return segments[-1][3]
+        if key == "price":
+            return self.price
+        if key == "currency":
+            return self.currency
+        if key == "stops":
+            return max(len(segments) - 1, 0)
+        if key == "duration_minutes":
+            return _duration_minutes(duration, segments)
+        if key == "layover_minutes":
+            return _layover_minutes(segments)
+        if key == "itineraries":
+            return [i.to_dict() for i in self.itineraries]
+        if key == "score" and self.score is not None:
+            return self.score
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self) -> str:
+        return f"FlightOffer({self['airline']}{self['flight_number']} {self['from']}->{self['to']} {self.price} {self.currency})"
+
+
+def parse_flight_offers(data: Iterable[Dict]) -> List[FlightOffer]:
+    """
+    Build FlightOffer objects from the "data" list of a flight offers response.
+
+    Only the fields we use are read, into tuples of references to the decoded
+    strings; no per-segment objects or dicts are built, and the raw offer dicts
+    can be released as soon as this returns. Offers missing required fields are
+    skipped with a warning.
+    """
+    offers = []
+    for offer in data:
+        try:
+            offers.append(FlightOffer.from_amadeus(offer))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Error parsing flight data: {e}")
+    return offers
+
+if __name__ == "__main__":
+    # Compare memory and parse time against the previous dict-per-offer path,
+    # which also kept the raw response data alive
+    import random
+    import timeit
+    import tracemalloc
+    from datetime import timedelta
+
+    from flight_stuff.ranking import itinerary_stats
+
+    def make_raw(n):
+        random.seed(3)
+        raw = []
+        for i in range(n):
+            at = datetime(2025, 4, 19, 6) + timedelta(minutes=random.randint(0, 600))
+            segments = []
+            for leg in range(random.choice([1, 2])):
+                arrive = at + timedelta(minutes=random.randint(60, 240))
+                segments.append({
+                    "departure": {"iataCode": "IND" if leg == 0 else "ORD", "terminal": "1", "at": at.isoformat()},
+                    "arrival": {"iataCode": "JFK" if leg else "ORD", "terminal": "4", "at": arrive.isoformat()},
+                    "carrierCode": "AA", "number": str(100 + i), "aircraft": {"code": "321"},
+                    "operating": {"carrierCode": "AA"}, "duration": "PT2H", "id": str(leg),
+                    "numberOfStops": 0, "blacklistedInEU": False
+                })
+                at = arrive + timedelta(minutes=45)
+            raw.append({
+                "type": "flight-offer", "id": str(i), "source": "GDS", "instantTicketingRequired": False,
+                "nonHomogeneous": False, "oneWay": False, "lastTicketingDate": "2025-04-18",
+                "numberOfBookableSeats": 9,
+                "itineraries": [{"duration": "PT5H10M", "segments": segments}],
+                "price": {"currency": "USD", "total": f"{random.uniform(90, 600):.2f}",
+                          "base": "100.00", "fees": [{"amount": "0.00", "type": "SUPPLIER"}],
+                          "grandTotal": "150.00"},
+                "pricingOptions": {"fareType": ["PUBLISHED"], "includedCheckedBagsOnly": False},
+                "validatingAirlineCodes": ["AA"],
+                "travelerPricings": [{"travelerId": "1", "fareOption": "STANDARD", "travelerType": "ADULT",
+                                      "price": {"currency": "USD", "total": "150.00", "base": "100.00"}}]
+            })
+        return json.dumps({"data": raw})
+
+    def dict_path(data):
+        results = []
+        for flight in data:
+            itinerary = flight['itineraries'][0]
+            segment = itinerary['segments'][0]
+            results.append({
+                "airline": segment["carrierCode"], "flight_number": segment["number"],
+                "departure": segment["departure"]["at"], "arrival": segment["arrival"]["at"],
+                "from": segment["departure"]["iataCode"], "to": segment["arrival"]["iataCode"],
+                "price": flight["price"]["total"], "currency": flight["price"]["currency"],
+                **itinerary_stats(itinerary)
+            })
+        return data, results
+
+    def model_path(data):
+        # What search_flights does: parse, then take the rows it stores in the cache
+        offers = parse_flight_offers(data)
+        return offers, [offer.to_row() for offer in offers]
+
+    def best_ms(fn, *args):
+        return min(timeit.repeat(lambda: fn(*args), number=50, repeat=7)) / 50 * 1000
+
+    n = 250
+    body = make_raw(n)
+    decode_ms = best_ms(lambda: json.loads(body)["data"])
+    print(f"json.loads (same for both): {decode_ms:6.2f} ms per {n} offers")
+    for label, fn in (("dict path ", dict_path), ("FlightOffer", model_path)):
+        tracemalloc.start()
+        kept = fn(json.loads(body)["data"])
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del kept
+        data = json.loads(body)["data"]
+        print(f"{label}: {size / n:8.0f} bytes/offer retained, "
+              f"{best_ms(fn, data):6.2f} ms to build from decoded data per {n} offers")
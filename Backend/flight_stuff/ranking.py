@@ -0,0 +1,214 @@
+import heapq
+import logging
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from flight_stuff.models import FlightOffer, parse_iso_duration
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of each criterion in the combined score (lower score is better)
+DEFAULT_WEIGHTS = {
+    "price": 0.5,
+    "duration": 0.2,
+    "stops": 0.15,
+    "time_fit": 0.1,
+    "layover": 0.05
+}
+
+
+def itinerary_stats(itinerary: Dict) -> Dict[str, int]:
+    """
+    Summarize an Amadeus itinerary for ranking.
+
+    Args:
+        itinerary: One entry of a flight offer's "itineraries" list
+
+    Returns:
+        Dictionary with stops, duration_minutes and layover_minutes
+    """
+    segments = itinerary.get("segments", [])
+    layover = 0
+    for previous, current in zip(segments, segments[1:]):
+        landed = datetime.fromisoformat(previous["arrival"]["at"])
+        departs = datetime.fromisoformat(current["departure"]["at"])
+        layover += int((departs - landed).total_seconds() // 60)
+
+    duration = parse_iso_duration(itinerary.get("duration"))
+    if duration is None and segments:
+        start = datetime.fromisoformat(segments[0]["departure"]["at"])
+        end = datetime.fromisoformat(segments[-1]["arrival"]["at"])
+        duration = int((end - start).total_seconds() // 60)
+
+    return {
+        "stops": max(len(segments) - 1, 0),
+        "duration_minutes": duration or 0,
+        "layover_minutes": layover
+    }
+
+
+def _normalize(column: array) -> array:
+    """Min-max scale a column to [0, 1]; a constant column scales to all zeros."""
+    low, high = min(column), max(column)
+    if high == low:
+        return array("d", bytes(8 * len(column)))
+    span = high - low
+    return array("d", ((value - low) / span for value in column))
+
+
+def _time_penalties(flights: List[Dict], earliest: Optional[datetime], latest: Optional[datetime]) -> array:
+    """Minutes each departure falls outside the [earliest, latest] window."""
+    if earliest is None and latest is None:
+        return array("d", bytes(8 * len(flights)))
+    penalties = array("d")
+    for flight in flights:
+        departure = datetime.fromisoformat(flight["departure"])
+        penalty = 0.0
+        if earliest is not None:
+            when, bound = _comparable(departure, earliest)
+            if when < bound:
+                penalty = (bound - when).total_seconds() / 60
+        if latest is not None and not penalty:
+            when, bound = _comparable(departure, latest)
+            if when > bound:
+                penalty = (when - bound).total_seconds() / 60
+        penalties.append(penalty)
+    return penalties
+
+
+def _comparable(departure: datetime, bound: datetime) -> tuple:
+    """
+    A departure and a bound that can be compared. Amadeus departures are naive
+    local times; when only one side has a UTC offset, both are compared as
+    wall-clock times instead of raising TypeError.
+    """
+    if (departure.tzinfo is None) != (bound.tzinfo is None):
+        return departure.replace(tzinfo=None), bound.replace(tzinfo=None)
+    return departure, bound
+
+
+def _pareto_front(objectives: List[tuple]) -> List[int]:
+    """
+    Indices of offers not dominated on every objective by another offer.
+
+    Offers are visited cheapest-first, so each one only has to be compared
+    against the (usually short) frontier found so far.
+    """
+    order = sorted(range(len(objectives)), key=objectives.__getitem__)
+    front: List[int] = []
+    kept: List[tuple] = []
+    for i in order:
+        candidate = objectives[i]
+        _, duration, stops, time_fit, layover = candidate
+        dominated = False
+        # Sorted order means every kept offer is already no more expensive
+        for other in kept:
+            _, d, s, t, l = other
+            if d <= duration and s <= stops and t <= time_fit and l <= layover and other != candidate:
+                dominated = True
+                break
+        if not dominated:
+            front.append(i)
+            kept.append(candidate)
+    return front
+
+
+def rank_flights(
+    flights: List[Dict],
+    top_k: int = 5,
+    weights: Optional[Dict[str, float]] = None,
+    earliest_departure: Optional[str] = None,
+    latest_departure: Optional[str] = None
+) -> Dict[str, List[Dict]]:
+    """
+    Score flight offers on several criteria and pick the best ones.
+
+    Args:
+        flights: FlightOffer objects as returned by search_flights, or flight dictionaries
+        top_k: Number of best-scoring flights to return
+        weights: Optional override of DEFAULT_WEIGHTS
+        earliest_departure: Optional ISO datetime the flight should not leave before
+        latest_departure: Optional ISO datetime the flight should not leave after
+
+    Returns:
+        Dictionary with "top" (best top_k by weighted score) and "pareto"
+        (flights no other flight beats on every criterion), each flight
+        carrying its "score": FlightOffers come back as scored FlightOffers,
+        dictionaries as new dictionaries
+    """
+    flights = [f for f in flights if f.get("price") is not None and f.get("departure")]
+    if not flights:
+        return {"top": [], "pareto": []}
+
+    weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    earliest = datetime.fromisoformat(earliest_departure) if earliest_departure else None
+    latest = datetime.fromisoformat(latest_departure) if latest_departure else None
+
+    # Column-oriented layout: one typed array per criterion
+    price = array("d", (float(f["price"]) for f in flights))
+    duration = array("d", (f.get("duration_minutes", 0) for f in flights))
+    stops = array("d", (f.get("stops", 0) for f in flights))
+    layover = array("d", (f.get("layover_minutes", 0) for f in flights))
+    time_fit = _time_penalties(flights, earliest, latest)
+
+    w_price, w_duration, w_stops, w_fit, w_layover = (
+        weights["price"], weights["duration"], weights["stops"], weights["time_fit"], weights["layover"]
+    )
+    scores = [
+        w_price * p + w_duration * d + w_stops * s + w_fit * t + w_layover * l
+        for p, d, s, t, l in zip(
+            _normalize(price), _normalize(duration), _normalize(stops),
+            _normalize(time_fit), _normalize(layover)
+        )
+    ]
+
+    def scored(i: int):
+        # Hand back the type we were given, so FlightOffer callers keep getting FlightOffers
+        flight = flights[i]
+        if isinstance(flight, FlightOffer):
+            return flight.with_score(round(scores[i], 4))
+        return dict(flight, score=round(scores[i], 4))
+
+    top = heapq.nsmallest(top_k, range(len(flights)), key=scores.__getitem__)
+    objectives = list(zip(price, duration, stops, time_fit, layover))
+    pareto = sorted(_pareto_front(objectives), key=scores.__getitem__)
+
+    return {
+        "top": [scored(i) for i in top],
+        "pareto": [scored(i) for i in pareto]
+    }
+
+
+if __name__ == "__main__":
+    # Benchmark: rank 1,000 synthetic offers
+    import random
+    import timeit
+    from datetime import timedelta
+
+    random.seed(7)
+    base = datetime(2025, 4, 19)
+    offers = []
+    for n in range(1000):
+        departure = base + timedelta(minutes=random.randint(0, 1439))
+        offers.append({
+            "airline": random.choice(["AA", "UA", "DL", "WN"]),
+            "flight_number": str(n),
+            "departure": departure.isoformat(),
+            "price": f"{random.uniform(89, 900):.2f}",
+            "currency": "USD",
+            "stops": random.choice([0, 0, 1, 1, 2]),
+            "duration_minutes": random.randint(90, 900),
+            "layover_minutes": random.randint(0, 300)
+        })
+
+    runs = 50
+    elapsed = timeit.timeit(
+        lambda: rank_flights(offers, top_k=10,
+                             earliest_departure="2025-04-19T08:00:00",
+                             latest_departure="2025-04-19T18:00:00"),
+        number=runs
+    )
+    ranked = rank_flights(offers, top_k=10)
+    print(f"ranked {len(offers)} offers in {elapsed / runs * 1000:.2f} ms "
+          f"({len(ranked['pareto'])} on the Pareto frontier)")
@@ -1,49 +1,37 @@
 import json
-from datetime import datetime
-from amadeus import Client, ResponseError
-from airportsdata import load
-from dotenv import load_dotenv
-import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+from datetime import datetime, date as date_cls, timedelta
+from amadeus import ResponseError
 import logging
+from amadeus_gateway import get_client
+from flight_stuff.airport_index import PRIMARY_AIRPORTS, get_airport_index, metro_airports
+from flight_stuff.flight_cache import get_flight_cache, make_cache_key
+from flight_stuff.models import FlightOffer, parse_flight_offers
+from flight_stuff.ranking import rank_flights
+from ttl_cache import TTLCache
+
+# Number of offers requested when ranking, so there is something to choose from
+RANKING_POOL_SIZE = 50
+
+# Upper bound on concurrent Amadeus requests issued by a single window search
+WINDOW_SEARCH_WORKERS = 4
+
+# Widest window a single search covers on each side of the preferred date
+MAX_WINDOW_DAYS = 7
+
+# Upper bound on concurrent Amadeus requests issued by a single metro-area search
+METRO_SEARCH_WORKERS = 6
+
+# How long a flight delay prediction stays fresh
+STATUS_CACHE_TTL = 120
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Load environment variables from .env file
-load_dotenv()
-
-# Initialize Amadeus Client with .env credentials
-amadeus_client_id = os.getenv('AMADEUS_CLIENT_ID')
-amadeus_client_secret = os.getenv('AMADEUS_CLIENT_SECRET')
-
-if not amadeus_client_id or not amadeus_client_secret:
-    logger.error("Amadeus API credentials not found in .env file")
-    raise ValueError("Missing Amadeus API credentials")
-
-amadeus = Client(
-    client_id=amadeus_client_id,
-    client_secret=amadeus_client_secret
-)
-
-# Load airport data
-airports = load('IATA')
-
-PRIMARY_AIRPORTS = {
-    "chicago": "ORD",
-    "new york": "JFK",
-    "washington": "IAD",
-    "los angeles": "LAX",
-    "houston": "IAH",
-    "tokyo": "HND",
-    "london": "LHR",
-    "paris": "CDG",
-    "philadelphia": "PHL",
-    "san francisco": "SFO",
-    "dallas": "DFW",
-    "seattle": "SEA"
-    # Add more as needed
-}
+# Delay predictions change slowly, so repeat lookups within a couple of minutes are served from memory
+status_cache = TTLCache(ttl_seconds=STATUS_CACHE_TTL, max_entries=1024)
 
 def city_to_iata(city_name: str) -> str:
     """
@@ -62,14 +50,14 @@ def city_to_iata(city_name: str) -> str:
     
     # First check in our predefined dictionary
     if city_key in PRIMARY_AIRPORTS:
-        logger.info(f"Found city {city_name} in PRIMARY_AIRPORTS: {PRIMARY_AIRPORTS[city_key]}")
+        logger.debug(f"Found city {city_name} in PRIMARY_AIRPORTS: {PRIMARY_AIRPORTS[city_key]}")
         return PRIMARY_AIRPORTS[city_key]
     
-    # Then search in the airports database
-    for code, data in airports.items():
-        if data.get('city', '').lower() == city_key:
-            logger.info(f"Found city {city_name} in airports database: {code}")
-            return code
+    # Then resolve through the prebuilt airport index (aliases, prefixes, typos)
+    candidates = get_airport_index().resolve(city_name, limit=1)
+    if candidates:
+        logger.debug(f"Resolved city {city_name} to {candidates[0]['iata']} ({candidates[0]['match']} match)")
+        return candidates[0]["iata"]
     
     # If we reach here, city wasn't found
     logger.warning(f"Could not find IATA code for city: {city_name}")
@@ -86,7 +74,7 @@ def search_flights(from_city, to_city, date, num_results=5):
         num_results: Maximum number of results to return
         
     Returns:
-        List of flight data dictionaries
+        List of FlightOffer objects, readable like the previous flight dictionaries
     """
     try:
         logger.info(f"Searching flights from {from_city} to {to_city} on {date}")
@@ -107,35 +95,25 @@ def search_flights(from_city, to_city, date, num_results=5):
             logger.error(f"Invalid date format: {date}. Expected YYYY-MM-DD")
             return []
         
-        response = amadeus.shopping.flight_offers_search.get(
-            originLocationCode=from_city,
-            destinationLocationCode=to_city,
-            departureDate=date,
-            adults=1,
-            max=num_results,
-            currencyCode='USD'
-        )
-        
-        flights = response.data
-        logger.info(f"Found {len(flights)} flights")
-        
-        results = []
-        for flight in flights:
-            try:
-                segment = flight['itineraries'][0]['segments'][0]
-                results.append({
-                    "airline": segment["carrierCode"],
-                    "flight_number": segment["number"],
-                    "departure": segment["departure"]["at"],
-                    "arrival": segment["arrival"]["at"],
-                    "from": segment["departure"]["iataCode"],
-                    "to": segment["arrival"]["iataCode"],
-                    "price": flight["price"]["total"],
-                    "currency": flight["price"]["currency"]
-                })
-            except KeyError as e:
-                logger.warning(f"Error parsing flight data: {e}")
-                # Continue processing other flights
+        cache = get_flight_cache()
+        cache_key = make_cache_key(from_city, to_city, date, adults=1, currency='USD', max_results=num_results)
+        cached_rows = cache.get(cache_key)
+        if cached_rows is None:
+            response = get_client().shopping.flight_offers_search.get(
+                originLocationCode=from_city,
+                destinationLocationCode=to_city,
+                departureDate=date,
+                adults=1,
+                max=num_results,
+                currencyCode='USD'
+            )
+            # Parse straight into compact offers so the raw response can be released
+            results = parse_flight_offers(response.data or [])
+            cache.set(cache_key, [offer.to_row() for offer in results])
+            logger.info(f"Found {len(results)} flights")
+        else:
+            results = [FlightOffer.from_row(row) for row in cached_rows]
+            logger.info(f"Found {len(results)} flights (cached)")
                 
         return results
         
@@ -149,21 +127,214 @@ def search_flights(from_city, to_city, date, num_results=5):
         logger.error(f"Unexpected error in search_flights: {str(e)}")
         return []
 
-def select_best_flight(flight_list):
-    """Select the best flight from a list (currently returns the first one)"""
-    return flight_list[0] if flight_list else None
+def _cheapest(flights):
+    """Return the lowest-priced flight from a list of FlightOffer objects."""
+    priced = [f for f in flights if f.get("price") is not None]
+    return min(priced, key=lambda f: float(f["price"])) if priced else None
+
+def search_flights_window(from_city, to_city, center_date, days_before=3, days_after=3,
+                          num_results=5, max_workers=WINDOW_SEARCH_WORKERS):
+    """
+    Search a window of departure dates concurrently and build a price calendar.
+    Each day searches every airport pair between the two metro areas; all of
+    those searches share one pool of max_workers threads.
+    
+    Args:
+        from_city: Origin city name, city code, or airport code
+        to_city: Destination city name, city code, or airport code
+        center_date: Preferred departure date (YYYY-MM-DD)
+        days_before: Number of days before center_date to include (at most MAX_WINDOW_DAYS)
+        days_after: Number of days after center_date to include (at most MAX_WINDOW_DAYS)
+        num_results: Maximum number of offers to request per day
+        max_workers: Maximum number of concurrent Amadeus requests
+        
+    Returns:
+        Dictionary with a "calendar" mapping each date to its cheapest flight
+        (or None) and the overall "cheapest" flight in the window
+    """
+    try:
+        center = datetime.strptime(center_date, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        logger.error(f"Invalid date format: {center_date}. Expected YYYY-MM-DD")
+        return {"calendar": {}, "cheapest": None}
+
+    days_before = min(max(0, days_before), MAX_WINDOW_DAYS)
+    days_after = min(max(0, days_after), MAX_WINDOW_DAYS)
+
+    # Amadeus rejects departure dates in the past
+    today = date_cls.today()
+    dates = [
+        (center + timedelta(days=offset)).strftime('%Y-%m-%d')
+        for offset in range(-days_before, days_after + 1)
+        if center + timedelta(days=offset) >= today
+    ]
+    if not dates:
+        return {"calendar": {}, "cheapest": None}
+
+    pairs = _airport_pairs(from_city, to_city)
+    if not pairs:
+        logger.error(f"Unable to find airports for {from_city} or {to_city}")
+        return {"calendar": {}, "cheapest": None}
+
+    logger.info(f"Searching {len(dates)} departure dates from {from_city} to {to_city} around {center_date}")
+    # One flat list of (origin, destination, date) searches on one pool, so the whole
+    # window never has more than max_workers requests in flight
+    searches = [(origin, destination, day) for day in dates for origin, destination in pairs]
+    per_day = {day: [] for day in dates}
+    for (_, _, day), flights in zip(searches, _search_many(searches, num_results, max_workers)):
+        per_day[day].extend(flights)
+    calendar = {day: _cheapest(flights) for day, flights in per_day.items()}
+
+    cheapest = _cheapest([f for f in calendar.values() if f])
+    return {
+        "calendar": {day: flight.to_dict() if flight else None for day, flight in calendar.items()},
+        "cheapest": cheapest.to_dict() if cheapest else None
+    }
+
+def search_round_trip(from_city, to_city, depart_date, return_date, num_results=5, max_pairs=5,
+                      max_workers=METRO_SEARCH_WORKERS):
+    """
+    Search outbound and return legs concurrently and pair them into itineraries.
+    Each leg searches every airport pair between the two metro areas.
+    
+    Args:
+        from_city: Origin city name, city code, or airport code
+        to_city: Destination city name, city code, or airport code
+        depart_date: Outbound departure date (YYYY-MM-DD)
+        return_date: Return departure date (YYYY-MM-DD)
+        num_results: Maximum number of offers to request per leg
+        max_pairs: Maximum number of paired itineraries to return
+        max_workers: Maximum number of concurrent Amadeus requests
+        
+    Returns:
+        List of round-trip dictionaries sorted by combined price
+    """
+    try:
+        if datetime.strptime(return_date, '%Y-%m-%d') < datetime.strptime(depart_date, '%Y-%m-%d'):
+            logger.error(f"Return date {return_date} is before departure date {depart_date}")
+            return []
+    except (TypeError, ValueError):
+        logger.error(f"Invalid dates: {depart_date}, {return_date}. Expected YYYY-MM-DD")
+        return []
+
+    outbound_pairs = _airport_pairs(from_city, to_city)
+    if not outbound_pairs:
+        logger.error(f"Unable to find airports for {from_city} or {to_city}")
+        return []
+
+    logger.info(f"Searching round trip {from_city} <-> {to_city}, {depart_date} to {return_date}")
+    # Both legs' airport pairs go on one pool instead of one pool per leg
+    searches = ([(origin, destination, depart_date) for origin, destination in outbound_pairs]
+                + [(destination, origin, return_date) for origin, destination in outbound_pairs])
+    results = _search_many(searches, num_results, max_workers)
+    outbound_flights = _merge_offers(results[:len(outbound_pairs)])
+    return_flights = _merge_offers(results[len(outbound_pairs):])
+
+    pairs = []
+    for outbound in outbound_flights:
+        # Amadeus times are local to each airport. The return leg leaves from the metro
+        # area the outbound leg lands in, so both times are on that area's clock
+        landed = datetime.fromisoformat(outbound["arrival"])
+        for inbound in return_flights:
+            # The return leg has to leave after the outbound leg lands
+            if datetime.fromisoformat(inbound["departure"]) <= landed:
+                continue
+            pairs.append({
+                "outbound": outbound.to_dict(),
+                "return": inbound.to_dict(),
+                "total_price": round(float(outbound["price"]) + float(inbound["price"]), 2),
+                "currency": outbound["currency"]
+            })
+
+    pairs.sort(key=lambda pair: pair["total_price"])
+    return pairs[:max_pairs]
+
+def _offer_identity(offer):
+    """Key identifying the same flights sold as separate offers (same legs, same times)."""
+    return tuple(
+        (carrier, number, origin, departure)
+        for carrier, number, origin, _, departure, _ in offer.segment_rows
+    )
+
+def search_flights_metro(from_city_raw, to_city_raw, date, num_results=5, max_workers=METRO_SEARCH_WORKERS,
+                         **ranking_options):
+    """
+    Search every airport pair between two metro areas concurrently and merge the results.
+    
+    Args:
+        from_city_raw: Origin city name, city code, or airport code
+        to_city_raw: Destination city name, city code, or airport code
+        date: Departure date (YYYY-MM-DD)
+        num_results: Maximum number of offers to request per airport pair
+        max_workers: Maximum number of concurrent Amadeus requests
+        ranking_options: Extra arguments for ranking.rank_flights
+        
+    Returns:
+        Deduplicated FlightOffer objects from all airport pairs, best-ranked first,
+        each with its ranking score (the same type search_flights returns)
+    """
+    pairs = _airport_pairs(from_city_raw, to_city_raw)
+    if not pairs:
+        logger.error(f"Unable to find airports for {from_city_raw} or {to_city_raw}")
+        return []
+
+    logger.info(f"Searching {len(pairs)} airport pairs from {from_city_raw} to {to_city_raw} on {date}")
+    per_pair = _search_many([(origin, destination, date) for origin, destination in pairs], num_results, max_workers)
+    return _merge_offers(per_pair, **ranking_options)
+
+def _airport_pairs(from_city, to_city):
+    """Every (origin, destination) airport pair between the two cities' metro areas."""
+    return [
+        (origin, destination)
+        for origin, destination in product(metro_airports(from_city), metro_airports(to_city))
+        if origin != destination
+    ]
+
+def _search_many(searches, num_results, max_workers):
+    """
+    Run (origin, destination, date) searches on one pool of at most max_workers threads.
+    Returns each search's offers, in the order of searches.
+    """
+    if not searches:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(searches)))) as pool:
+        return list(pool.map(lambda search: search_flights(*search, num_results), searches))
+
+def _merge_offers(offer_lists, **ranking_options):
+    """Deduplicate offers from several airport pairs and rank them best-first."""
+    # The same flights can come back as several offers; keep the cheapest of each
+    unique = {}
+    for offer in (offer for offers in offer_lists for offer in offers):
+        identity = _offer_identity(offer)
+        if identity not in unique or float(offer.price) < float(unique[identity].price):
+            unique[identity] = offer
+
+    ranked = rank_flights(list(unique.values()), top_k=len(unique), **ranking_options)
+    return ranked["top"]
+
+def select_best_flight(flight_list, **ranking_options):
+    """Select the best flight from a list by multi-criteria score (see ranking.rank_flights)"""
+    ranked = rank_flights(flight_list, top_k=1, **ranking_options)
+    return ranked["top"][0] if ranked["top"] else None
 
 def get_real_time_flight_status(airline_code, flight_number, origin_code, departure_date):
     """Get real-time flight status using Amadeus API"""
     try:
+        cache_key = "|".join([airline_code.upper(), str(flight_number), origin_code.upper(), departure_date])
+        cached = status_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         logger.info(f"Checking status for flight {airline_code}{flight_number} from {origin_code} on {departure_date}")
         
-        response = amadeus.travel.predictions.flight_delay.get(
+        response = get_client().travel.predictions.flight_delay.get(
             carrierCode=airline_code,
             flightNumber=str(flight_number),
             scheduledDepartureDate=departure_date,
             originLocationCode=origin_code
         )
+        if response.data is not None:
+            status_cache.set(cache_key, response.data)
         return response.data
     except ResponseError as error:
         logger.error(f"Flight delay API error: {error}")
@@ -184,29 +355,23 @@ def run_flight_agent(from_city_raw, to_city_raw, depart_date):
         depart_date: Departure date (YYYY-MM-DD)
         
     Returns:
-        Best flight found or None if no flights are found
+        Best flight dictionary found or None if no flights are found
     """
     logger.info(f"Starting flight search from {from_city_raw} to {to_city_raw} on {depart_date}")
     
-    # Convert city names to IATA codes
-    from_city = city_to_iata(from_city_raw)
-    to_city = city_to_iata(to_city_raw)
-
-    if from_city == "unknown" or to_city == "unknown":
-        logger.error(f"Unable to find IATA code for: {from_city_raw if from_city == 'unknown' else ''} "
-                    f"or {to_city_raw if to_city == 'unknown' else ''}")
-        return None  # Return None to indicate failure
-
-    logger.info(f"🔍 Searching flights from {from_city} to {to_city} on {depart_date}...")
-    flights = search_flights(from_city, to_city, depart_date)
+    # Search every airport serving each city (e.g. JFK, LGA and EWR for New York)
+    logger.info(f"🔍 Searching flights from {from_city_raw} to {to_city_raw} on {depart_date}...")
+    flights = search_flights_metro(from_city_raw, to_city_raw, depart_date, num_results=RANKING_POOL_SIZE)
     
     if not flights:
         logger.warning("No flights found.")
         return None  # Return None if no flights are found
 
-    best_flight = select_best_flight(flights)
+    # search_flights_metro returns flights already ranked best-first
+    best_flight = flights[0]
     if best_flight:
         logger.info("Best flight found:")
+        best_flight = best_flight.to_dict()
         logger.info(json.dumps(best_flight, indent=2))
         return best_flight
     else:
@@ -0,0 +1,74 @@
+import pytest
+
+from flight_stuff import run_flight_agent
+from flight_stuff.airport_index import city_code, get_airport_index, metro_airports, normalize_city
+from flight_stuff.models import FlightOffer
+from flight_stuff.test_flight_search import in_days, make_offer
+
+
+def iata_codes(query, **options):
+    return [candidate["iata"] for candidate in get_airport_index().resolve(query, **options)]
+
+
+@pytest.mark.parametrize("raw", ["São Paulo", "sao  paulo", "Sao-Paulo", " SAO PAULO "])
+def test_normalize_city_shares_one_key(raw):
+    assert normalize_city(raw) == "sao paulo"
+
+
+@pytest.mark.parametrize("name, airports", [
+    ("New York", ["JFK", "LGA", "EWR"]),
+    ("NYC", ["JFK", "LGA", "EWR"]),
+    ("new york city", ["JFK", "LGA", "EWR"]),
+    ("LGA", ["LGA"]),
+    ("Indianapolis", ["IND"]),
+    ("", []),
+])
+def test_metro_airports(name, airports):
+    assert metro_airports(name) == airports
+
+
+def test_a_qualified_name_is_not_the_metro():
+    assert metro_airports("Paris, TX") != ["CDG", "ORY"]
+    assert len(metro_airports("Paris, TX")) == 1
+
+
+@pytest.mark.parametrize("name, code", [
+    ("JFK", "NYC"), ("new york city", "NYC"), ("Chicago", "CHI"), ("MDW", "CHI"), ("Indianapolis", "IND"), ("", None)
+])
+def test_city_code(name, code):
+    assert city_code(name) == code
+
+
+def test_resolve_aliases_and_airport_codes():
+    assert iata_codes("indy")[0] == "IND"
+    assert iata_codes("jfk")[0] == "JFK"
+
+
+def test_resolve_a_single_typo():
+    assert iata_codes("Chicgo")[0] == "ORD"
+
+
+def test_resolve_uses_the_state_qualifier():
+    assert iata_codes("Portland, OR")[0] == "PDX"
+    assert iata_codes("Portland, ME")[0] == "PWM"
+
+
+@pytest.mark.parametrize("query", ["doa", "adn", "bsh"])
+def test_three_letter_inputs_are_never_typo_matched(query):
+    matches = {candidate["match"] for candidate in get_airport_index().resolve(query)}
+    assert "fuzzy" not in matches
+
+
+def test_metro_search_returns_scored_flight_offers(monkeypatch):
+    prices = {"JFK": (180.0, "1"), "LGA": (150.0, "2"), "EWR": (210.0, "3")}
+    monkeypatch.setattr(run_flight_agent, "search_flights", lambda origin, destination, day, num_results=5: [
+        make_offer(origin, destination, day, prices[destination][0], number=prices[destination][1])
+    ])
+
+    flights = run_flight_agent.search_flights_metro("IND", "New York", in_days(30))
+
+    assert len(flights) == 3
+    assert all(isinstance(flight, FlightOffer) for flight in flights)
+    assert all(flight["score"] == flight.score is not None for flight in flights)
+    assert flights[0]["to"] == "LGA"
+    assert "score" in flights[0].to_dict()
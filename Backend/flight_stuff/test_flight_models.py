@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+from flight_stuff.models import FlightOffer, Itinerary, Segment, parse_flight_offers, parse_iso_duration
+
+
+def raw_segment(origin, destination, departs, arrives, number="100", carrier="AA"):
+    return {
+        "departure": {"iataCode": origin, "terminal": "1", "at": departs},
+        "arrival": {"iataCode": destination, "at": arrives},
+        "carrierCode": carrier, "number": number, "aircraft": {"code": "321"}, "numberOfStops": 0
+    }
+
+
+def raw_offer(offer_id="1", price="199.99", duration="PT5H10M", return_leg=True):
+    itineraries = [{"duration": duration, "segments": [
+        raw_segment("IND", "ORD", "2025-04-19T06:00:00", "2025-04-19T07:10:00", "100"),
+        raw_segment("ORD", "JFK", "2025-04-19T08:40:00", "2025-04-19T11:10:00", "200"),
+    ]}]
+    if return_leg:
+        itineraries.append({"duration": "PT2H", "segments": [
+            raw_segment("JFK", "IND", "2025-04-21T18:00:00", "2025-04-21T20:00:00", "300", carrier="DL"),
+        ]})
+    return {
+        "type": "flight-offer", "id": offer_id, "itineraries": itineraries,
+        "price": {"currency": "USD", "total": price, "base": "150.00"},
+        "travelerPricings": [{"travelerId": "1"}]
+    }
+
+
+@pytest.mark.parametrize("duration, minutes", [
+    ("PT5H30M", 330), ("PT45M", 45), ("PT2H", 120), ("P1DT2H", 1560), (None, None), ("", None), ("soon", None)
+])
+def test_parse_iso_duration(duration, minutes):
+    assert parse_iso_duration(duration) == minutes
+
+
+def test_flat_keys_describe_the_outbound_itinerary():
+    offer = FlightOffer.from_amadeus(raw_offer())
+
+    assert offer["airline"] == "AA"
+    assert offer["flight_number"] == "100"
+    assert (offer["from"], offer["to"]) == ("IND", "JFK")
+    assert offer["departure"] == "2025-04-19T06:00:00"
+    assert offer["arrival"] == "2025-04-19T11:10:00"
+    assert (offer["price"], offer["currency"]) == ("199.99", "USD")
+    assert offer["stops"] == 1
+    assert offer["duration_minutes"] == 310
+    assert offer["layover_minutes"] == 90
+
+
+def test_mapping_protocol_matches_the_legacy_dictionaries():
+    offer = FlightOffer.from_amadeus(raw_offer())
+
+    as_dict = dict(offer)
+    assert list(as_dict) == list(FlightOffer.KEYS)
+    assert as_dict == offer.to_dict()
+    assert json.loads(offer.to_json()) == json.loads(json.dumps(as_dict))
+    assert offer.get("score") is None
+    assert offer.get("score", 0) == 0
+    with pytest.raises(KeyError):
+        offer["score"]
+
+
+def test_every_itinerary_and_segment_is_kept():
+    offer = FlightOffer.from_amadeus(raw_offer())
+
+    outbound, inbound = offer.itineraries
+    assert isinstance(outbound, Itinerary) and isinstance(outbound.segments[0], Segment)
+    assert [s.number for s in outbound.segments] == ["100", "200"]
+    assert (inbound.segments[0].carrier, inbound.stops, inbound.duration_minutes) == ("DL", 0, 120)
+    assert offer["itineraries"][1]["segments"][0]["from"] == "JFK"
+    # Built once, then reused
+    assert offer.itineraries is offer.itineraries
+
+
+def test_duration_falls_back_to_the_segment_times():
+    offer = FlightOffer.from_amadeus(raw_offer(duration=None, return_leg=False))
+
+    assert offer["duration_minutes"] == 310
+    assert offer.itineraries[0].duration_minutes == 310
+
+
+def test_models_are_slotted():
+    offer = FlightOffer.from_amadeus(raw_offer())
+
+    for value in (offer, offer.itineraries[0], offer.itineraries[0].segments[0]):
+        assert not hasattr(value, "__dict__")
+        with pytest.raises(AttributeError):
+            value.note = "x"
+
+
+def test_codes_are_interned():
+    first = FlightOffer.from_amadeus(json.loads(json.dumps(raw_offer("1"))))
+    second = FlightOffer.from_amadeus(json.loads(json.dumps(raw_offer("2"))))
+
+    assert first["from"] is second["from"]
+    assert first.itineraries[0].segments[0].carrier is second.itineraries[0].segments[0].carrier
+
+
+def test_cache_rows_round_trip_through_json():
+    offer = FlightOffer.from_amadeus(raw_offer())
+
+    restored = FlightOffer.from_row(json.loads(json.dumps(offer.to_row())))
+
+    assert restored.to_dict() == offer.to_dict()
+    assert restored.offer_id == "1"
+    assert restored.segment_rows == offer.segment_rows
+    hash(restored.segment_rows)
+
+
+def test_segment_rows_cover_every_itinerary():
+    offer = FlightOffer.from_amadeus(raw_offer())
+
+    assert [row[1] for row in offer.segment_rows] == ["100", "200", "300"]
+
+
+def test_parse_skips_malformed_offers():
+    missing_price = raw_offer("2")
+    del missing_price["price"]
+    no_segments = raw_offer("3")
+    no_segments["itineraries"] = [{"duration": "PT1H", "segments": []}]
+    bad_segment = raw_offer("4")
+    del bad_segment["itineraries"][0]["segments"][0]["carrierCode"]
+
+    offers = parse_flight_offers([raw_offer("1"), missing_price, no_segments, bad_segment, raw_offer("5")])
+
+    assert [offer.offer_id for offer in offers] == ["1", "5"]
@@ -0,0 +1,96 @@
+import pytest
+
+from flight_stuff.ranking import rank_flights
+
+ONLY_PRICE = {"price": 1.0, "duration": 0.0, "stops": 0.0, "time_fit": 0.0, "layover": 0.0}
+ONLY_TIME_FIT = {"price": 0.0, "duration": 0.0, "stops": 0.0, "time_fit": 1.0, "layover": 0.0}
+
+
+def flight(number, price, duration=120, stops=0, layover=0, departure="2025-04-19T10:00:00"):
+    return {
+        "airline": "AA", "flight_number": number, "departure": departure, "price": f"{price:.2f}",
+        "currency": "USD", "stops": stops, "duration_minutes": duration, "layover_minutes": layover
+    }
+
+
+def numbers(flights):
+    return [f["flight_number"] for f in flights]
+
+
+def test_empty_and_unpriced_input():
+    assert rank_flights([]) == {"top": [], "pareto": []}
+    assert rank_flights([dict(flight("1", 100), price=None)]) == {"top": [], "pareto": []}
+
+
+def test_single_offer_is_top_and_on_the_front():
+    ranked = rank_flights([flight("1", 250)])
+
+    assert numbers(ranked["top"]) == numbers(ranked["pareto"]) == ["1"]
+    assert ranked["top"][0]["score"] == 0.0
+
+
+def test_tied_offers_keep_input_order_and_share_the_front():
+    ranked = rank_flights([flight("1", 150), flight("2", 150), flight("3", 400)])
+
+    assert numbers(ranked["top"]) == ["1", "2", "3"]
+    assert ranked["top"][0]["score"] == ranked["top"][1]["score"]
+    # Identical offers do not dominate each other
+    assert numbers(ranked["pareto"]) == ["1", "2"]
+
+
+def test_dominated_offers_are_left_off_the_front():
+    cheap_slow = flight("cheap", 120, duration=400, stops=1, layover=90)
+    dear_fast = flight("fast", 380, duration=130)
+    dominated = flight("worse", 200, duration=450, stops=1, layover=120)
+    also_dominated = flight("worst", 400, duration=500, stops=2, layover=200)
+
+    ranked = rank_flights([dominated, cheap_slow, also_dominated, dear_fast], top_k=4)
+
+    assert set(numbers(ranked["pareto"])) == {"cheap", "fast"}
+    assert set(numbers(ranked["top"])) == {"cheap", "fast", "worse", "worst"}
+    assert ranked["top"][-1]["flight_number"] == "worst"
+
+
+def test_weights_decide_the_order():
+    flights = [flight("cheap", 100, duration=600), flight("fast", 500, duration=90)]
+
+    assert numbers(rank_flights(flights, weights=ONLY_PRICE)["top"]) == ["cheap", "fast"]
+    only_duration = dict(ONLY_PRICE, price=0.0, duration=1.0)
+    assert numbers(rank_flights(flights, weights=only_duration)["top"]) == ["fast", "cheap"]
+
+
+def test_top_k_limits_the_result():
+    flights = [flight(str(n), 100 + n) for n in range(10)]
+
+    assert numbers(rank_flights(flights, top_k=3, weights=ONLY_PRICE)["top"]) == ["0", "1", "2"]
+
+
+def test_departures_outside_the_window_are_penalized():
+    flights = [
+        flight("early", 100, departure="2025-04-19T05:00:00"),
+        flight("inside", 100, departure="2025-04-19T12:00:00"),
+        flight("late", 100, departure="2025-04-19T20:00:00"),
+    ]
+    ranked = rank_flights(flights, weights=ONLY_TIME_FIT,
+                          earliest_departure="2025-04-19T08:00:00", latest_departure="2025-04-19T18:00:00")
+
+    assert numbers(ranked["top"])[0] == "inside"
+    assert ranked["top"][0]["score"] == 0.0
+
+
+@pytest.mark.parametrize("departure, earliest, latest", [
+    # Naive local departures (as Amadeus returns them) against bounds with an offset
+    ("2025-04-19T{}:00", "2025-04-19T08:00:00-04:00", "2025-04-19T18:00:00-04:00"),
+    # Departures with an offset against naive bounds
+    ("2025-04-19T{}:00-04:00", "2025-04-19T08:00:00", "2025-04-19T18:00:00"),
+    # Both with offsets
+    ("2025-04-19T{}:00-04:00", "2025-04-19T08:00:00-04:00", "2025-04-19T18:00:00-04:00"),
+])
+def test_time_zone_awareness_is_normalized(departure, earliest, latest):
+    flights = [flight("early", 100, departure=departure.format("06:00")),
+               flight("inside", 100, departure=departure.format("09:30")),
+               flight("late", 100, departure=departure.format("19:00"))]
+
+    ranked = rank_flights(flights, weights=ONLY_TIME_FIT, earliest_departure=earliest, latest_departure=latest)
+
+    assert numbers(ranked["top"]) == ["inside", "late", "early"]
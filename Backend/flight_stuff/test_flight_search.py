@@ -0,0 +1,165 @@
+import threading
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from flight_stuff import run_flight_agent
+from flight_stuff.models import FlightOffer
+
+
+def make_offer(origin, destination, day, price, departs="10:00", arrives="12:00", number="100"):
+    return FlightOffer.from_amadeus({
+        "id": "1",
+        "price": {"total": f"{price:.2f}", "currency": "USD"},
+        "itineraries": [{"duration": "PT2H", "segments": [{
+            "carrierCode": "AA", "number": number,
+            "departure": {"iataCode": origin, "at": f"{day}T{departs}:00"},
+            "arrival": {"iataCode": destination, "at": f"{day}T{arrives}:00"},
+        }]}],
+    })
+
+
+class FakeSearch:
+    """Stands in for search_flights; prices come from price(origin, destination, day) or None for no flights."""
+
+    def __init__(self, price=lambda origin, destination, day: 100.0, delay=0.0):
+        self.price = price
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, origin, destination, day, num_results=5):
+        with self._lock:
+            self.calls.append((origin, destination, day))
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            price = self.price(origin, destination, day)
+            return [] if price is None else [make_offer(origin, destination, day, price)]
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def fake_search(monkeypatch):
+    search = FakeSearch()
+    monkeypatch.setattr(run_flight_agent, "search_flights", search)
+    return search
+
+
+def in_days(days):
+    return (date.today() + timedelta(days=days)).isoformat()
+
+
+def test_window_is_clamped_to_max_window_days(fake_search):
+    center = date.today() + timedelta(days=60)
+    run_flight_agent.search_flights_window("IND", "BOS", center.isoformat(), days_before=30, days_after=30)
+
+    days = sorted({day for _, _, day in fake_search.calls})
+    limit = run_flight_agent.MAX_WINDOW_DAYS
+    assert len(days) == 2 * limit + 1
+    assert days[0] == (center - timedelta(days=limit)).isoformat()
+    assert days[-1] == (center + timedelta(days=limit)).isoformat()
+
+
+def test_window_skips_past_dates(fake_search):
+    window = run_flight_agent.search_flights_window("IND", "BOS", in_days(1), days_before=3, days_after=1)
+
+    assert sorted(window["calendar"]) == [in_days(0), in_days(1), in_days(2)]
+    assert all(day >= in_days(0) for _, _, day in fake_search.calls)
+
+
+def test_window_entirely_in_the_past_searches_nothing(fake_search):
+    window = run_flight_agent.search_flights_window("IND", "BOS", in_days(-10), days_before=2, days_after=2)
+
+    assert window == {"calendar": {}, "cheapest": None}
+    assert fake_search.calls == []
+
+
+def test_window_merges_every_airport_pair_into_the_price_calendar(fake_search):
+    first, second, third = in_days(30), in_days(31), in_days(32)
+    prices = {
+        ("JFK", first): 180.0, ("LGA", first): 150.0, ("EWR", first): 210.0,
+        ("JFK", second): 140.0,
+        ("LGA", third): 95.0, ("EWR", third): 120.0,
+    }
+    fake_search.price = lambda origin, destination, day: prices.get((destination, day))
+
+    window = run_flight_agent.search_flights_window("IND", "New York", second, days_before=1, days_after=1)
+
+    assert {(origin, destination) for origin, destination, _ in fake_search.calls} == {
+        ("IND", "JFK"), ("IND", "LGA"), ("IND", "EWR")
+    }
+    assert len(fake_search.calls) == 9
+    calendar = window["calendar"]
+    assert (calendar[first]["to"], calendar[first]["price"]) == ("LGA", "150.00")
+    assert (calendar[second]["to"], calendar[second]["price"]) == ("JFK", "140.00")
+    assert (calendar[third]["to"], calendar[third]["price"]) == ("LGA", "95.00")
+    assert window["cheapest"]["price"] == "95.00"
+
+
+def test_window_days_without_flights_map_to_none(fake_search):
+    busy_day = in_days(30)
+    fake_search.price = lambda origin, destination, day: 99.0 if day == busy_day else None
+
+    window = run_flight_agent.search_flights_window("IND", "BOS", busy_day, days_before=1, days_after=1)
+
+    assert window["calendar"][in_days(29)] is None
+    assert window["calendar"][in_days(31)] is None
+    assert window["cheapest"]["price"] == "99.00"
+
+
+def test_window_keeps_every_search_within_one_bounded_pool(fake_search):
+    fake_search.delay = 0.01
+    run_flight_agent.search_flights_window("Chicago", "New York", in_days(30), days_before=2, days_after=2,
+                                           max_workers=3)
+
+    # 5 days x 2 Chicago airports x 3 New York airports, never more than 3 at once
+    assert len(fake_search.calls) == 30
+    assert fake_search.peak <= 3
+
+
+def test_window_rejects_bad_dates(fake_search):
+    assert run_flight_agent.search_flights_window("IND", "BOS", "next friday") == {"calendar": {}, "cheapest": None}
+    assert fake_search.calls == []
+
+
+def test_round_trip_searches_both_legs_on_one_bounded_pool(fake_search):
+    fake_search.delay = 0.01
+    run_flight_agent.search_round_trip("Chicago", "New York", in_days(30), in_days(33), max_workers=4)
+
+    chicago = {"ORD", "MDW"}
+    outbound = [call for call in fake_search.calls if call[0] in chicago and call[2] == in_days(30)]
+    inbound = [call for call in fake_search.calls if call[1] in chicago and call[2] == in_days(33)]
+    assert len(outbound) == len(inbound) == 6
+    assert len(fake_search.calls) == 12
+    assert fake_search.peak <= 4
+
+
+def test_round_trip_only_pairs_returns_leaving_after_the_outbound_lands(monkeypatch):
+    day = in_days(30)
+    legs = {
+        ("IND", "BOS"): [make_offer("IND", "BOS", day, 120.0, departs="09:00", arrives="13:30", number="1")],
+        ("BOS", "IND"): [
+            make_offer("BOS", "IND", day, 60.0, departs="12:45", arrives="14:00", number="2"),
+            make_offer("BOS", "IND", day, 70.0, departs="13:30", arrives="15:00", number="3"),
+            make_offer("BOS", "IND", day, 90.0, departs="18:15", arrives="19:30", number="4"),
+        ],
+    }
+    monkeypatch.setattr(run_flight_agent, "search_flights",
+                        lambda origin, destination, when, num_results=5: legs[(origin, destination)])
+
+    round_trips = run_flight_agent.search_round_trip("IND", "BOS", day, day)
+
+    assert [trip["return"]["flight_number"] for trip in round_trips] == ["4"]
+    assert round_trips[0]["total_price"] == 210.0
+
+
+def test_round_trip_rejects_a_return_before_the_departure(fake_search):
+    assert run_flight_agent.search_round_trip("IND", "BOS", in_days(30), in_days(28)) == []
+    assert fake_search.calls == []
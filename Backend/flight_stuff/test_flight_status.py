@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import pytest
+
+from flight_stuff import run_flight_agent
+
+
+class FakeDelayPredictions:
+    def __init__(self, data):
+        self.data = data
+        self.calls = []
+
+    def get(self, **params):
+        self.calls.append(params)
+        return SimpleNamespace(data=self.data)
+
+
+@pytest.fixture
+def predictions(monkeypatch):
+    fake = FakeDelayPredictions([{"result": "LESS_THAN_30_MINUTES", "probability": "0.9"}])
+    client = SimpleNamespace(travel=SimpleNamespace(predictions=SimpleNamespace(flight_delay=fake)))
+    monkeypatch.setattr(run_flight_agent, "get_client", lambda: client)
+    run_flight_agent.status_cache.clear()
+    yield fake
+    run_flight_agent.status_cache.clear()
+
+
+def test_repeat_lookups_are_served_from_the_cache(predictions):
+    first = run_flight_agent.get_real_time_flight_status("aa", 100, "ind", "2025-04-19")
+    second = run_flight_agent.get_real_time_flight_status("AA", "100", "IND", "2025-04-19")
+
+    assert first == second == predictions.data
+    assert len(predictions.calls) == 1
+
+
+def test_empty_predictions_are_not_cached(predictions):
+    predictions.data = None
+    run_flight_agent.get_real_time_flight_status("AA", 100, "IND", "2025-04-19")
+    run_flight_agent.get_real_time_flight_status("AA", 100, "IND", "2025-04-19")
+
+    assert len(predictions.calls) == 2
+
+
+@pytest.mark.parametrize("airline, origin", [(None, "IND"), ("AA", None)])
+def test_missing_codes_return_none_instead_of_raising(predictions, airline, origin):
+    assert run_flight_agent.get_real_time_flight_status(airline, 100, origin, "2025-04-19") is None
+    assert predictions.calls == []
@@ -0,0 +1,255 @@
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from amadeus import ResponseError
+from amadeus_gateway import MissingCredentialsError, get_client
+
+logger = logging.getLogger(__name__)
+
+# Hotel lists by city barely change; refresh them in the background after this long
+DEFAULT_MAX_AGE_SECONDS = 7 * 24 * 3600
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hotel_catalog.db")
+
+# Grid cell size in degrees (~5.5 km of latitude)
+GRID_CELL_DEGREES = 0.05
+EARTH_RADIUS_KM = 6371.0
+
+# Coordinates written into an event location, e.g. "40.7580, -73.9855"
+_COORDINATES = re.compile(r"(-?\d{1,2}\.\d+)\s*,\s*(-?\d{1,3}\.\d+)")
+# A location is only used if it is this close to some hotel of the city
+CITY_RADIUS_KM = 50.0
+# Shorter hotel names ("Hotel", "Inn") match too much free text
+MIN_NAME_LENGTH = 6
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _coordinates(hotel: Dict) -> Optional[Tuple[float, float]]:
+    geo = hotel.get("geoCode") or {}
+    try:
+        return float(geo["latitude"]), float(geo["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class HotelGrid:
+    """
+    Uniform lat/lon grid over hotel coordinates.
+
+    A radius query only visits the cells overlapping the query's bounding
+    box, then filters those hotels by exact great-circle distance.
+    """
+
+    def __init__(self, hotels: Iterable[Dict], cell_degrees: float = GRID_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._cells: Dict[Tuple[int, int], List[Tuple[float, float, Dict]]] = {}
+        for hotel in hotels:
+            point = _coordinates(hotel)
+            if point:
+                self._cells.setdefault(self._cell(*point), []).append((point[0], point[1], hotel))
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_degrees)), int(math.floor(lon / self.cell_degrees))
+
+    def within(self, lat: float, lon: float, radius_km: float) -> List[Tuple[float, Dict]]:
+        """(distance_km, hotel) pairs within radius_km of a point, nearest first."""
+        lat_span = radius_km / 111.0
+        lon_span = radius_km / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+        min_row, min_col = self._cell(lat - lat_span, lon - lon_span)
+        max_row, max_col = self._cell(lat + lat_span, lon + lon_span)
+
+        matches = []
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                for hotel_lat, hotel_lon, hotel in self._cells.get((row, col), ()):
+                    distance = haversine_km(lat, lon, hotel_lat, hotel_lon)
+                    if distance <= radius_km:
+                        matches.append((distance, hotel))
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+
+class HotelCatalog:
+    """
+    Locally persisted hotel lists per IATA city code.
+
+    Lists are read from SQLite (and memory) instead of re-downloading
+    reference_data.locations.hotels.by_city on every search. A stale list is
+    still served while a background thread refreshes it; a city seen for the
+    first time is fetched synchronously.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS):
+        self.db_path = db_path
+        self.max_age_seconds = max_age_seconds
+        self._cities: Dict[str, Tuple[float, List[Dict], HotelGrid]] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS city_hotels ("
+                "city_code TEXT PRIMARY KEY, fetched_at REAL NOT NULL, hotels TEXT NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        # sqlite3's own context manager only commits; closing() releases the file handle
+        with closing(sqlite3.connect(self.db_path)) as db, db:
+            yield db
+
+    def hotels(self, city_code: str) -> List[Dict]:
+        """All known hotels in a city, in the order Amadeus lists them."""
+        return self._entry(city_code)[1]
+
+    def hotels_near(self, city_code: str, points: List[Tuple[float, float]], radius_km: float = 5.0,
+                    limit: Optional[int] = None) -> List[Dict]:
+        """
+        Hotels within radius_km of any of the given (lat, lon) points.
+
+        Results are sorted by average distance to all points, so a hotel
+        central to the whole itinerary comes first. Each hotel dict gets a
+        distance_km field with that average.
+        """
+        if not points:
+            return []
+        grid = self._entry(city_code)[2]
+
+        candidates = {}
+        for lat, lon in points:
+            for _, hotel in grid.within(lat, lon, radius_km):
+                candidates[hotel["hotelId"]] = hotel
+
+        ranked = []
+        for hotel in candidates.values():
+            hotel_lat, hotel_lon = _coordinates(hotel)
+            average = sum(haversine_km(lat, lon, hotel_lat, hotel_lon) for lat, lon in points) / len(points)
+            ranked.append((average, hotel))
+        ranked.sort(key=lambda match: match[0])
+        if limit:
+            ranked = ranked[:limit]
+        return [dict(hotel, distance_km=round(average, 2)) for average, hotel in ranked]
+
+    def locate(self, city_code: str, location: str) -> Optional[Tuple[float, float]]:
+        """
+        Coordinates for an event location in a city, or None.
+
+        Understands coordinates written into the location and locations naming
+        one of the city's hotels. Points more than CITY_RADIUS_KM from every
+        hotel of the city (e.g. an event at home) are ignored.
+
+        Calendar events only carry their location as free text and no geocoder
+        is configured, so street addresses and other venue names are not
+        resolved; callers then search the whole city instead.
+        """
+        if not location:
+            return None
+        _, hotels, grid = self._entry(city_code)
+
+        match = _COORDINATES.search(location)
+        if match:
+            lat, lon = float(match.group(1)), float(match.group(2))
+            if -90 <= lat <= 90 and -180 <= lon <= 180 and grid.within(lat, lon, CITY_RADIUS_KM):
+                return lat, lon
+            return None
+
+        text = location.lower()
+        for hotel in hotels:
+            name = (hotel.get("name") or "").lower()
+            if len(name) >= MIN_NAME_LENGTH and name in text:
+                return _coordinates(hotel)
+        return None
+
+    def refresh(self, city_code: str) -> List[Dict]:
+        """Download a city's hotel list now and store it."""
+        response = get_client().reference_data.locations.hotels.by_city.get(cityCode=city_code)
+        hotels = response.data or []
+        fetched_at = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO city_hotels (city_code, fetched_at, hotels) VALUES (?, ?, ?)",
+                (city_code, fetched_at, json.dumps(hotels))
+            )
+        with self._lock:
+            self._cities[city_code] = (fetched_at, hotels, HotelGrid(hotels))
+        logger.info(f"Hotel catalog for {city_code} refreshed with {len(hotels)} hotels")
+        return hotels
+
+    def _entry(self, city_code: str) -> Tuple[float, List[Dict], HotelGrid]:
+        city_code = city_code.upper()
+        with self._lock:
+            entry = self._cities.get(city_code)
+        if entry is None:
+            entry = self._load(city_code)
+        if entry is None:
+            self.refresh(city_code)
+            with self._lock:
+                return self._cities[city_code]
+        if time.time() - entry[0] > self.max_age_seconds:
+            self._refresh_in_background(city_code)
+        return entry
+
+    def _load(self, city_code: str) -> Optional[Tuple[float, List[Dict], HotelGrid]]:
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT fetched_at, hotels FROM city_hotels WHERE city_code = ?", (city_code,)
+            ).fetchone()
+        if not row:
+            return None
+        hotels = json.loads(row[1])
+        entry = (row[0], hotels, HotelGrid(hotels))
+        with self._lock:
+            self._cities[city_code] = entry
+        return entry
+
+    def _refresh_in_background(self, city_code: str) -> None:
+        with self._lock:
+            if city_code in self._refreshing:
+                return
+            self._refreshing.add(city_code)
+
+        def run():
+            try:
+                self.refresh(city_code)
+            except (ResponseError, MissingCredentialsError) as e:
+                logger.warning(f"Background refresh of hotel catalog for {city_code} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(city_code)
+
+        threading.Thread(target=run, name=f"hotel-catalog-{city_code}", daemon=True).start()
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> HotelCatalog:
+    """
+    Return the process-wide hotel catalog, creating it on first use.
+
+    Configured through HOTEL_CATALOG_DB (SQLite path) and HOTEL_CATALOG_MAX_AGE (seconds).
+    """
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = HotelCatalog(
+                    db_path=os.getenv("HOTEL_CATALOG_DB") or DEFAULT_DB_PATH,
+                    max_age_seconds=float(os.getenv("HOTEL_CATALOG_MAX_AGE", DEFAULT_MAX_AGE_SECONDS))
+                )
+    return _catalog
@@ -1,38 +1,237 @@
-from amadeus import Client, ResponseError
-import json
+from amadeus import ClientError, NotFoundError, ResponseError
+from amadeus_gateway import MissingCredentialsError, get_client
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, timedelta
+from hotel.catalog import get_catalog
+from hotel.ranking import rank_hotels
+from ttl_cache import TTLCache
+import copy
+import logging
+import os
+import time
 
-amadeus = Client(client_id='4DOHUkYZtyPPu4FrRG8cmzXqrnhwwNby', client_secret='yG0IHsgf3eRA0J0d')
+logger = logging.getLogger(__name__)
 
-def get_hotel(cityCode):
+# hotel IDs per offers request, and how many of those requests run at once
+OFFERS_CHUNK_SIZE = 20
+AVAILABILITY_WORKERS = 4
+
+# when searching near itinerary events, how far to look and how many of the nearest hotels to check
+NEAR_RADIUS_KM = 5.0
+NEAR_CANDIDATES = 60
+
+# how many bookable hotels to gather before ranking them
+RANKING_CANDIDATES = 30
+
+# offers found while checking availability are reused instead of searched again:
+# per request (offer_scope) and, unless HOTEL_OFFER_CACHE_TTL is 0, for a short time across requests.
+# callers get their own copies, so editing an offer never changes what the next caller sees
+_request_offers = ContextVar("hotel_request_offers", default=None)
+_offer_cache_ttl = float(os.getenv("HOTEL_OFFER_CACHE_TTL", 60))
+shared_offer_cache = TTLCache(ttl_seconds=_offer_cache_ttl, max_entries=512) if _offer_cache_ttl > 0 else None
+
+@contextmanager
+def offer_scope():
+    # nested scopes share the outer request's offers
+    if _request_offers.get() is not None:
+        yield
+        return
+    token = _request_offers.set({})
     try:
-        response = amadeus.reference_data.locations.hotels.by_city.get(cityCode=cityCode)
-        hotels = response.data
+        yield
+    finally:
+        _request_offers.reset(token)
+
+# offers are keyed on the stay they price; missing dates are the ones the API assumes
+# (check in today, stay one night), so a dateless search never answers a dated one
+
+def _offer_key(hotelId, adults, checkInDate, checkOutDate):
+    try:
+        checkIn = date.fromisoformat(checkInDate) if checkInDate else date.today()
+        checkOut = date.fromisoformat(checkOutDate) if checkOutDate else checkIn + timedelta(days=1)
+    except ValueError:
+        # the API rejects malformed dates itself; key them as given
+        return f"{hotelId}|{adults}|{checkInDate or ''}|{checkOutDate or ''}"
+    return f"{hotelId}|{adults}|{checkIn.isoformat()}|{checkOut.isoformat()}"
+
+def _cached_offers(key):
+    scope = _request_offers.get()
+    if scope is not None and key in scope:
+        return copy.deepcopy(scope[key])
+    if shared_offer_cache is not None:
+        return copy.deepcopy(shared_offer_cache.get(key))
+    return None
+
+def _remember_offers(key, offers):
+    offers = copy.deepcopy(offers)
+    scope = _request_offers.get()
+    if scope is not None:
+        scope[key] = offers
+    if shared_offer_cache is not None:
+        shared_offer_cache.set(key, offers)
+
+# (lat, lon) points of the itinerary events that take place in the city, for the near= searches.
+# only events whose location holds coordinates or names a catalog hotel are placed (see
+# HotelCatalog.locate); with no points the searches cover the whole city
+
+def event_points(cityCode, events):
+    catalog = get_catalog()
+    points = []
+    for event in events or []:
+        point = catalog.locate(cityCode, event.get("location")) if isinstance(event, dict) else None
+        if point and point not in points:
+            points.append(point)
+    return points
+
+def get_hotel(cityCode, near=None, radius_km=NEAR_RADIUS_KM, checkInDate=None, checkOutDate=None):
+    try:
+        # find the first hotel with availability (the nearest one when near points are given)
+        search = find_available_hotels(cityCode, wanted=1, near=near, radius_km=radius_km,
+                                       checkInDate=checkInDate, checkOutDate=checkOutDate)
+        _log_search(cityCode, search)
         
-        # filename = "hotel.json"
-        # with open(filename, 'w') as file:
-        #     json.dump(hotels, file, indent=4)
+        if search["hotels"]:
+            # return the offers we already found so callers don't search them again
+            best = search["hotels"][0]
+            return dict(best["hotel"], offers=best["offers"])
         
-        # find the first hotel with availability
+        print("Not found")
+    except (ResponseError, MissingCredentialsError) as e:
+        print(e)
+
+# gathers bookable hotels and ranks every offer by nightly price against the budget,
+# rating and distance to the near points; returns the best top_k with their offer IDs
+
+def get_hotel_options(cityCode, adults=1, top_k=5, budget_per_night=None, near=None, radius_km=NEAR_RADIUS_KM,
+                      candidates=RANKING_CANDIDATES, checkInDate=None, checkOutDate=None):
+    try:
+        search = find_available_hotels(cityCode, adults=adults, wanted=candidates, near=near, radius_km=radius_km,
+                                       checkInDate=checkInDate, checkOutDate=checkOutDate)
+        _log_search(cityCode, search)
         
-        for hotel in hotels:
-            hotelId = hotel["hotelId"]
-            canBook = get_hotel_offers(hotelId)
-            
-            if canBook:
-                return hotel
+        pairs = (
+            (dict(hotelOffers.get("hotel") or {}, **found["hotel"]), offer)
+            for found in search["hotels"]
+            for hotelOffers in found["offers"]
+            for offer in hotelOffers.get("offers") or []
+        )
+        return rank_hotels(pairs, top_k=top_k, budget_per_night=budget_per_night)
+    except (ResponseError, MissingCredentialsError) as e:
+        logger.error(f"Hotel search in {cityCode} failed: {e}")
+        return []
+
+def _log_search(cityCode, search):
+    logger.info(f"Checked availability in {cityCode}: {search['requests']} requests, {search['elapsed_ms']:.0f} ms")
+    if search["failed_hotels"]:
+        logger.warning(f"Could not check {search['failed_hotels']} hotels in {cityCode}")
+
+# checks availability in chunked multi-hotel offer requests, several chunks at a time,
+# and stops as soon as enough bookable hotels have been found.
+# hotel lists come from the local catalog; with near=[(lat, lon), ...] only the
+# nearest hotels within radius_km of those points are checked, closest first
+# (the whole city is checked when no hotel is that close)
+
+def find_available_hotels(cityCode, adults=1, wanted=1, chunk_size=OFFERS_CHUNK_SIZE, max_workers=AVAILABILITY_WORKERS,
+                          near=None, radius_km=NEAR_RADIUS_KM, max_candidates=NEAR_CANDIDATES,
+                          checkInDate=None, checkOutDate=None):
+    start = time.perf_counter()
+    catalog = get_catalog()
+    hotels = catalog.hotels_near(cityCode, near, radius_km=radius_km, limit=max_candidates) if near else []
+    if not hotels:
+        hotels = catalog.hotels(cityCode)
+    requests = 0
+    failed = 0
+    
+    position = {hotel["hotelId"]: i for i, hotel in enumerate(hotels)}
+    hotelIds = list(position)
+    chunks = iter([hotelIds[i:i + chunk_size] for i in range(0, len(hotelIds), chunk_size)])
+    
+    found = []
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    pending = set()
+    
+    def submit_next_chunk():
+        chunk = next(chunks, None)
+        if chunk:
+            pending.add(pool.submit(_check_chunk, chunk, adults, checkInDate, checkOutDate))
+    
+    try:
+        # Only max_workers chunks are in flight at once, so stopping early saves the rest
+        for _ in range(max_workers):
+            submit_next_chunk()
         
-        print("Not found")
+        while pending and len(found) < wanted:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                data, chunk_requests, chunk_failed = future.result()
+                requests += chunk_requests
+                failed += chunk_failed
+                for hotelOffers in data:
+                    hotelId = hotelOffers.get("hotel", {}).get("hotelId")
+                    if hotelId in position and hotelOffers.get("available", True) and hotelOffers.get("offers"):
+                        found.append((position[hotelId], hotelOffers))
+                submit_next_chunk()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    
+    # Keep the catalog's hotel order (API order, or nearest first) among the hotels we found
+    found.sort(key=lambda item: item[0])
+    return {
+        "hotels": [{"hotel": hotels[i], "offers": [hotelOffers]} for i, hotelOffers in found[:wanted]],
+        "requests": requests,
+        "failed_hotels": failed,
+        "elapsed_ms": (time.perf_counter() - start) * 1000
+    }
+
+# one chunk of the availability scan; returns (offers, requests made, hotels that could not be checked).
+# the API rejects a whole multi-hotel request for a single bad hotel ID, so a chunk rejected
+# with a 4xx is split in half and retried until the bad IDs are isolated
+
+def _check_chunk(hotelIds, adults, checkInDate=None, checkOutDate=None):
+    try:
+        return _search_offers(",".join(hotelIds), adults, checkInDate, checkOutDate) or [], 1, 0
+    except (ClientError, NotFoundError) as e:
+        if len(hotelIds) == 1 or e.response.status_code == 429:
+            logger.warning(f"Offers request for {len(hotelIds)} hotels failed: {e}")
+            return [], 1, len(hotelIds)
+        middle = len(hotelIds) // 2
+        first = _check_chunk(hotelIds[:middle], adults, checkInDate, checkOutDate)
+        second = _check_chunk(hotelIds[middle:], adults, checkInDate, checkOutDate)
+        return first[0] + second[0], 1 + first[1] + second[1], first[2] + second[2]
     except ResponseError as e:
-        print(e)
+        logger.warning(f"Offers request for {len(hotelIds)} hotels failed: {e}")
+        return [], 1, len(hotelIds)
 
 # finds available offers by using the selected hotelId
 
-def get_hotel_offers(hotelId, adults=1):
+def get_hotel_offers(hotelId, adults=1, checkInDate=None, checkOutDate=None):
     try:
-        response = amadeus.shopping.hotel_offers_search.get(hotelIds=hotelId, adults=adults)
-        return response.data
-    except ResponseError as e:
-        print(e)        
+        return _search_offers(hotelId, adults, checkInDate, checkOutDate)
+    except (ResponseError, MissingCredentialsError) as e:
+        print(e)
+
+def _search_offers(hotelId, adults=1, checkInDate=None, checkOutDate=None):
+    single = "," not in hotelId
+    if single:
+        cached = _cached_offers(_offer_key(hotelId, adults, checkInDate, checkOutDate))
+        if cached is not None:
+            return cached
+    
+    params = {"hotelIds": hotelId, "adults": adults}
+    if checkInDate:
+        params["checkInDate"] = checkInDate
+    if checkOutDate:
+        params["checkOutDate"] = checkOutDate
+    
+    response = get_client().shopping.hotel_offers_search.get(**params)
+    # remember each hotel's offers, including those from multi-hotel requests
+    for hotelOffers in response.data or []:
+        offerHotelId = hotelOffers.get("hotel", {}).get("hotelId")
+        if offerHotelId:
+            _remember_offers(_offer_key(offerHotelId, adults, checkInDate, checkOutDate), [hotelOffers])
+    return response.data
 
 # agent uses selected offer (get offedId) to book a hotel
 
@@ -0,0 +1,114 @@
+import heapq
+import itertools
+import logging
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of each criterion in the combined score (lower score is better)
+DEFAULT_WEIGHTS = {
+    "price": 0.5,
+    "rating": 0.3,
+    "distance": 0.2
+}
+
+# Scale for nightly prices when the trip has no budget
+REFERENCE_NIGHTLY_PRICE = 200.0
+# Distance at which the distance criterion is at its worst
+REFERENCE_DISTANCE_KM = 10.0
+# Neutral value for a criterion we know nothing about (no rating, no coordinates)
+UNKNOWN_CRITERION = 0.5
+
+
+def nightly_price(offer: Dict) -> Optional[float]:
+    """Price per night of an Amadeus hotel offer, from its total and stay dates."""
+    try:
+        total = float(offer["price"]["total"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    try:
+        nights = (date.fromisoformat(offer["checkOutDate"]) - date.fromisoformat(offer["checkInDate"])).days
+    except (KeyError, TypeError, ValueError):
+        nights = 1
+    return total / max(nights, 1)
+
+
+def _rating(hotel: Dict) -> Optional[float]:
+    try:
+        return float(hotel["rating"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def score_offer(hotel: Dict, offer: Dict, budget_per_night: Optional[float] = None,
+                weights: Optional[Dict[str, float]] = None) -> Optional[float]:
+    """
+    Score one hotel offer; lower is better.
+
+    Price is measured against the nightly budget (or a reference price), and
+    going over budget costs double. Ratings are out of 5 stars; distance uses
+    the hotel's distance_km to the itinerary's events when the catalog added it.
+    Returns None for offers without a usable price.
+    """
+    price = nightly_price(offer)
+    if price is None:
+        return None
+    weights = weights or DEFAULT_WEIGHTS
+
+    scale = budget_per_night or REFERENCE_NIGHTLY_PRICE
+    price_score = price / scale
+    if budget_per_night and price > budget_per_night:
+        price_score += (price - budget_per_night) / scale
+
+    rating = _rating(hotel)
+    rating_score = UNKNOWN_CRITERION if rating is None else (5 - min(max(rating, 0), 5)) / 5
+
+    distance = hotel.get("distance_km")
+    distance_score = UNKNOWN_CRITERION if distance is None else min(distance / REFERENCE_DISTANCE_KM, 1.0)
+
+    return (weights["price"] * price_score + weights["rating"] * rating_score
+            + weights["distance"] * distance_score)
+
+
+def rank_hotels(
+    candidates: Iterable[Tuple[Dict, Dict]],
+    top_k: int = 5,
+    budget_per_night: Optional[float] = None,
+    weights: Optional[Dict[str, float]] = None
+) -> List[Dict]:
+    """
+    Pick the best top_k hotel offers.
+
+    Args:
+        candidates: (hotel, offer) pairs; may be a generator, it is consumed once
+        top_k: Number of offers to return
+        budget_per_night: Optional nightly budget for the trip
+        weights: Optional override of DEFAULT_WEIGHTS
+
+    Returns:
+        Up to top_k dictionaries with hotel, offer, nightly_price and score, best first.
+        Only top_k candidates are held at any time, however many are scored.
+    """
+    if top_k <= 0:
+        return []
+    weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+
+    # Max-heap on score (negated) so the worst kept offer is the one replaced
+    heap: List[tuple] = []
+    order = itertools.count()
+    for hotel, offer in candidates:
+        score = score_offer(hotel, offer, budget_per_night, weights)
+        if score is None:
+            continue
+        entry = (-score, -next(order), hotel, offer)
+        if len(heap) < top_k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    ranked = sorted(heap, reverse=True)
+    return [
+        {"hotel": hotel, "offer": offer, "nightly_price": round(nightly_price(offer), 2), "score": round(-neg, 4)}
+        for neg, _, hotel, offer in ranked
+    ]
@@ -0,0 +1,128 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from hotel import catalog
+from hotel.catalog import HotelCatalog, HotelGrid, haversine_km
+
+
+def hotel(hotelId, lat, lon, name=None):
+    return {"hotelId": hotelId, "name": name or f"Hotel {hotelId}",
+            "geoCode": {"latitude": lat, "longitude": lon}}
+
+
+# Around Times Square (40.7580, -73.9855)
+MIDTOWN = [
+    hotel("TSQ", 40.7585, -73.9850, "Marquis Times Square"),
+    hotel("BRY", 40.7540, -73.9840, "Bryant Park Suites"),
+    hotel("CPS", 40.7680, -73.9820),
+    hotel("WTC", 40.7110, -74.0120),
+    hotel("JFK", 40.6600, -73.7900),
+    {"hotelId": "NOGEO", "name": "No Coordinates Inn"},
+]
+
+
+class FakeClient:
+    def __init__(self, *lists, gate=None):
+        self.lists = list(lists)
+        self.gate = gate
+        self.calls = 0
+        self.reference_data = SimpleNamespace(locations=SimpleNamespace(hotels=SimpleNamespace(
+            by_city=SimpleNamespace(get=self.get))))
+
+    def get(self, cityCode):
+        self.calls += 1
+        if self.gate:
+            self.gate.wait(5)
+        return SimpleNamespace(data=self.lists[min(self.calls, len(self.lists)) - 1])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def install(fake):
+        monkeypatch.setattr(catalog, "get_client", lambda: fake)
+        return fake
+    return install
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "catalog.db")
+
+
+def ids(hotels):
+    return [h["hotelId"] for h in hotels]
+
+
+def test_grid_returns_hotels_within_the_radius_nearest_first():
+    grid = HotelGrid(MIDTOWN)
+
+    matches = grid.within(40.7580, -73.9855, 1.5)
+
+    assert ids(h for _, h in matches) == ["TSQ", "BRY", "CPS"]
+    assert [round(d, 3) for d, _ in matches] == sorted(round(d, 3) for d, _ in matches)
+    assert ids(h for _, h in grid.within(40.7580, -73.9855, 50)) == ["TSQ", "BRY", "CPS", "WTC", "JFK"]
+
+
+def test_grid_matches_a_brute_force_scan_across_cell_edges():
+    hotels = [hotel(f"H{i}", 40.70 + i * 0.013, -74.02 + i * 0.017) for i in range(20)]
+    grid = HotelGrid(hotels, cell_degrees=0.02)
+
+    for radius in (0.5, 2.0, 6.0):
+        expected = {h["hotelId"] for h in hotels
+                    if haversine_km(40.80, -73.90, h["geoCode"]["latitude"], h["geoCode"]["longitude"]) <= radius}
+        assert set(ids(h for _, h in grid.within(40.80, -73.90, radius))) == expected
+
+
+def test_hotels_near_ranks_by_average_distance_to_every_point(client, db_path):
+    client(FakeClient(MIDTOWN))
+    store = HotelCatalog(db_path)
+
+    near = store.hotels_near("nyc", [(40.7560, -73.9845), (40.7600, -73.9850)], radius_km=2.0, limit=2)
+
+    assert ids(near) == ["TSQ", "BRY"]
+    assert near[0]["distance_km"] < near[1]["distance_km"]
+    assert store.hotels_near("NYC", []) == []
+
+
+def test_locate_reads_coordinates_and_hotel_names(client, db_path):
+    client(FakeClient(MIDTOWN))
+    store = HotelCatalog(db_path)
+
+    assert store.locate("NYC", "Meeting room, 40.7505, -73.9934") == (40.7505, -73.9934)
+    assert store.locate("NYC", "Lunch at the Bryant Park Suites lobby") == (40.7540, -73.9840)
+    # Too far from every hotel in the city, or not resolvable without a geocoder
+    assert store.locate("NYC", "Home: 39.7684, -86.1581") is None
+    assert store.locate("NYC", "350 5th Ave") is None
+    assert store.locate("NYC", "") is None
+
+
+def test_lists_are_persisted_between_catalogs(client, db_path):
+    fake = client(FakeClient(MIDTOWN))
+    HotelCatalog(db_path).hotels("NYC")
+
+    assert ids(HotelCatalog(db_path).hotels("NYC")) == ids(MIDTOWN)
+    assert fake.calls == 1
+
+
+def test_stale_list_is_served_while_one_background_refresh_runs(client, db_path):
+    client(FakeClient(MIDTOWN[:2]))
+    HotelCatalog(db_path).hotels("NYC")
+
+    gate = threading.Event()
+    fake = client(FakeClient(MIDTOWN, gate=gate))
+    store = HotelCatalog(db_path, max_age_seconds=0)
+
+    # Served from the stale copy without waiting for the refresh, which only starts once
+    assert ids(store.hotels("NYC")) == ["TSQ", "BRY"]
+    assert ids(store.hotels("NYC")) == ["TSQ", "BRY"]
+    gate.set()
+    for thread in threading.enumerate():
+        if thread.name == "hotel-catalog-NYC":
+            thread.join(5)
+
+    assert fake.calls == 1
+    store.max_age_seconds = 3600
+    assert ids(store.hotels("NYC")) == ids(MIDTOWN)
+    assert ids(HotelCatalog(db_path).hotels("NYC")) == ids(MIDTOWN)
@@ -0,0 +1,187 @@
+import threading
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+from amadeus import ClientError
+
+from hotel import hotels
+from ttl_cache import TTLCache
+
+
+def offers_for(hotelId):
+    return {"hotel": {"hotelId": hotelId}, "available": True, "offers": [{"id": f"offer-{hotelId}"}]}
+
+
+class FakeCatalog:
+    def __init__(self, hotelIds, nearIds=()):
+        self.hotel_list = [{"hotelId": hotelId, "name": hotelId} for hotelId in hotelIds]
+        self.near_list = [{"hotelId": hotelId, "name": hotelId} for hotelId in nearIds]
+        self.near_calls = []
+
+    def hotels(self, cityCode):
+        return self.hotel_list
+
+    def hotels_near(self, cityCode, points, radius_km, limit):
+        self.near_calls.append((cityCode, points, radius_km, limit))
+        return self.near_list[:limit]
+
+
+class FakeClient:
+    """Answers hotel_offers_search.get; fail(ids) returns a status code to reject the request with."""
+
+    def __init__(self, available=lambda hotelId: True, fail=lambda ids: None, delay=lambda ids: 0.0):
+        self.available = available
+        self.fail = fail
+        self.delay = delay
+        self.requests = []
+        self._lock = threading.Lock()
+        self.shopping = SimpleNamespace(hotel_offers_search=SimpleNamespace(get=self.get))
+
+    def get(self, hotelIds, adults, **params):
+        ids = hotelIds.split(",")
+        with self._lock:
+            self.requests.append(ids)
+        time.sleep(self.delay(ids))
+        status = self.fail(ids)
+        if status:
+            raise ClientError(SimpleNamespace(status_code=status, result=None, parsed=False, body=""))
+        return SimpleNamespace(data=[offers_for(hotelId) for hotelId in ids if self.available(hotelId)])
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    def install(hotelIds, client, nearIds=(), offer_cache=None):
+        catalog = FakeCatalog(hotelIds, nearIds)
+        monkeypatch.setattr(hotels, "get_catalog", lambda: catalog)
+        monkeypatch.setattr(hotels, "get_client", lambda: client)
+        monkeypatch.setattr(hotels, "shared_offer_cache", offer_cache)
+        return catalog
+    return install
+
+
+def hotel_ids(count):
+    return [f"H{i:03d}" for i in range(count)]
+
+
+def found_ids(search):
+    return [found["hotel"]["hotelId"] for found in search["hotels"]]
+
+
+def test_checks_hotels_in_chunked_requests(stub):
+    client = FakeClient()
+    stub(hotel_ids(45), client)
+
+    search = hotels.find_available_hotels("NYC", wanted=100, chunk_size=20)
+
+    assert search["requests"] == 3
+    assert [len(ids) for ids in client.requests] == [20, 20, 5]
+    assert found_ids(search) == hotel_ids(45)
+    assert search["failed_hotels"] == 0
+
+
+def test_stops_once_enough_hotels_are_found(stub):
+    client = FakeClient()
+    stub(hotel_ids(100), client)
+
+    search = hotels.find_available_hotels("NYC", wanted=5, chunk_size=10, max_workers=1)
+
+    assert search["requests"] == 1
+    assert len(client.requests) == 1
+    assert found_ids(search) == hotel_ids(5)
+
+
+def test_keeps_catalog_order_when_chunks_finish_out_of_order(stub):
+    # The first chunk answers last, and only odd hotels have rooms
+    client = FakeClient(available=lambda hotelId: int(hotelId[1:]) % 2,
+                        delay=lambda ids: 0.05 if "H000" in ids else 0.0)
+    stub(hotel_ids(12), client)
+
+    search = hotels.find_available_hotels("NYC", wanted=100, chunk_size=4, max_workers=3)
+
+    assert found_ids(search) == ["H001", "H003", "H005", "H007", "H009", "H011"]
+    assert search["hotels"][0]["offers"][0]["offers"][0]["id"] == "offer-H001"
+
+
+def test_splits_a_rejected_chunk_to_isolate_the_bad_hotel(stub):
+    client = FakeClient(fail=lambda ids: 400 if "H002" in ids else None)
+    stub(hotel_ids(4), client)
+
+    search = hotels.find_available_hotels("NYC", wanted=100, chunk_size=4)
+
+    assert client.requests == [hotel_ids(4), ["H000", "H001"], ["H002", "H003"], ["H002"], ["H003"]]
+    assert search["requests"] == 5
+    assert search["failed_hotels"] == 1
+    assert found_ids(search) == ["H000", "H001", "H003"]
+
+
+def test_does_not_split_a_rate_limited_chunk(stub):
+    client = FakeClient(fail=lambda ids: 429)
+    stub(hotel_ids(4), client)
+
+    search = hotels.find_available_hotels("NYC", wanted=100, chunk_size=4)
+
+    assert search["requests"] == 1
+    assert search["failed_hotels"] == 4
+    assert search["hotels"] == []
+
+
+def test_checks_the_nearest_hotels_first(stub):
+    client = FakeClient()
+    catalog = stub(hotel_ids(10), client, nearIds=["H007", "H003"])
+
+    search = hotels.find_available_hotels("NYC", wanted=100, near=[(40.75, -73.98)], max_candidates=5)
+
+    assert catalog.near_calls == [("NYC", [(40.75, -73.98)], hotels.NEAR_RADIUS_KM, 5)]
+    assert client.requests == [["H007", "H003"]]
+    assert found_ids(search) == ["H007", "H003"]
+
+
+def test_searches_the_whole_city_when_no_hotel_is_near(stub):
+    client = FakeClient()
+    stub(hotel_ids(3), client)
+
+    search = hotels.find_available_hotels("NYC", wanted=100, near=[(0.0, 0.0)])
+
+    assert found_ids(search) == hotel_ids(3)
+
+
+def test_offers_are_cached_per_stay(stub):
+    client = FakeClient()
+    stub(hotel_ids(1), client, offer_cache=TTLCache(ttl_seconds=60))
+
+    hotels.get_hotel_offers("H000", 1, "2026-12-01", "2026-12-04")
+    hotels.get_hotel_offers("H000", 1, "2026-12-01", "2026-12-04")
+    hotels.get_hotel_offers("H000", 1)
+    hotels.get_hotel_offers("H000", 1, "2026-12-02", "2026-12-04")
+
+    assert len(client.requests) == 3
+
+
+def test_missing_dates_key_the_stay_the_api_assumes():
+    today = date.today()
+    assert hotels._offer_key("H000", 1, None, None) == hotels._offer_key(
+        "H000", 1, today.isoformat(), (today + timedelta(days=1)).isoformat())
+    assert hotels._offer_key("H000", 1, "2026-12-01", None) == "H000|1|2026-12-01|2026-12-02"
+
+
+def test_availability_scan_caches_offers_under_the_stay_dates(stub):
+    client = FakeClient()
+    stub(hotel_ids(3), client, offer_cache=TTLCache(ttl_seconds=60))
+
+    hotels.find_available_hotels("NYC", wanted=100, checkInDate="2026-12-01", checkOutDate="2026-12-04")
+    hotels.get_hotel_offers("H001", 1, "2026-12-01", "2026-12-04")
+    hotels.get_hotel_offers("H001", 1)
+
+    assert client.requests == [hotel_ids(3), ["H001"]]
+
+
+def test_cached_offers_are_copies(stub):
+    stub(hotel_ids(1), FakeClient(), offer_cache=TTLCache(ttl_seconds=60))
+
+    with hotels.offer_scope():
+        first = hotels.get_hotel_offers("H000", 1, "2026-12-01", "2026-12-04")
+        first[0]["offers"][0]["id"] = "edited"
+        assert hotels.get_hotel_offers("H000", 1, "2026-12-01", "2026-12-04")[0]["offers"][0]["id"] == "offer-H000"
+    assert hotels.get_hotel_offers("H000", 1, "2026-12-01", "2026-12-04")[0]["offers"][0]["id"] == "offer-H000"
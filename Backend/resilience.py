@@ -0,0 +1,130 @@
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: throttling and transient provider failures
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+    def __init__(self, endpoint, retry_in):
+        super().__init__(f"Circuit open for {endpoint}; retrying in {retry_in:.1f}s")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter shared by every thread in the process.
+
+    Allows bursts of up to `burst` calls, refilling at `rate` calls per second.
+    acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1, rate))
+        self._tokens = self.burst
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    fail fast for `reset_timeout` seconds. Then a single trial call is let
+    through (half-open): success closes the circuit, failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def retry_in(self):
+        """Seconds until an open circuit lets a trial call through."""
+        with self._lock:
+            return max(0.0, self._opened_at + self.reset_timeout - self._clock())
+
+    def allow(self):
+        """Whether a call may go out now. Claims the trial slot when half-open."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN:
+                # Only one trial call at a time; the next waits for its outcome
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_throttled(self):
+        """
+        A 429 response. Throttling doesn't count against a closed circuit, but it
+        fails a half-open trial call, so the circuit re-opens for another timeout.
+        """
+        with self._lock:
+            if self._state != self.CLOSED:
+                self._failures += 1
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold or self._state != self.CLOSED:
+                if self._state == self.CLOSED:
+                    logger.warning(f"Circuit opened after {self._failures} consecutive failures")
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+    def _current_state(self):
+        # Caller must hold self._lock
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+        return self._state
+
+
+def backoff_delay(attempt, base=0.5, cap=8.0):
+    """Exponential backoff with full jitter for the given (0-based) retry attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
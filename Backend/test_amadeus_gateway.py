@@ -0,0 +1,177 @@
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import URLError
+from urllib.request import Request
+
+import pytest
+
+from amadeus_gateway import KeepAliveHTTP, ResilientHTTP
+from resilience import CircuitBreaker, CircuitOpenError, RateLimiter
+
+ENDPOINT = "/v2/shopping/flight-offers"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeAmadeus(BaseHTTPRequestHandler):
+    """Answers each request with the next scripted (status, headers) pair, then 200."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.calls += 1
+            status, headers = server.script.pop(0) if server.script else (200, {})
+        body = b'{"data": []}'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def fake_server(*script):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeAmadeus)
+    server.script = list(script)
+    server.calls = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def make_transport(clock, **options):
+    delays = []
+
+    def sleep(seconds):
+        delays.append(seconds)
+        clock.sleep(seconds)
+
+    options.setdefault("max_retries", 3)
+    transport = ResilientHTTP(KeepAliveHTTP(pool_size=2, timeout=5), RateLimiter(1000, burst=1000),
+                              backoff_base=0.5, backoff_max=8.0, sleep=sleep, clock=clock, **options)
+    return transport, delays
+
+
+def get(server, transport):
+    return transport(Request(f"http://127.0.0.1:{server.server_address[1]}{ENDPOINT}?max=5"))
+
+
+def test_retries_server_errors_with_growing_jittered_backoff():
+    clock = FakeClock()
+    transport, delays = make_transport(clock)
+    with fake_server((503, {}), (502, {}), (500, {})) as server:
+        response = get(server, transport)
+
+    assert response.status == 200
+    assert server.calls == 4
+    assert len(delays) == 3
+    for attempt, delay in enumerate(delays):
+        assert 0 <= delay <= 0.5 * 2 ** attempt
+    assert transport.breaker(ENDPOINT).state == CircuitBreaker.CLOSED
+
+
+def test_gives_up_after_max_retries_and_returns_the_last_error():
+    clock = FakeClock()
+    transport, delays = make_transport(clock, max_retries=2)
+    with fake_server(*[(503, {})] * 5) as server:
+        response = get(server, transport)
+
+    assert response.status == 503
+    assert server.calls == 3
+    assert len(delays) == 2
+
+
+def test_throttling_honours_retry_after_and_does_not_open_the_circuit():
+    clock = FakeClock()
+    transport, delays = make_transport(clock, failure_threshold=2)
+    with fake_server((429, {"Retry-After": "2"}), (429, {"Retry-After": "60"}), (429, {})) as server:
+        response = get(server, transport)
+
+    assert response.status == 200
+    assert delays[:2] == [2.0, 8.0]
+    assert transport.breaker(ENDPOINT).state == CircuitBreaker.CLOSED
+
+
+def test_breaker_opens_and_fails_fast_until_the_reset_timeout():
+    clock = FakeClock()
+    transport, _ = make_transport(clock, max_retries=0, failure_threshold=3, reset_timeout=30.0)
+    with fake_server(*[(503, {})] * 3) as server:
+        for _ in range(3):
+            assert get(server, transport).status == 503
+        assert transport.breaker(ENDPOINT).state == CircuitBreaker.OPEN
+
+        with pytest.raises(URLError) as error:
+            get(server, transport)
+        assert isinstance(error.value.reason, CircuitOpenError)
+        assert server.calls == 3
+
+        # After the timeout one trial call goes out, and its success closes the circuit
+        clock.now += 30.0
+        assert get(server, transport).status == 200
+        assert server.calls == 4
+        assert transport.breaker(ENDPOINT).state == CircuitBreaker.CLOSED
+
+
+def test_throttled_trial_call_reopens_the_circuit():
+    clock = FakeClock()
+    transport, _ = make_transport(clock, max_retries=0, failure_threshold=1, reset_timeout=30.0)
+    with fake_server((503, {}), (429, {}), (200, {})) as server:
+        assert get(server, transport).status == 503
+        clock.now += 30.0
+        assert transport.breaker(ENDPOINT).state == CircuitBreaker.HALF_OPEN
+
+        assert get(server, transport).status == 429
+        breaker = transport.breaker(ENDPOINT)
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.retry_in() == 30.0
+
+        with pytest.raises(URLError):
+            get(server, transport)
+        assert server.calls == 2
+
+
+def test_network_errors_count_as_failures():
+    clock = FakeClock()
+    transport, delays = make_transport(clock, max_retries=1, failure_threshold=2)
+    with fake_server() as server:
+        port = server.server_address[1]
+    # The server is gone, so every connection is refused
+    with pytest.raises(URLError):
+        transport(Request(f"http://127.0.0.1:{port}{ENDPOINT}"))
+    assert len(delays) == 1
+    assert transport.breaker(ENDPOINT).state == CircuitBreaker.OPEN
+
+
+def test_rate_limiter_spaces_calls_after_the_burst():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=2, burst=2, clock=clock, sleep=clock.sleep)
+    started = []
+    for _ in range(6):
+        limiter.acquire()
+        started.append(clock.now)
+
+    assert started[:2] == [0.0, 0.0]
+    for previous, current in zip(started[1:], started[2:]):
+        assert current - previous == pytest.approx(0.5)
@@ -0,0 +1,105 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import travel_agents
+from calendar_py import calendar_code
+from flight_stuff import run_flight_agent
+
+
+def completion(content):
+    usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+@pytest.fixture
+def llm_reply(monkeypatch):
+    def install(content):
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+            create=lambda **kwargs: completion(content))))
+        monkeypatch.setattr(travel_agents, "get_openai_client", lambda: client)
+    return install
+
+
+def leg(number, departure, arrival):
+    return {"airline": "AA", "flight_number": number, "departure": departure, "arrival": arrival,
+            "from": "IND", "to": "JFK", "price": "100.00", "currency": "USD"}
+
+
+ROUND_TRIP = {
+    "outbound": leg("1", "2026-11-06T08:00:00", "2026-11-06T11:00:00"),
+    "return": leg("2", "2026-11-08T18:00:00", "2026-11-08T20:00:00"),
+    "total_price": 260.5,
+    "currency": "USD",
+}
+
+
+@pytest.mark.parametrize("reply", [
+    "not json",
+    json.dumps({"destination": "NYC", "start_date": "11/06/2026", "end_date": "2026-11-08"}),
+    json.dumps({"destination": "NYC", "start_date": "2026-11-08", "end_date": "2026-11-06"}),
+])
+def test_interpret_request_rejects_bad_replies(llm_reply, reply):
+    llm_reply(reply)
+
+    with pytest.raises(ValueError):
+        travel_agents.interpret_request("a weekend in New York")
+
+
+def test_interpret_request_returns_the_parameters_and_usage(llm_reply):
+    llm_reply(json.dumps({"destination": "NYC", "start_date": "2026-11-06", "end_date": "2026-11-08"}))
+
+    params, usage = travel_agents.interpret_request("a weekend in New York")
+
+    assert params["start_date"] == "2026-11-06"
+    assert usage["total_tokens"] == 15
+
+
+def test_fast_flight_books_both_legs_at_the_round_trip_price(monkeypatch):
+    calls = []
+    monkeypatch.setattr(run_flight_agent, "search_round_trip",
+                        lambda *args, **kwargs: calls.append(args) or [ROUND_TRIP])
+
+    flight = travel_agents._fast_flight("Indianapolis", "New York", "2026-11-06", "2026-11-08")
+
+    assert calls == [("Indianapolis", "New York", "2026-11-06", "2026-11-08")]
+    assert (flight["flight_number"], flight["departure"]) == ("1", "2026-11-06T08:00:00")
+    assert flight["return"] == {"airline": "AA", "flight_number": "2",
+                                "departure": "2026-11-08T18:00:00", "arrival": "2026-11-08T20:00:00"}
+    assert flight["price"] == 260.5
+
+
+@pytest.fixture
+def fast_path(monkeypatch):
+    monkeypatch.setattr(calendar_code, "get_free_busy", lambda *args, **kwargs: {"free": []})
+    monkeypatch.setattr(calendar_code, "get_calendar_events", lambda *args, **kwargs: {"events": []})
+    monkeypatch.setattr(run_flight_agent, "search_round_trip", lambda *args, **kwargs: [ROUND_TRIP])
+    monkeypatch.setattr(travel_agents, "_fast_hotel", lambda *args: {
+        "name": "Midtown Hotel", "price": 150.0, "address": "New York", "offer_id": "H1"})
+    monkeypatch.setattr(travel_agents, "summarize_plan", lambda *args: ("Your plan", {"requests": 1}))
+
+
+def test_fast_path_totals_the_round_trip_and_every_night(fast_path, monkeypatch):
+    monkeypatch.setattr(travel_agents, "interpret_request", lambda *args: (
+        {"destination": "New York", "start_date": "2026-11-06", "end_date": "2026-11-08"}, {"requests": 1}))
+
+    plan = travel_agents.trip_planner_fast("a weekend in New York")
+
+    assert plan["status"] == "complete"
+    assert plan["travel_plan"]["flight"]["return"]["flight_number"] == "2"
+    assert plan["travel_plan"]["total_cost"] == 260.5 + 2 * 150.0
+    assert plan["summary"] == "Your plan"
+
+
+def test_fast_path_survives_a_failed_interpretation(fast_path, monkeypatch):
+    def fail(*args):
+        raise ValueError("Trip ends before it starts")
+
+    monkeypatch.setattr(travel_agents, "interpret_request", fail)
+
+    plan = travel_agents.trip_planner_fast("a weekend in New York")
+
+    assert plan["status"] == "initial"
+    assert plan["summary"] is None
+    assert [step["agent"] for step in plan["trace"]] == ["free/busy lookup", "interpret request"]
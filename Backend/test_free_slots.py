@@ -0,0 +1,65 @@
+import pytest
+
+import travel_agents
+from travel_agents import compute_free_slots
+from trip_context import trip_scope
+
+TZ = "America/New_York"
+
+
+def event(summary, start, end):
+    return {"summary": summary, "start": {"dateTime": start, "timeZone": TZ}, "end": {"dateTime": end, "timeZone": TZ}}
+
+
+def slot_days(slots):
+    return sorted({slot["date"][:10] for slot in slots})
+
+
+def test_an_empty_calendar_is_free_all_day_on_every_trip_day():
+    slots = compute_free_slots([], "2026-11-02", "2026-11-04")
+
+    assert slot_days(slots) == ["2026-11-02", "2026-11-03", "2026-11-04"]
+    assert all((slot["start_time"], slot["end_time"], slot["minutes"]) == ("08:00", "22:00", 840) for slot in slots)
+
+
+def test_days_of_the_trip_without_events_are_covered():
+    events = [event("Conference", "2026-11-03T09:00:00-05:00", "2026-11-03T17:00:00-05:00")]
+
+    slots = compute_free_slots(events, "2026-11-02", "2026-11-05")
+
+    assert slot_days(slots) == ["2026-11-02", "2026-11-03", "2026-11-04", "2026-11-05"]
+    conference_day = [slot for slot in slots if slot["date"].startswith("2026-11-03")]
+    assert [(slot["start_time"], slot["end_time"]) for slot in conference_day] == [("17:15", "22:00")]
+
+
+def test_without_trip_dates_the_events_set_the_range():
+    events = [
+        event("Breakfast", "2026-11-03T08:00:00-05:00", "2026-11-03T09:00:00-05:00"),
+        event("Dinner", "2026-11-04T19:00:00-05:00", "2026-11-04T20:00:00-05:00"),
+    ]
+
+    assert slot_days(compute_free_slots(events)) == ["2026-11-03", "2026-11-04"]
+    assert slot_days(compute_free_slots(events, None, "2026-11-06")) == [
+        "2026-11-03", "2026-11-04", "2026-11-05", "2026-11-06"
+    ]
+
+
+@pytest.mark.parametrize("start, end", [(None, None), ("someday", "later")])
+def test_no_dates_and_no_events_gives_no_slots(start, end):
+    assert compute_free_slots([], start, end) == []
+
+
+def test_fill_gaps_uses_the_trip_dates(monkeypatch):
+    seen = {}
+
+    def fake_compute(events, start_day=None, end_day=None, **options):
+        seen.update(events=events, start=start_day, end=end_day)
+        raise RuntimeError("stop before the LLM call")
+
+    monkeypatch.setattr(travel_agents, "compute_free_slots", fake_compute)
+    with trip_scope() as trip:
+        trip.state = {"dates": {"start": "2026-11-02", "end": "2026-11-05"}}
+        with pytest.raises(RuntimeError):
+            travel_agents.fill_gaps()
+
+    assert seen == {"events": [], "start": "2026-11-02", "end": "2026-11-05"}
@@ -0,0 +1,48 @@
+import logging
+import threading
+
+from trip_context import TripContext, current_trip, trip_scope
+
+
+def test_outside_a_scope_every_call_gets_a_new_context(caplog):
+    with caplog.at_level(logging.WARNING, logger="trip_context"):
+        first = current_trip()
+        first.events.append({"summary": "stray"})
+        second = current_trip()
+
+    assert second is not first
+    assert second.events == []
+    assert "No active trip_scope" in caplog.text
+
+
+def test_a_scope_is_shared_by_nested_scopes_and_joined_threads():
+    seen = {}
+
+    def worker(name, join=None):
+        if join is None:
+            seen[name] = current_trip()
+            return
+        with trip_scope(join):
+            seen[name] = current_trip()
+
+    with trip_scope() as trip:
+        with trip_scope() as nested:
+            assert nested is trip
+        assert current_trip() is trip
+
+        threads = [threading.Thread(target=worker, args=("plain",)),
+                   threading.Thread(target=worker, args=("joined", trip))]
+        for thread in threads:
+            thread.start()
+            thread.join()
+
+    assert seen["plain"] is not trip
+    assert seen["joined"] is trip
+
+
+def test_an_explicit_context_is_used_and_restored():
+    outer, inner = TripContext(), TripContext()
+    with trip_scope(outer):
+        with trip_scope(inner):
+            assert current_trip() is inner
+        assert current_trip() is outer
@@ -1,26 +1,39 @@
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
 from agents import Agent, Runner, trace, function_tool
 from dotenv import load_dotenv
 from typing import Optional, Dict, List, Union
-from calendar_py import calendar_code
+from calendar_py import calendar_code, intervals
 import logging
-from flight_stuff import run_flight_agent
+from flight_stuff import run_flight_agent, airport_index
 from hotel import hotels
-from amadeus import Client, ResponseError
+from amadeus import ResponseError
 from agents.extensions.handoff_prompt import RECOMMENDED_PROMPT_PREFIX
 import re
 import json
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
+from trip_context import TripContext, current_trip, trip_scope
 
-client = OpenAI()
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+def get_openai_client() -> OpenAI:
+    """Return the shared OpenAI client, creating it on first use so importing this module needs no API key."""
+    global _openai_client
+    if _openai_client is None:
+        with _openai_client_lock:
+            if _openai_client is None:
+                _openai_client = OpenAI()
+    return _openai_client
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Global events variable
-events = []
-
 # Load environment variables
 load_dotenv()
 
@@ -31,7 +44,8 @@ def list_google_calendars() -> Dict[str, List[Dict]]:
     Lists all available Google Calendars the user has access to.
     """
     try:
-        service = calendar_code.get_calendar_service()
+        # A service of this thread's own; the shared one is not safe to use across threads
+        service = calendar_code.get_thread_calendar_service()
         if not service:
             return {"status": "error", "error": "Failed to authenticate with Google Calendar"}
         calendar_list = calendar_code.list_all_calendars(service)
@@ -51,17 +65,35 @@ def get_calendar_events_tool(
     try:
         events_data = calendar_code.get_calendar_events(start_date, end_date, calendar_id)
         
-        # Update global events variable
-        global events
+        # Keep the events on this request's trip context for the plan and fill_gaps
         if isinstance(events_data, dict) and "events" in events_data:
-            events = events_data["events"]
-            logger.info(f"Updated global events with {len(events)} events")
+            current_trip().events = events_data["events"]
+            logger.info(f"Updated trip events with {len(events_data['events'])} events")
             
         return {"status": "success", "data": events_data}
     except Exception as e:
         logger.error(f"Error in get_calendar_events_tool: {e}")
         return {"status": "error", "error": str(e)}
 
+@function_tool
+def get_free_windows_tool(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    min_minutes: Optional[int] = None
+) -> Dict[str, Union[List[Dict], str]]:
+    """
+    Returns the free time windows across all of the user's calendars for a date range (UTC).
+    Much smaller than the full event list; use it to decide when the user can travel.
+    """
+    try:
+        free_busy = calendar_code.get_free_busy(start_date, end_date, min_minutes=min_minutes or 0)
+        if "error" in free_busy:
+            return {"status": "error", "error": free_busy["error"]}
+        return {"status": "success", "date_range": free_busy["dateRange"], "free": free_busy["free"]}
+    except Exception as e:
+        logger.error(f"Error in get_free_windows_tool: {e}")
+        return {"status": "error", "error": str(e)}
+
 # --- Travel Planning Tools --- #
 @function_tool
 def search_flights(
@@ -72,78 +104,141 @@ def search_flights(
 ) -> Dict[str, Union[List[Dict], str]]:
     """
     Search for available flights matching criteria using Amadeus API.
+    Every airport of the origin and destination cities is searched (e.g. JFK, LGA and EWR for New York)
+    and the offers are returned ranked by price, duration, stops and layovers, best first.
     """
     try:
         origin_city = origin or "IND"
         if not departure_date:
             departure_date = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
         max_results = max_results or 5
+        if not airport_index.metro_airports(origin_city) or not airport_index.metro_airports(destination):
+            return {"status": "error", "error": f"Unknown airport for {origin_city} or {destination}"}
+
         logger.info(f"Searching flights from {origin_city} to {destination} on {departure_date}")
-        
-        from flight_stuff import run_flight_agent as flight_module
-        if callable(flight_module):
-            flight_data = flight_module(origin_city, destination, departure_date)
-        else:
-            if hasattr(flight_module, 'search'):
-                flight_data = flight_module.search(origin_city, destination, departure_date)
-            elif hasattr(flight_module, 'find_flights'):
-                flight_data = flight_module.find_flights(origin_city, destination, departure_date)
-            else:
-                flight_data = [{"airline": "Test Airline", "flight_number": "TA123", "from": origin_city, "to": destination, "departure": departure_date + "T10:00:00", "arrival": departure_date + "T12:00:00", "price": "199.99", "currency": "USD"}]
-        
-        if not flight_data:
+        flights = run_flight_agent.search_flights_metro(
+            origin_city, destination, departure_date, num_results=run_flight_agent.RANKING_POOL_SIZE
+        )
+        if not flights:
             return {"status": "error", "error": "No flights found for the given criteria"}
-        
-        valid_flights = [flight for flight in flight_data][:max_results]
-        return {"status": "success", "flights": valid_flights}
+
+        return {"status": "success", "flights": [flight.to_dict() for flight in flights[:max_results]]}
     except Exception as e:
         logger.error(f"Error in search_flights: {str(e)}")
         return {"status": "error", "error": str(e)}
 
 @function_tool
-def search_hotels(destination: str) -> Dict[str, Union[List[Dict], str]]:
+def search_flights_flexible(
+    destination: str,
+    departure_date: str,
+    origin: Optional[str] = None,
+    window_days: Optional[int] = None
+) -> Dict[str, Union[Dict, str]]:
+    """
+    Find the cheapest flight within +/- window_days (at most 7) of departure_date in a single call.
+    Returns a price calendar mapping each date to its cheapest flight.
+    """
+    try:
+        origin_city = origin or "IND"
+        window_days = 3 if window_days is None else min(max(0, window_days), run_flight_agent.MAX_WINDOW_DAYS)
+        if not airport_index.metro_airports(origin_city) or not airport_index.metro_airports(destination):
+            return {"status": "error", "error": f"Unknown airport for {origin_city} or {destination}"}
+
+        logger.info(f"Searching flights from {origin_city} to {destination} within {window_days} days of {departure_date}")
+        window = run_flight_agent.search_flights_window(
+            origin_city, destination, departure_date,
+            days_before=window_days, days_after=window_days
+        )
+        if not window["cheapest"]:
+            return {"status": "error", "error": "No flights found in the requested date window"}
+
+        return {"status": "success", "price_calendar": window["calendar"], "cheapest": window["cheapest"]}
+    except Exception as e:
+        logger.error(f"Error in search_flights_flexible: {str(e)}")
+        return {"status": "error", "error": str(e)}
+
+@function_tool
+def search_round_trip_flights(
+    destination: str,
+    departure_date: str,
+    return_date: str,
+    origin: Optional[str] = None,
+    max_results: Optional[int] = None
+) -> Dict[str, Union[List[Dict], str]]:
     """
-    Find available hotels using Amadeus API.
+    Search the outbound and return flights together in one call.
+    Returns paired itineraries sorted by combined price.
     """
     try:
-        # Clean up destination name for better search results
+        origin_city = origin or "IND"
+        if not airport_index.metro_airports(origin_city) or not airport_index.metro_airports(destination):
+            return {"status": "error", "error": f"Unknown airport for {origin_city} or {destination}"}
+
+        logger.info(f"Searching round trip {origin_city} <-> {destination}, {departure_date} to {return_date}")
+        round_trips = run_flight_agent.search_round_trip(
+            origin_city, destination, departure_date, return_date, max_pairs=max_results or 5
+        )
+        if not round_trips:
+            return {"status": "error", "error": "No round trips found for the given dates"}
+
+        return {"status": "success", "round_trips": round_trips}
+    except Exception as e:
+        logger.error(f"Error in search_round_trip_flights: {str(e)}")
+        return {"status": "error", "error": str(e)}
+
+def _format_address(hotel: Dict) -> str:
+    """Build a proper address string from an Amadeus hotel record"""
+    address_parts = []
+    if hotel.get('address', {}).get('line1'):
+        address_parts.append(hotel['address']['line1'])
+    if hotel.get('address', {}).get('city'):
+        address_parts.append(hotel['address']['city'])
+    if hotel.get('address', {}).get('country'):
+        address_parts.append(hotel['address']['country'])
+    return ', '.join(address_parts) if address_parts else "Address not available"
+
+@function_tool
+def search_hotels(
+    destination: str,
+    check_in_date: Optional[str] = None,
+    check_out_date: Optional[str] = None,
+    budget_per_night: Optional[float] = None,
+    max_results: Optional[int] = None
+) -> Dict[str, Union[List[Dict], str]]:
+    """
+    Find available hotels using Amadeus API for a stay from check_in_date to check_out_date (YYYY-MM-DD).
+    Returns several options ranked by nightly price against the budget, rating and
+    distance to the trip's calendar events, best first.
+    """
+    try:
+        # Hotels are listed by IATA city code, so map city names and airports to it ("JFK" -> "NYC")
         destination = destination.strip()
-        if destination.lower() in ["nyc", "new york", "new york city"]:
-            destination = "NYC"
-        elif destination.lower() in ["jfk", "jfk airport"]:
-            destination = "NYC"  # Search in the city instead of airport
+        destination = airport_index.city_code(re.sub(r"(?i)\s+airport$", "", destination)) or destination
             
         print(f"🏨 Searching hotels in {destination}")
-        hotel = hotels.get_hotel(destination)
-        if not hotel:
-            return {"status": "error", "error": "No hotels found in this location", "hotels": []}
-            
-        offers = hotels.get_hotel_offers(hotel["hotelId"])
-        if not offers:
+        with hotels.offer_scope():
+            # Prefer hotels close to where the trip's events take place
+            near = hotels.event_points(destination, current_trip().events)
+            options = hotels.get_hotel_options(
+                destination, top_k=max_results or 5, budget_per_night=budget_per_night, near=near or None,
+                checkInDate=check_in_date, checkOutDate=check_out_date
+            )
+        if not options:
             return {"status": "error", "error": "No available rooms found", "hotels": []}
         
-        best_offer = offers[0]['offers'][0]
-        price = float(best_offer['price']['total'])
-        
-        # Build a proper address string
-        address_parts = []
-        if hotel.get('address', {}).get('line1'):
-            address_parts.append(hotel['address']['line1'])
-        if hotel.get('address', {}).get('city'):
-            address_parts.append(hotel['address']['city'])
-        if hotel.get('address', {}).get('country'):
-            address_parts.append(hotel['address']['country'])
-        address = ', '.join(address_parts) if address_parts else "Address not available"
-        
         return {
             "status": "success",
             "hotels": [{
-                "name": hotel.get('name', 'Unknown Hotel'),
-                "price": price,
-                "rating": hotel.get('rating', 0),
-                "address": address,
+                "name": option["hotel"].get('name', 'Unknown Hotel'),
+                "price": option["nightly_price"],
+                "rating": option["hotel"].get('rating', 0),
+                "address": _format_address(option["hotel"]),
+                "offer_id": option["offer"].get("id"),
+                "check_in": option["offer"].get("checkInDate"),
+                "check_out": option["offer"].get("checkOutDate"),
+                "score": option["score"],
                 "available": True
-            }]
+            } for option in options]
         }
     except ResponseError as e:
         print(f"Amadeus API error: {e}")
@@ -170,13 +265,166 @@ def format_calendar_events(events: List[Dict]) -> str:
     
     return "\n".join(formatted_events)
 
+# --- Agents --- #
+# Built once at import; nothing in them depends on the request, which is passed
+# as input, so every request reuses the same stable system prompts.
+
+calendar_agent = Agent(
+    name="Calendar agent",
+    instructions=f"""{RECOMMENDED_PROMPT_PREFIX}
+
+    CONTINUE UNTIL YOU INTEGRATE ALL OF THE CALENDAR WITHIN THE TIMEFRAME.
+
+    You are a calendar specialist. Your job is to check the user's calendar for availability.
+
+    Steps:
+    1. Extract the destination and preferred dates from the request. If no dates are provided, suggest the next upcoming weekend.
+    2. Use get_free_windows_tool for the requested or suggested date range to see when the user is free.
+    3. Get events within the chosen travel dates using get_calendar_events_tool, so they appear in the plan.
+    4. Identify free periods suitable for travel (e.g., a weekend or week-long period).
+    5. ALWAYS hand off to the Flights agent using EXACTLY this format:
+       "<handoff to='Flights agent'>Available dates: [START_DATE] to [END_DATE], Destination: [DESTINATION]. Please find flights.</handoff>"
+
+    DO NOT search for flights or hotels yourself.
+    Example: For "Plan a weekend trip to Chicago under $1000", you might hand off:
+       "<handoff to='Flights agent'>Available dates: 2025-04-19 to 2025-04-20, Destination: Chicago. Please find flights.</handoff>"
+    """,
+    tools=[list_google_calendars, get_free_windows_tool, get_calendar_events_tool],
+)
+
+flights_agent = Agent(
+    name="Flights agent",
+    instructions=f"""{RECOMMENDED_PROMPT_PREFIX}
+
+    CONTINUE UNTIL YOU FIND A FLIGHT. BOOK A FLIGHT BACK BASED ON THE LEAVE DATE TOO.
+
+    You are a flight booking specialist. Your job is to find optimal flights.
+
+    Steps:
+    1. Extract the available dates and destination from the Calendar agent's message.
+    2. Use search_flights to find flights within the dates to the destination. If the dates are flexible,
+       use search_flights_flexible ONCE to compare every nearby day instead of calling search_flights per day.
+       For the flight back, use search_round_trip_flights with the start and end dates to get both legs in one call.
+    3. If no flights are found or more calendar info is needed, hand off to the Calendar agent.
+    4. On success, ALWAYS hand off to the Hotels agent using EXACTLY this format:
+       "<handoff to='Hotels agent'>Available dates: [START_DATE] to [END_DATE], Best flight: [AIRLINE] [FLIGHT_NUMBER], Dep: [DEPARTURE_TIME], Arr: [ARRIVAL_TIME], $[PRICE], Destination: [DESTINATION]. Please find accommodations.</handoff>"
+
+    DO NOT search for hotels yourself.
+    Example handoff: "<handoff to='Hotels agent'>Available dates: 2025-04-19 to 2025-04-20, Best flight: Test Airline TA123, Dep: 2025-04-19T10:00, Arr: 2025-04-19T12:00, $199.99, Destination: Chicago. Please find accommodations.</handoff>"
+    """,
+    tools=[search_flights, search_flights_flexible, search_round_trip_flights],
+)
+
+hotels_agent = Agent(
+    name="Hotels agent",
+    instructions=f"""{RECOMMENDED_PROMPT_PREFIX}
+    CONTINUE UNTIL YOU FIND A HOTEL. DO NOT SEARCH FOR FLIGHTS.
+
+    You are a hotel booking specialist. Your ONLY job is to find hotel accommodations.
+
+    Steps:
+    1. Extract the destination and dates from the Flights agent's message.
+    2. Use search_hotels to find hotels in the destination, with check_in_date and check_out_date set to the
+       start and end dates. Pass budget_per_night when the request has a budget.
+       It returns ranked options, best first; pick the first one unless another fits the request better.
+    3. If no hotels are found, try searching again with different parameters.
+    4. On success, ALWAYS hand off to the TravelAssistant using EXACTLY this format:
+       "<handoff to='TravelAssistant'>Available dates: [START_DATE] to [END_DATE], Best flight: [AIRLINE] [FLIGHT_NUMBER], Dep: [DEPARTURE_TIME], Arr: [ARRIVAL_TIME], $[FLIGHT_PRICE], Best hotel: [HOTEL_NAME], $[HOTEL_PRICE]/night, [HOTEL_ADDRESS], Destination: [DESTINATION]. Here's the complete plan.</handoff>"
+
+    Example handoff: "<handoff to='TravelAssistant'>Available dates: 2025-04-19 to 2025-04-20, Best flight: Test Airline TA123, Dep: 2025-04-19T10:00, Arr: 2025-04-19T12:00, $199.99, Best hotel: Unknown Hotel, $150/night, Chicago, IL, USA, Destination: Chicago. Here's the complete plan.</handoff>"
+
+    IMPORTANT:
+    - DO NOT search for flights
+    - DO NOT ask for flight information
+    - ONLY search for hotels
+    - ALWAYS use the exact handoff format above
+    """,
+    tools=[search_hotels],
+)
+
+travel_agent = Agent(
+    name="TravelAssistant",
+    tools=[],
+    instructions=f"""{RECOMMENDED_PROMPT_PREFIX}
+
+    CONTINUE UNTIL YOU YOU FINISH.
+
+    You are the main travel planning assistant coordinating the trip.
+
+    Process:
+    1. Start by IMMEDIATELY handing off to the Calendar agent using EXACTLY this format:
+       "<handoff to='Calendar agent'>Please check calendar availability for: [USER REQUEST]</handoff>"
+       where [USER REQUEST] is the user's request you were given as input, copied word for word.
+    2. When you receive a handoff from the Hotels agent, extract the details and update the state:
+       - Update dates
+       - Update flight details
+       - Update hotel details
+       - Calculate total cost (flight price + hotel price * number of nights)
+    3. Format and return the final plan.
+
+    Format the final plan like:
+    "Here's your travel plan:
+    - Dates: [START_DATE] to [END_DATE]
+    - Flight: [AIRLINE] [FLIGHT_NUMBER], Dep: [DEPARTURE_TIME], Arr: [ARRIVAL_TIME], $[FLIGHT_PRICE]
+    - Hotel: [HOTEL_NAME], $[HOTEL_PRICE]/night, [HOTEL_ADDRESS]
+    - Total estimated cost: $[TOTAL_COST]
+
+    Your calendar events during this period:
+    [LIST OF CALENDAR EVENTS]"
+
+
+    MAKE SURE YOU BOOK A FLIGHT THERE AND BACK WITH THE CORRESPONDING CORRECT START AND END DATE 
+
+    Example: "Here's your travel plan:
+    - Dates: 2025-04-19 to 2025-04-20
+    - Flight: Test Airline TA123, Dep: 2025-04-19T10:00, Arr: 2025-04-19T12:00, $199.99
+    - Hotel: Unknown Hotel, $150/night, Chicago, IL, USA
+    - Total estimated cost: $349.99
+
+    Your calendar events during this period:
+    - April 19, 2025: 2:30 PM - 3:15 PM: Meeting
+    - April 20, 2025: 4:15 PM - 6:45 PM: Team Call""
+    """
+)
+
+# Set handoff relationships
+calendar_agent.handoffs = [flights_agent, hotels_agent, travel_agent]
+flights_agent.handoffs = [calendar_agent, hotels_agent, travel_agent]
+hotels_agent.handoffs = [flights_agent, calendar_agent, travel_agent]
+travel_agent.handoffs = [calendar_agent, hotels_agent, flights_agent]
+
+AGENTS = {agent.name: agent for agent in (calendar_agent, flights_agent, hotels_agent, travel_agent)}
+
 # --- Main Agent --- #
+# Limits on one trip_planner run; every hop is a paid LLM call
+MAX_HOPS = int(os.getenv("TRIP_MAX_HOPS", 12))
+MAX_TOKENS = int(os.getenv("TRIP_MAX_TOKENS", 200000))
+MAX_SECONDS = float(os.getenv("TRIP_MAX_SECONDS", 300))
+
+def _result_usage(result) -> Dict[str, int]:
+    """Token usage of one Runner run, summed over its model responses"""
+    usage = {"requests": 0, "input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    for response in getattr(result, "raw_responses", None) or []:
+        response_usage = getattr(response, "usage", None)
+        if response_usage is None:
+            continue
+        usage["requests"] += getattr(response_usage, "requests", 1) or 1
+        usage["input_tokens"] += getattr(response_usage, "input_tokens", 0) or 0
+        usage["output_tokens"] += getattr(response_usage, "output_tokens", 0) or 0
+        usage["total_tokens"] += getattr(response_usage, "total_tokens", 0) or 0
+    return usage
+
 def trip_planner(request: str):
     """
     Smart travel assistant that coordinates calendar availability checks, flight searches, and hotel bookings.
+    Runs in the current trip context, or a new one if there is none.
     """
+    with trip_scope() as trip, hotels.offer_scope():
+        return _plan_with_agents(request, trip)
+
+def _plan_with_agents(request: str, trip: TripContext):
     # Initialize state
-    state = {
+    trip.state = state = {
         "dates": {"start": None, "end": None},
         "destination": None,
         "flight": None,
@@ -185,126 +433,7 @@ def trip_planner(request: str):
         "status": "initial"
     }
 
-    calendar_agent = Agent(
-        name="Calendar agent",
-        instructions=f"""{RECOMMENDED_PROMPT_PREFIX}
-
-        CONTINUE UNTIL YOU INTEGRATE ALL OF THE CALENDAR WITHIN THE TIMEFRAME.
-        
-        You are a calendar specialist. Your job is to check the user's calendar for availability.
-
-        Steps:
-        1. Extract the destination and preferred dates from the request. If no dates are provided, suggest the next upcoming weekend.
-        2. List available calendars using list_google_calendars.
-        3. Get events within the requested or suggested date range using get_calendar_events_tool.
-        4. Identify free periods suitable for travel (e.g., a weekend or week-long period).
-        5. ALWAYS hand off to the Flights agent using EXACTLY this format:
-           "<handoff to='Flights agent'>Available dates: [START_DATE] to [END_DATE], Destination: [DESTINATION]. Please find flights.</handoff>"
-
-        DO NOT search for flights or hotels yourself.
-        Example: For "Plan a weekend trip to Chicago under $1000", you might hand off:
-           "<handoff to='Flights agent'>Available dates: 2025-04-19 to 2025-04-20, Destination: Chicago. Please find flights.</handoff>"
-        """,
-        tools=[list_google_calendars, get_calendar_events_tool],
-    )
-    
-    flights_agent = Agent(
-        name="Flights agent",
-        instructions=f"""{RECOMMENDED_PROMPT_PREFIX}
-        
-        CONTINUE UNTIL YOU FIND A FLIGHT. BOOK A FLIGHT BACK BASED ON THE LEAVE DATE TOO.
-
-        You are a flight booking specialist. Your job is to find optimal flights.
-
-        Steps:
-        1. Extract the available dates and destination from the Calendar agent's message.
-        2. Use search_flights to find flights within the dates to the destination.
-        3. If no flights are found or more calendar info is needed, hand off to the Calendar agent.
-        4. On success, ALWAYS hand off to the Hotels agent using EXACTLY this format:
-           "<handoff to='Hotels agent'>Available dates: [START_DATE] to [END_DATE], Best flight: [AIRLINE] [FLIGHT_NUMBER], Dep: [DEPARTURE_TIME], Arr: [ARRIVAL_TIME], $[PRICE], Destination: [DESTINATION]. Please find accommodations.</handoff>"
-
-        DO NOT search for hotels yourself.
-        Example handoff: "<handoff to='Hotels agent'>Available dates: 2025-04-19 to 2025-04-20, Best flight: Test Airline TA123, Dep: 2025-04-19T10:00, Arr: 2025-04-19T12:00, $199.99, Destination: Chicago. Please find accommodations.</handoff>"
-        """,
-        tools=[search_flights],
-    )
-    
-    hotels_agent = Agent(
-        name="Hotels agent",
-        instructions=f"""{RECOMMENDED_PROMPT_PREFIX}
-        CONTINUE UNTIL YOU FIND A HOTEL. DO NOT SEARCH FOR FLIGHTS.
-
-        You are a hotel booking specialist. Your ONLY job is to find hotel accommodations.
-
-        Steps:
-        1. Extract the destination and dates from the Flights agent's message.
-        2. Use search_hotels to find hotels in the destination.
-        3. If no hotels are found, try searching again with different parameters.
-        4. On success, ALWAYS hand off to the TravelAssistant using EXACTLY this format:
-           "<handoff to='TravelAssistant'>Available dates: [START_DATE] to [END_DATE], Best flight: [AIRLINE] [FLIGHT_NUMBER], Dep: [DEPARTURE_TIME], Arr: [ARRIVAL_TIME], $[FLIGHT_PRICE], Best hotel: [HOTEL_NAME], $[HOTEL_PRICE]/night, [HOTEL_ADDRESS], Destination: [DESTINATION]. Here's the complete plan.</handoff>"
-
-        Example handoff: "<handoff to='TravelAssistant'>Available dates: 2025-04-19 to 2025-04-20, Best flight: Test Airline TA123, Dep: 2025-04-19T10:00, Arr: 2025-04-19T12:00, $199.99, Best hotel: Unknown Hotel, $150/night, Chicago, IL, USA, Destination: Chicago. Here's the complete plan.</handoff>"
-
-        IMPORTANT:
-        - DO NOT search for flights
-        - DO NOT ask for flight information
-        - ONLY search for hotels
-        - ALWAYS use the exact handoff format above
-        """,
-        tools=[search_hotels],
-    )
-    
-    travel_agent = Agent(
-        name="TravelAssistant",
-        tools=[],
-        instructions=f"""{RECOMMENDED_PROMPT_PREFIX}
-
-        CONTINUE UNTIL YOU YOU FINISH.
-
-        You are the main travel planning assistant coordinating the trip.
-
-        Process:
-        1. Start by IMMEDIATELY handing off to the Calendar agent using EXACTLY this format:
-           "<handoff to='Calendar agent'>Please check calendar availability for: {request}</handoff>"
-        2. When you receive a handoff from the Hotels agent, extract the details and update the state:
-           - Update dates
-           - Update flight details
-           - Update hotel details
-           - Calculate total cost (flight price + hotel price * number of nights)
-        3. Format and return the final plan.
-
-        Format the final plan like:
-        "Here's your travel plan:
-        - Dates: [START_DATE] to [END_DATE]
-        - Flight: [AIRLINE] [FLIGHT_NUMBER], Dep: [DEPARTURE_TIME], Arr: [ARRIVAL_TIME], $[FLIGHT_PRICE]
-        - Hotel: [HOTEL_NAME], $[HOTEL_PRICE]/night, [HOTEL_ADDRESS]
-        - Total estimated cost: $[TOTAL_COST]
-        
-        Your calendar events during this period:
-        [LIST OF CALENDAR EVENTS]"
-
-        
-        MAKE SURE YOU BOOK A FLIGHT THERE AND BACK WITH THE CORRESPONDING CORRECT START AND END DATE 
-
-        Example: "Here's your travel plan:
-        - Dates: 2025-04-19 to 2025-04-20
-        - Flight: Test Airline TA123, Dep: 2025-04-19T10:00, Arr: 2025-04-19T12:00, $199.99
-        - Hotel: Unknown Hotel, $150/night, Chicago, IL, USA
-        - Total estimated cost: $349.99
-        
-        Your calendar events during this period:
-        - April 19, 2025: 2:30 PM - 3:15 PM: Meeting
-        - April 20, 2025: 4:15 PM - 6:45 PM: Team Call""
-        """
-    )
-    
-    # Set handoff relationships
-    calendar_agent.handoffs = [flights_agent, hotels_agent, travel_agent]
-    flights_agent.handoffs = [calendar_agent, hotels_agent, travel_agent]
-    hotels_agent.handoffs = [flights_agent, calendar_agent, travel_agent]
-    travel_agent.handoffs = [calendar_agent, hotels_agent, flights_agent]
-
-    # Manual handoff loop
+    # Manual handoff loop, starting from the prebuilt agent graph
     current_agent = travel_agent
     message = request
     conversation_history = []
@@ -374,15 +503,53 @@ def trip_planner(request: str):
         except Exception as e:
             logger.error(f"Error updating state from handoff: {e}")
 
+    trace = []
+    summary = None
+    seen_turns = set()
+    tokens_used = 0
+    started = time.perf_counter()
+
     while True:
+        # Stop runaway requests before paying for another LLM call
+        if len(trace) >= MAX_HOPS:
+            logger.warning(f"Stopping trip planning after {len(trace)} hops")
+            state["status"] = "hop_limit"
+            break
+        if tokens_used >= MAX_TOKENS:
+            logger.warning(f"Stopping trip planning after {tokens_used} tokens")
+            state["status"] = "token_limit"
+            break
+        if time.perf_counter() - started >= MAX_SECONDS:
+            logger.warning(f"Stopping trip planning after {MAX_SECONDS} seconds")
+            state["status"] = "time_limit"
+            break
+        # Agents handing the same message back and forth would repeat forever
+        turn_key = (current_agent.name, " ".join(message.split()))
+        if turn_key in seen_turns:
+            logger.warning(f"Stopping trip planning: {current_agent.name} was already given this message")
+            state["status"] = "loop_detected"
+            break
+        seen_turns.add(turn_key)
+
         # Add current state to message
         state_message = f"{message}\n\nCurrent State:\n{json.dumps(state, indent=2)}"
         
+        turn_started = time.perf_counter()
         result = Runner.run_sync(
             starting_agent=current_agent,
             input=state_message
         )
         response = result.final_output if hasattr(result, 'final_output') else str(result)
+        usage = _result_usage(result)
+        tokens_used += usage["total_tokens"]
+        turn = {
+            "turn": len(trace) + 1,
+            "agent": current_agent.name,
+            "latency_ms": round((time.perf_counter() - turn_started) * 1000),
+            **usage,
+            "handoff_to": None
+        }
+        trace.append(turn)
         
         conversation_history.append({
             "agent": current_agent.name,
@@ -395,11 +562,12 @@ def trip_planner(request: str):
             if match:
                 target_agent_name = match.group(1)
                 handoff_message = match.group(2)
+                turn["handoff_to"] = target_agent_name
                 
                 # Update state based on handoff message
                 update_state_from_handoff(handoff_message)
                 
-                target_agent = next((a for a in [calendar_agent, flights_agent, hotels_agent, travel_agent] if a.name == target_agent_name), None)
+                target_agent = AGENTS.get(target_agent_name)
                 if target_agent:
                     current_agent = target_agent
                     message = handoff_message
@@ -414,10 +582,19 @@ def trip_planner(request: str):
             # No handoff detected, this is the final response
             if current_agent.name == "TravelAssistant":
                 state["status"] = "complete"
+                summary = response
             break
 
-    # Format the final output
-    final_output = {
+    logger.info(f"Trip planned in {len(trace)} hops, {tokens_used} tokens, {time.perf_counter() - started:.1f} s")
+    return build_final_output(state, trip.events, trace, summary)
+
+def build_final_output(state: Dict, events: List[Dict], trace: Optional[List[Dict]] = None,
+                       summary: Optional[str] = None) -> Dict:
+    """
+    The plan returned by every planner mode: the structured plan, the written summary
+    shown to the user (None if the planner stopped early) and the per-step trace of how it was made
+    """
+    return {
         "travel_plan": {
             "dates": state["dates"],
             "destination": state["destination"],
@@ -427,16 +604,274 @@ def trip_planner(request: str):
         },
         "calendar_events": events,
         "formatted_calendar_events": format_calendar_events(events),
-        "status": state["status"]
+        "status": state["status"],
+        "summary": summary,
+        "trace": trace or []
     }
-    
-    return final_output
 
-def fill_gaps():
+# --- Fast-path Planner --- #
+# How far ahead to look for free time when the request names no dates
+FAST_PATH_HORIZON_DAYS = 21
+
+INTERPRET_PROMPT = """
+You turn a travel request into trip parameters. Today is {today}.
+The user's free time (UTC) in the coming weeks is listed in free_windows.json; choose dates inside it
+unless the request says otherwise. If the request names no dates, pick the next weekend that is free.
+
+Return ONLY a JSON object with these keys:
+{{"origin": "city or airport", "destination": "city or airport", "start_date": "YYYY-MM-DD",
+  "end_date": "YYYY-MM-DD", "budget_per_night": number or null}}
+If no origin is given, use "Indianapolis".
+"""
+
+SUMMARY_PROMPT = """
+You write the final travel plan for the user. plan.json holds the dates, flight, hotel and total cost
+that were found; calendar_events.txt lists the user's calendar events during the trip.
+Use only these facts: never invent flights, hotels or prices, and say so plainly if one is missing.
+
+Format the plan like:
+"Here's your travel plan:
+- Dates: [START_DATE] to [END_DATE]
+- Flight: [AIRLINE] [FLIGHT_NUMBER], Dep: [DEPARTURE_TIME], Arr: [ARRIVAL_TIME]
+- Return flight: [AIRLINE] [FLIGHT_NUMBER], Dep: [DEPARTURE_TIME], Arr: [ARRIVAL_TIME]
+- Round-trip airfare: $[FLIGHT_PRICE]
+- Hotel: [HOTEL_NAME], $[HOTEL_PRICE]/night, [HOTEL_ADDRESS]
+- Total estimated cost: $[TOTAL_COST]
+
+Your calendar events during this period:
+[LIST OF CALENDAR EVENTS]"
+"""
+
+def _completion_usage(response) -> Dict[str, int]:
+    """Token usage of one chat completion, in the trace's format"""
+    return {
+        "requests": 1,
+        "input_tokens": getattr(response.usage, "prompt_tokens", 0),
+        "output_tokens": getattr(response.usage, "completion_tokens", 0),
+        "total_tokens": getattr(response.usage, "total_tokens", 0)
+    }
+
+def interpret_request(request: str, free_windows: Optional[List[Dict]] = None):
+    """
+    One LLM call that extracts origin, destination, dates and budget from the request.
+    Returns the trip parameters and the call's token usage; raises ValueError if the
+    reply is not JSON or its dates are not YYYY-MM-DD with the end on or after the start.
+    """
+    response = get_openai_client().chat.completions.create(
+        model="gpt-4o",
+        response_format={"type": "json_object"},
+        messages=[
+            {"role": "system", "content": INTERPRET_PROMPT.format(today=datetime.now().strftime("%Y-%m-%d"))},
+            {"role": "system", "content": f"free_windows.json: {json.dumps(free_windows or [])}"},
+            {"role": "user", "content": request}
+        ]
+    )
+    params = json.loads(response.choices[0].message.content)
+    start, end = params.get("start_date"), params.get("end_date")
+    if start and end:
+        if datetime.strptime(end, "%Y-%m-%d") < datetime.strptime(start, "%Y-%m-%d"):
+            raise ValueError(f"Trip ends ({end}) before it starts ({start})")
+    return params, _completion_usage(response)
+
+def summarize_plan(request: str, state: Dict, events: List[Dict]):
+    """
+    One LLM call that writes the final plan for the user from the structured results.
+    Returns the summary text and the call's token usage.
+    """
+    plan = {key: state[key] for key in ("dates", "destination", "flight", "hotel", "total_cost")}
+    response = get_openai_client().chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "system", "content": f"plan.json: {json.dumps(plan)}"},
+            {"role": "system", "content": f"calendar_events.txt:\n{format_calendar_events(events)}"},
+            {"role": "user", "content": request}
+        ]
+    )
+    return response.choices[0].message.content, _completion_usage(response)
+
+def _flight_leg(flight: Dict) -> Dict:
+    return {key: flight[key] for key in ("airline", "flight_number", "departure", "arrival")}
+
+def _fast_flight(origin: str, destination: str, start_date: str, end_date: str) -> Optional[Dict]:
+    # The cheapest round trip, so the price covers the flight home as well
+    round_trips = run_flight_agent.search_round_trip(origin, destination, start_date, end_date, max_pairs=1)
+    if not round_trips:
+        return None
+    best = round_trips[0]
+    flight = _flight_leg(best["outbound"])
+    flight["return"] = _flight_leg(best["return"])
+    flight["price"] = best["total_price"]
+    return flight
+
+def _fast_hotel(destination: str, start_date: str, end_date: str, budget_per_night: Optional[float],
+                events: List[Dict]) -> Optional[Dict]:
+    city = airport_index.city_code(re.sub(r"(?i)\s+airport$", "", destination.strip())) or destination.strip()
+    with hotels.offer_scope():
+        near = hotels.event_points(city, events)
+        options = hotels.get_hotel_options(city, top_k=1, budget_per_night=budget_per_night, near=near or None,
+                                           checkInDate=start_date, checkOutDate=end_date)
+    if not options:
+        return None
+    best = options[0]
+    return {
+        "name": best["hotel"].get("name", "Unknown Hotel"),
+        "price": best["nightly_price"],
+        "address": _format_address(best["hotel"]),
+        "offer_id": best["offer"].get("id")
+    }
 
-    global events
+def trip_planner_fast(request: str):
+    """
+    Plan a trip without agent handoffs: one free/busy lookup and one LLM call settle the
+    dates, then calendar events, flights and hotels are fetched concurrently in code and
+    a second LLM call writes the summary. Returns the same shape as trip_planner.
+    """
+    with trip_scope() as trip, hotels.offer_scope():
+        return _plan_fast(request, trip)
+
+def _plan_fast(request: str, trip: TripContext):
+    trip.state = state = {
+        "dates": {"start": None, "end": None},
+        "destination": None,
+        "flight": None,
+        "hotel": None,
+        "total_cost": 0.0,
+        "status": "initial"
+    }
+
+    trace = []
+
+    def record(step, started, usage=None):
+        trace.append({
+            "turn": len(trace) + 1,
+            "agent": step,
+            "latency_ms": round((time.perf_counter() - started) * 1000),
+            **(usage or {"requests": 0, "input_tokens": 0, "output_tokens": 0, "total_tokens": 0}),
+            "handoff_to": None
+        })
+
+    today = datetime.now()
+    step_started = time.perf_counter()
+    free_busy = calendar_code.get_free_busy(
+        today.strftime("%Y-%m-%d"), (today + timedelta(days=FAST_PATH_HORIZON_DAYS)).strftime("%Y-%m-%d"),
+        min_minutes=240
+    )
+    record("free/busy lookup", step_started)
+    step_started = time.perf_counter()
+    try:
+        params, usage = interpret_request(request, free_busy.get("free") if "error" not in free_busy else None)
+    except Exception as e:
+        logger.error(f"Fast-path request interpretation failed: {e}")
+        record("interpret request", step_started)
+        return build_final_output(state, trip.events, trace)
+    record("interpret request", step_started, usage)
+    logger.info(f"Interpreted request: {params}")
+    if not params.get("destination") or not params.get("start_date") or not params.get("end_date"):
+        logger.error("Could not work out the destination and dates from the request")
+        return build_final_output(state, trip.events, trace)
+
+    state["dates"] = {"start": params["start_date"], "end": params["end_date"]}
+    state["destination"] = params["destination"]
+
+    step_started = time.perf_counter()
+    def submit(pool, fn, *args):
+        # Run in a copy of this request's context so workers see the same trip and caches
+        return pool.submit(contextvars.copy_context().run, fn, *args)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        flight_future = submit(pool, _fast_flight, params.get("origin") or "Indianapolis", params["destination"],
+                               params["start_date"], params["end_date"])
+        # The hotel search waits for the events (read from the local store) so it can
+        # prefer hotels near them; the flight search runs alongside both
+        try:
+            events_data = calendar_code.get_calendar_events(params["start_date"], params["end_date"])
+            if isinstance(events_data, dict) and "events" in events_data:
+                trip.events = events_data["events"]
+        except Exception as e:
+            logger.error(f"Fast-path calendar read failed: {e}")
+        hotel_future = submit(pool, _fast_hotel, params["destination"], params["start_date"], params["end_date"],
+                              params.get("budget_per_night"), trip.events)
+
+        for name, future in (("flight", flight_future), ("hotel", hotel_future)):
+            try:
+                state[name] = future.result()
+            except Exception as e:
+                logger.error(f"Fast-path {name} search failed: {e}")
+    record("calendar, flight and hotel searches", step_started)
+
+    if state["flight"] and state["hotel"]:
+        nights = (datetime.strptime(params["end_date"], "%Y-%m-%d") - datetime.strptime(params["start_date"], "%Y-%m-%d")).days
+        state["total_cost"] = state["flight"]["price"] + state["hotel"]["price"] * nights
+        state["status"] = "complete"
+
+    summary = None
+    step_started = time.perf_counter()
+    try:
+        summary, usage = summarize_plan(request, state, trip.events)
+        record("write summary", step_started, usage)
+    except Exception as e:
+        logger.error(f"Fast-path summary failed: {e}")
+
+    return build_final_output(state, trip.events, trace, summary)
+
+def plan_trip(request: str, mode: Optional[str] = None):
+    """
+    Plan a trip with the agent handoff loop ("agents") or the fast path ("fast").
+    Defaults to the TRIP_PLANNER_MODE environment variable, then "agents".
+    """
+    mode = mode or os.getenv("TRIP_PLANNER_MODE", "agents")
+    if mode == "fast":
+        return trip_planner_fast(request)
+    return trip_planner(request)
+
+def _trip_day(value) -> Optional[date]:
+    try:
+        return date.fromisoformat(value) if isinstance(value, str) else None
+    except ValueError:
+        return None
+
+def compute_free_slots(events: List[Dict], start_day: Optional[str] = None, end_day: Optional[str] = None,
+                       min_minutes: int = 60, buffer_minutes: int = 15) -> List[Dict]:
+    """
+    Free slots of at least min_minutes between the calendar events, computed in code
+    so the LLM only has to fill them. Times are local to the events' timezone.
+
+    Covers every day from start_day to end_day (YYYY-MM-DD, the trip's dates), so
+    days without events are free all day; a missing bound falls back to the first
+    or last event's day.
+    """
+    timed = [e for e in events if isinstance(e, dict) and e.get('start') and e.get('end')] \
+        if isinstance(events, list) else []
+
+    tz = next((e['start'].get('timeZone') for e in timed if e['start'].get('timeZone')), intervals.DEFAULT_TIMEZONE)
+    zone = ZoneInfo(tz)
+    busy = intervals.events_to_intervals(timed, tz)
+    first_day = _trip_day(start_day) or (min(start for start, _ in busy).astimezone(zone).date() if busy else None)
+    last_day = _trip_day(end_day) or (max(end for _, end in busy).astimezone(zone).date() if busy else None)
+    if not first_day or not last_day:
+        return []
+
+    slots = intervals.find_free_slots(timed, first_day, last_day, min_minutes=min_minutes,
+                                      buffer_minutes=buffer_minutes, tz=tz)
+    return [{
+        "date": start.astimezone(zone).strftime("%Y-%m-%d %A"),
+        "start_time": start.astimezone(zone).strftime("%H:%M"),
+        "end_time": end.astimezone(zone).strftime("%H:%M"),
+        "minutes": int((end - start).total_seconds() // 60),
+        "timezone": tz
+    } for start, end in slots]
+
+def fill_gaps():
+    """
+    Fill the free time between the current trip's calendar events with attractions, food and rides.
+    Stores the updated calendar JSON on the trip context and returns it.
+    """
+    trip = current_trip()
+    events = trip.events
+    dates = (trip.state or {}).get("dates") or {}
 
-    print(events)
+    free_slots = compute_free_slots(events, dates.get("start"), dates.get("end"))
 
     attractions_prompt = """
         DO NOT MODIFY OR OVERLAP WITH PRE-EXISTING EVENTS IN THE CALENDAR.
@@ -445,10 +880,10 @@ def fill_gaps():
 
         Your goal is to fill significant time gaps in the calendar with attractions, activities, and food-related events in the destination city, and to add Uber rides before and after flights. Follow these steps precisely:
 
-        1. **Analyze Time Gaps**:
-        - Identify unscheduled periods of 1 hour or longer between existing events in the `calendar.json`.
-        - Consider the entire day, respecting existing events' start and end times.
-        - Exclude gaps shorter than 1 hour, as they are too brief for meaningful activities.
+        1. **Use the Provided Free Slots**:
+        - `free_slots.json` lists every free slot on each day of the trip. They were computed around the existing
+          events, are at least 1 hour long and already leave a 15-minute buffer around existing events.
+        - Schedule attractions, activities and food ONLY inside these slots. Do not look for other gaps.
 
         2. **Schedule Uber Rides for Flights**:
         - Identify all flight events (based on summaries containing "Flight" or similar keywords).
@@ -458,7 +893,7 @@ def fill_gaps():
         - Ensure Uber rides do not overlap with other events.
 
         3. **Fill Gaps with Attractions and Activities**:
-        - For each identified gap (1 hour or longer), propose an attraction, activity, or food-related event in the destination city.
+        - For each free slot, propose an attraction, activity, or food-related event in the destination city.
         - Select from:
             - **Attractions**: Museums, landmarks, parks, historical sites, or cultural centers.
             - **Activities**: Walking tours, shopping districts, recreational activities (e.g., bike rentals), or local experiences.
@@ -475,7 +910,7 @@ def fill_gaps():
             - **Summary**: A clear, descriptive title (e.g., "Visit Metropolitan Museum of Art", "Dinner at Joe's Pizza").
             - **Location**: Specific to the destination city (e.g., "Metropolitan Museum of Art, NYC").
             - **Description**: A brief overview (1–2 sentences) of the attraction or activity (e.g., "Explore world-class art collections.").
-            - **Start/End Time**: Fit within the identified gap, leaving at least 15 minutes buffer before and after existing events.
+            - **Start/End Time**: Fit inside one of the free slots.
             - **Organizer**: Set to "TravelAssistant".
             - **Timezone**: Match the input calendar's timezone (default: "America/New_York").
             - **Calendar ID**: Copy from existing events or use "primary".
@@ -540,23 +975,26 @@ def fill_gaps():
         """
 
     # Call API to update calendar with attractions info
-    attractions_calendar_response = client.chat.completions.create(
+    attractions_calendar_response = get_openai_client().chat.completions.create(
         model="gpt-4o",
         messages=[
             {"role": "system", "content": attractions_prompt},
-            {"role": "system", "content": f"calendar.json: {events}"}
+            {"role": "system", "content": f"calendar.json: {events}"},
+            {"role": "system", "content": f"free_slots.json: {json.dumps(free_slots)}"}
         ]
     )
 
     # Parse the final updated calendar with all info
-    events = attractions_calendar_response.choices[0].message.content
+    trip.itinerary = attractions_calendar_response.choices[0].message.content
+    return trip.itinerary
 
 
 # --- Test Cases --- #
 def pipeline(start, end, sdate, edate):
 
-    plan = trip_planner("Plan a weekend trip from Indianapolis (IND Airport) to New York City (JFK Airport) starting today (04/13/2025) ending in 3 days, make sure it doesn't conflict with my calendar. Make it work, plan around the trips if they conflict.")
-    events = plan
-    fill_gaps()
+    # One trip context per pipeline run, shared by the planner and fill_gaps
+    with trip_scope():
+        plan = plan_trip("Plan a weekend trip from Indianapolis (IND Airport) to New York City (JFK Airport) starting today (04/13/2025) ending in 3 days, make sure it doesn't conflict with my calendar. Make it work, plan around the trips if they conflict.")
+        fill_gaps()
 
-    return events
\ No newline at end of file
+    return plan
\ No newline at end of file
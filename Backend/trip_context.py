@@ -0,0 +1,55 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TripContext:
+    """
+    Everything one trip-planning request reads and writes: calendar events,
+    planner state and the itinerary fill_gaps produced.
+    """
+
+    __slots__ = ("events", "state", "itinerary")
+
+    def __init__(self):
+        self.events: List[Dict] = []
+        self.state: Dict[str, Any] = {}
+        self.itinerary: Optional[str] = None
+
+
+_current_trip: ContextVar[Optional[TripContext]] = ContextVar("trip_context", default=None)
+
+
+@contextmanager
+def trip_scope(trip: Optional[TripContext] = None):
+    """
+    Make a trip context current for the enclosed code.
+
+    Contexts follow contextvars rules: each thread and asyncio task sees its
+    own, so concurrent requests never share events or state. Inside an active
+    scope, trip_scope() without an argument reuses the current context; a
+    worker thread can join a request's context with trip_scope(trip).
+    """
+    trip = trip or _current_trip.get() or TripContext()
+    token = _current_trip.set(trip)
+    try:
+        yield trip
+    finally:
+        _current_trip.reset(token)
+
+
+def current_trip() -> TripContext:
+    """
+    The active request's trip context.
+
+    Outside any trip_scope (e.g. a tool called directly from a shell) this is a
+    new, empty context on every call, so nothing leaks between unrelated callers.
+    """
+    trip = _current_trip.get()
+    if trip is None:
+        logger.warning("No active trip_scope; using a new trip context that will not be kept")
+        return TripContext()
+    return trip
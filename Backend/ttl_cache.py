@@ -0,0 +1,106 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_ENTRIES = 256
+
+
+class TTLCache:
+    """
+    Two-tier TTL cache for JSON-serializable API responses.
+
+    The first tier is an in-memory LRU; the optional second tier is a SQLite
+    table so cached entries survive a restart. Entries expire after
+    ttl_seconds in both tiers.
+    """
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 db_path: Optional[str] = None, table: str = "cache_entries"):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.table = table
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, expires_at REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            self._db.execute(f"DELETE FROM {table} WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    f"SELECT expires_at, payload FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[0] > now:
+                    value = json.loads(row[1])
+                    self._store_memory(key, row[0], value)
+                    self._stats["disk_hits"] += 1
+                    return value
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a JSON-serializable value under key for ttl_seconds."""
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store_memory(key, expires_at, value)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        f"INSERT OR REPLACE INTO {self.table} (key, expires_at, payload) VALUES (?, ?, ?)",
+                        (key, expires_at, json.dumps(value))
+                    )
+                    self._db.commit()
+                except (sqlite3.Error, TypeError) as e:
+                    logger.warning(f"Could not persist cache entry {key}: {e}")
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self.table}")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters plus the current in-memory size."""
+        with self._lock:
+            return dict(self._stats, size=len(self._entries))
+
+    def _store_memory(self, key: str, expires_at: float, value: Any) -> None:
+        # Caller must hold self._lock
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1